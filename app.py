@@ -1,14 +1,30 @@
 import os
-import chromadb
+import json
+import time
+import random
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename # Still needed for clear_db temp folder in case, but not upload
-import shutil
 
 # Import the ingestion function - it will be called separately now
-from data_ingestion import ingest_document
+from data_ingestion import ingest_document, start_collection_build, finish_collection_build, parse_amharic_number
+from collection_aliases import resolve_collection_name
+# One embedder and one vector store client per process, shared with data_ingestion and loaded lazily
+from model_registry import VECTOR_BACKEND, VECTOR_DB_PATH, count_tokens, get_embedder, get_vector_store, warm_up
+from rag_cache import RagCache, normalize_query, embedding_key, read_collection_version
+from rag_pipeline import PIPELINE_MODES, generate_answer, generate_answer_async, pack_context, stream_answer, summary_cache_namespace
+from summary_cache import SummaryCache
+from llm_stub import FaultyGenerativeModel, StubGenerativeModel
+from llm_client import AsyncGeneratorClient, CircuitBreaker, GeneratorClient, LLMUnavailableError
+from query_batcher import PrefetchedQueries, QueryCoalescer
+from lexical_index import fuse_results, load_lexical_index
+from structure_index import load_structure_index, parse_structure_references
+from metrics import MetricsRegistry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,130 +32,855 @@ load_dotenv()
 app = Flask(__name__)
 
 # --- Configuration ---
+# "gemini" calls the real API; "stub" uses llm_stub.StubGenerativeModel so the app runs offline;
+# "fake" uses llm_stub.FaultyGenerativeModel (random latency and errors, see RAG_FAKE_LLM_*)
+RAG_LLM_BACKEND = os.getenv("RAG_LLM_BACKEND", "gemini")
+
 # Get API key from environment variable
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable not set. Please create a .env file.")
+if RAG_LLM_BACKEND == "gemini":
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY environment variable not set. Please create a .env file.")
 
-# Configure Google Generative AI
-genai.configure(api_key=GOOGLE_API_KEY)
+    # Configure Google Generative AI
+    genai.configure(api_key=GOOGLE_API_KEY)
 
-# Define paths and model names
-CHROMA_DB_PATH = "./chroma_db_data"
+# Define paths and model names (vector store paths and EMBEDDER_MODEL_NAME live in model_registry)
 # UPLOAD_FOLDER is no longer strictly needed for frontend uploads,
 # but can be kept for backend ingestion if you choose to temporarily save files there.
 # os.makedirs(UPLOAD_FOLDER, exist_ok=True) # Ensure upload folder exists if you keep it
 
-EMBEDDER_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
 GENERATIVE_MODEL_NAME = "models/gemini-1.5-flash-latest"
 
-RAG_COLLECTION_NAME = "collection4"
-
-# --- Global Initialization (Loaded once when the app starts) ---
-chroma_client = None
-collection = None
-embedder = None
-
-try:
-    print(f"Loading ChromaDB from: {CHROMA_DB_PATH}")
-    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    collection = chroma_client.get_or_create_collection(name=RAG_COLLECTION_NAME)
-    print(f"ChromaDB collection '{RAG_COLLECTION_NAME}' loaded with {collection.count()} documents.")
-except Exception as e:
-    print(f"Error loading ChromaDB: {e}")
-    collection = None
-
-try:
-    print(f"Loading SentenceTransformer model: {EMBEDDER_MODEL_NAME}")
-    embedder = SentenceTransformer(EMBEDDER_MODEL_NAME)
-    print("SentenceTransformer model loaded.")
-except Exception as e:
-    print(f"Error loading SentenceTransformer: {e}")
-    embedder = None
-
-gemini_model = genai.GenerativeModel(GENERATIVE_MODEL_NAME)
-
-
-# --- RAG Logic Function (Remains the same) ---
-def generate_rag_answer(query_text: str, n_results: int = 5) -> str:
-    if not collection or not embedder:
+# Benchmarks point the app at their own collection (e.g. one built with the stub embedder)
+RAG_COLLECTION_NAME = os.getenv("RAG_COLLECTION_NAME", "collection4")
+
+# single_pass | two_pass | two_pass_cached (see rag_pipeline.PIPELINE_MODES)
+RAG_PIPELINE_MODE = os.getenv("RAG_PIPELINE_MODE", "two_pass")
+if RAG_PIPELINE_MODE not in PIPELINE_MODES:
+    raise ValueError(f"RAG_PIPELINE_MODE must be one of {PIPELINE_MODES}, got '{RAG_PIPELINE_MODE}'.")
+
+# Summaries for two_pass_cached are persisted next to the ChromaDB data
+SUMMARY_CACHE_PATH = "./summary_cache.sqlite3"
+
+# --- LLM Client ---
+# Model calls go through llm_client.GeneratorClient: each attempt times out after
+# RAG_LLM_TIMEOUT_SECONDS and is retried (jittered backoff) on timeouts, rate limits and server
+# errors until RAG_LLM_DEADLINE_SECONDS; RAG_LLM_HEDGE_AFTER_SECONDS (0 = off) sends a second,
+# hedged request when the first is slow. At most RAG_LLM_MAX_CONCURRENCY calls are outstanding
+# per process. After RAG_LLM_BREAKER_FAILURES consecutive failures the circuit opens for
+# RAG_LLM_BREAKER_COOLDOWN_SECONDS and questions are answered with the retrieved passages.
+# The async server (asgi_app.py) awaits its calls instead of holding a thread for each, so it
+# allows RAG_LLM_ASYNC_MAX_CONCURRENCY outstanding calls; both share one circuit breaker.
+RAG_LLM_TIMEOUT_SECONDS = float(os.getenv("RAG_LLM_TIMEOUT_SECONDS", "20"))
+RAG_LLM_DEADLINE_SECONDS = float(os.getenv("RAG_LLM_DEADLINE_SECONDS", "45"))
+RAG_LLM_MAX_RETRIES = int(os.getenv("RAG_LLM_MAX_RETRIES", "2"))
+RAG_LLM_HEDGE_AFTER_SECONDS = float(os.getenv("RAG_LLM_HEDGE_AFTER_SECONDS", "0")) or None
+RAG_LLM_MAX_CONCURRENCY = int(os.getenv("RAG_LLM_MAX_CONCURRENCY", "16"))
+RAG_LLM_ASYNC_MAX_CONCURRENCY = int(os.getenv("RAG_LLM_ASYNC_MAX_CONCURRENCY", "256"))
+RAG_LLM_BREAKER_FAILURES = int(os.getenv("RAG_LLM_BREAKER_FAILURES", "5"))
+RAG_LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("RAG_LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# --- Request Coalescing ---
+# Concurrent /chat requests arriving within RAG_COALESCE_MAX_WAIT_MS of each other (up to
+# RAG_COALESCE_MAX_BATCH of them) share one embedder.encode and one collection.query call.
+RAG_COALESCE_ENABLED = os.getenv("RAG_COALESCE_ENABLED", "1") == "1"
+RAG_COALESCE_MAX_BATCH = int(os.getenv("RAG_COALESCE_MAX_BATCH", "16"))
+RAG_COALESCE_MAX_WAIT_MS = float(os.getenv("RAG_COALESCE_MAX_WAIT_MS", "5"))
+
+# --- Batch Answering ---
+# /chat/batch (and batch_answer.py) take up to RAG_BATCH_MAX_QUESTIONS questions at once: all of
+# them are embedded in one encode call and looked up with one multi-embedding collection.query
+# (query_batcher.PrefetchedQueries), then up to RAG_BATCH_CONCURRENCY answers are generated at a time.
+RAG_BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "256"))
+RAG_BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+
+# --- Hybrid Retrieval ---
+# The top RAG_HYBRID_CANDIDATES chunks by embedding distance and by BM25 score (lexical_index,
+# built at ingest time) are merged with reciprocal rank fusion and the best n_results kept,
+# so exact legal terms and article numbers are found without raising n_results.
+RAG_HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID_RETRIEVAL", "1") == "1"
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+
+# --- Context Packing ---
+# Retrieval fetches RAG_CONTEXT_CANDIDATES chunks (at least n_results) and rag_pipeline.pack_context
+# keeps the most relevant, least redundant ones that fit RAG_CONTEXT_TOKEN_BUDGET embedder tokens,
+# so the prompt size (and with it LLM latency) no longer swings with the length of the
+# retrieved chunks. RAG_CONTEXT_TOKEN_BUDGET=0 sends the top n_results chunks unpacked.
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "600"))
+RAG_CONTEXT_CANDIDATES = int(os.getenv("RAG_CONTEXT_CANDIDATES", "12"))
+RAG_CONTEXT_MMR_LAMBDA = float(os.getenv("RAG_CONTEXT_MMR_LAMBDA", "0.7"))
+RAG_CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("RAG_CONTEXT_DUPLICATE_THRESHOLD", "0.95"))
+
+# --- Article / Chapter Lookup ---
+# Questions naming an article ("አንቀጽ 39", "አንቀጽ 39(2)") are answered from the structure index
+# (structure_index, built at ingest time) by fetching that article's chunks directly, without
+# embedding the query or searching the vectors; at most RAG_ARTICLE_MAX_CHUNKS are used. A
+# chapter, named in the question ("ምዕራፍ ሦስት") or sent as "chapter" to /chat, restricts
+# semantic and BM25 retrieval to that chapter's chunks.
+RAG_STRUCTURE_LOOKUP = os.getenv("RAG_STRUCTURE_LOOKUP", "1") == "1"
+RAG_ARTICLE_MAX_CHUNKS = int(os.getenv("RAG_ARTICLE_MAX_CHUNKS", "8"))
+
+# --- Cache Configuration ---
+# Sizes are entry counts, TTLs are seconds (0 disables expiry). Semantic answer reuse is
+# off unless RAG_ANSWER_CACHE_SEMANTIC_THRESHOLD is set to a cosine similarity (e.g. 0.95).
+RAG_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "1024"))
+RAG_EMBEDDING_CACHE_TTL = float(os.getenv("RAG_EMBEDDING_CACHE_TTL", "0"))
+RAG_RETRIEVAL_CACHE_SIZE = int(os.getenv("RAG_RETRIEVAL_CACHE_SIZE", "512"))
+RAG_RETRIEVAL_CACHE_TTL = float(os.getenv("RAG_RETRIEVAL_CACHE_TTL", "600"))
+RAG_ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "256"))
+RAG_ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+RAG_ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_SEMANTIC_THRESHOLD", "0")) or None
+
+# --- Logging ---
+# The per-query retrieval dump (chunk IDs, distances, text starts, combined context) is logged
+# for every query with RAG_LOG_LEVEL=DEBUG; otherwise a RAG_DEBUG_SAMPLE_RATE fraction of
+# queries is dumped at INFO level (0 = never, 1 = every query).
+RAG_LOG_LEVEL = os.getenv("RAG_LOG_LEVEL", "INFO").upper()
+RAG_DEBUG_SAMPLE_RATE = float(os.getenv("RAG_DEBUG_SAMPLE_RATE", "0"))
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("rag")
+logger.setLevel(RAG_LOG_LEVEL)
+
+# --- Global Initialization ---
+# Nothing heavy happens at import time: the embedder and vector store client are created on first
+# use (see get_collection/get_embedder). Pre-fork servers (e.g. gunicorn with preload_app, see
+# gunicorn.conf.py) set RAG_PRELOAD_MODELS=1 so the master loads the model once and workers
+# share its pages copy-on-write.
+if os.getenv("RAG_PRELOAD_MODELS") == "1":
+    warm_up()
+
+if RAG_LLM_BACKEND == "stub":
+    gemini_model = StubGenerativeModel()
+    print("Using offline stub generative model (RAG_LLM_BACKEND=stub).")
+elif RAG_LLM_BACKEND == "fake":
+    gemini_model = FaultyGenerativeModel(
+        latency_seconds=float(os.getenv("RAG_FAKE_LLM_LATENCY_SECONDS", "0.5")),
+        latency_sigma=float(os.getenv("RAG_FAKE_LLM_LATENCY_SIGMA", "0.5")),
+        tail_rate=float(os.getenv("RAG_FAKE_LLM_TAIL_RATE", "0.02")),
+        tail_seconds=float(os.getenv("RAG_FAKE_LLM_TAIL_SECONDS", "30")),
+        error_rate=float(os.getenv("RAG_FAKE_LLM_ERROR_RATE", "0.02")),
+        rate_limit_rate=float(os.getenv("RAG_FAKE_LLM_RATE_LIMIT_RATE", "0.02")),
+    )
+    print("Using offline fake generative model with random latency and errors (RAG_LLM_BACKEND=fake).")
+else:
+    gemini_model = genai.GenerativeModel(GENERATIVE_MODEL_NAME)
+
+llm_breaker = CircuitBreaker(RAG_LLM_BREAKER_FAILURES, RAG_LLM_BREAKER_COOLDOWN_SECONDS)
+llm_client_settings = dict(
+    timeout_seconds=RAG_LLM_TIMEOUT_SECONDS,
+    deadline_seconds=RAG_LLM_DEADLINE_SECONDS,
+    max_retries=RAG_LLM_MAX_RETRIES,
+    hedge_after_seconds=RAG_LLM_HEDGE_AFTER_SECONDS,
+    breaker=llm_breaker,
+    forward_timeout=RAG_LLM_BACKEND == "gemini",
+)
+llm_client = GeneratorClient(gemini_model, max_concurrency=RAG_LLM_MAX_CONCURRENCY, **llm_client_settings)
+async_llm_client = AsyncGeneratorClient(gemini_model, max_concurrency=RAG_LLM_ASYNC_MAX_CONCURRENCY, **llm_client_settings)
+
+summary_cache = None
+if RAG_PIPELINE_MODE == "two_pass_cached":
+    summary_cache = SummaryCache(SUMMARY_CACHE_PATH, namespace=summary_cache_namespace(GENERATIVE_MODEL_NAME))
+    print(f"Using summary cache at {SUMMARY_CACHE_PATH}.")
+
+rag_cache = RagCache(
+    embedding_size=RAG_EMBEDDING_CACHE_SIZE,
+    embedding_ttl=RAG_EMBEDDING_CACHE_TTL or None,
+    retrieval_size=RAG_RETRIEVAL_CACHE_SIZE,
+    retrieval_ttl=RAG_RETRIEVAL_CACHE_TTL or None,
+    answer_size=RAG_ANSWER_CACHE_SIZE,
+    answer_ttl=RAG_ANSWER_CACHE_TTL or None,
+    semantic_threshold=RAG_ANSWER_CACHE_SEMANTIC_THRESHOLD,
+)
+rag_cache.sync_collection_version(read_collection_version(VECTOR_DB_PATH, RAG_COLLECTION_NAME))
+
+# Per-process handles, re-created after a fork (SQLite handles and threads do not survive one)
+_collection = None
+_collection_pid = None
+_collection_version = None
+_collection_count = 0
+_lexical_index = None
+_structure_index = None
+_query_coalescer = None
+_query_coalescer_pid = None
+
+def get_collection():
+    """
+    The physical collection currently behind RAG_COLLECTION_NAME. Ingestion and /clear_db
+    bump the collection version stamp when they flip the alias, and the next call here
+    re-resolves it, so a rebuilt collection is picked up without a restart.
+    """
+    global _collection, _collection_pid, _collection_version, _collection_count, _lexical_index, _structure_index
+    version = read_collection_version(VECTOR_DB_PATH, RAG_COLLECTION_NAME)
+    # Drop cached retrievals/answers if the collection was re-ingested or cleared
+    rag_cache.sync_collection_version(version)
+    if _collection is None or _collection_pid != os.getpid() or version != _collection_version:
+        physical_name = resolve_collection_name(VECTOR_DB_PATH, RAG_COLLECTION_NAME)
+        _collection = get_vector_store().get_or_create_collection(name=physical_name)
+        _collection_pid = os.getpid()
+        _collection_version = version
+        # Every published version is immutable, so its size is counted once here
+        _collection_count = _collection.count()
+        _lexical_index = None
+        if RAG_HYBRID_RETRIEVAL:
+            try:
+                _lexical_index = load_lexical_index(_collection, VECTOR_DB_PATH, physical_name)
+            except Exception as e:
+                logger.warning(f"Lexical index for '{physical_name}' unavailable, using vector retrieval only: {e}")
+        _structure_index = None
+        if RAG_STRUCTURE_LOOKUP:
+            try:
+                _structure_index = load_structure_index(_collection, VECTOR_DB_PATH, physical_name)
+            except Exception as e:
+                logger.warning(f"Structure index for '{physical_name}' unavailable, article lookup disabled: {e}")
+        print(f"{VECTOR_BACKEND} collection '{RAG_COLLECTION_NAME}' -> '{physical_name}' loaded with {_collection_count} documents.")
+    return _collection
+
+def get_document_count() -> int:
+    """
+    Number of chunks in the live collection, as counted when it was (re)loaded.
+    """
+    get_collection()
+    return _collection_count
+
+def get_query_coalescer():
+    global _query_coalescer, _query_coalescer_pid
+    if not RAG_COALESCE_ENABLED:
+        return None
+    if _query_coalescer is None or _query_coalescer_pid != os.getpid():
+        _query_coalescer = QueryCoalescer(
+            get_embedder,
+            get_collection,
+            max_batch_size=RAG_COALESCE_MAX_BATCH,
+            max_wait_ms=RAG_COALESCE_MAX_WAIT_MS,
+        )
+        _query_coalescer_pid = os.getpid()
+    return _query_coalescer
+
+# --- Metrics ---
+# Served in Prometheus text format on /metrics. Stage latencies (seconds):
+#   embed, retrieve        - query embedding and vector store query (uncoalesced path)
+#   embed_retrieve         - both, done by the query coalescer in one shared batch
+#                            (for /chat/batch: taking the question's share of the prefetched batch)
+#   batch_embed, batch_retrieve - /chat/batch: the one embed and vector query for the whole batch
+#   lexical                - BM25 search and rank fusion (hybrid retrieval)
+#   article_lookup         - fetching the chunks of an article named in the question
+#   pack                   - choosing the chunks that fit the context token budget
+#   summarize_llm, answer_llm - the two LLM calls (summarize_llm only in two_pass modes)
+#   total                  - whole request, including cache hits and errors
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    "rag_stage_duration_seconds", "Latency of each RAG pipeline stage.", ["stage", "endpoint"])
+requests_total = metrics.counter(
+    "rag_requests_total", "RAG requests by outcome (answered, cached, degraded, empty_db, no_context, no_answer, error).",
+    ["endpoint", "outcome"])
+errors_total = metrics.counter("rag_errors_total", "Exceptions raised while answering.", ["endpoint"])
+retrieved_chunks_count = metrics.histogram(
+    "rag_retrieved_chunks", "Chunks retrieved per query that reached generation.", buckets=(0, 1, 2, 3, 5, 8, 13, 20))
+context_tokens = metrics.histogram(
+    "rag_context_tokens", "Embedder tokens of the packed context per query.",
+    buckets=(64, 128, 256, 384, 512, 768, 1024, 1536, 2048, 4096))
+
+def _cache_samples(field: str):
+    stats = rag_cache.stats()
+    samples = [({"level": level}, stats[level][field]) for level in ("embeddings", "retrievals", "answers")]
+    if summary_cache is not None:
+        samples.append(({"level": "summaries"}, summary_cache.stats()[field]))
+    return samples
+
+metrics.callback("rag_cache_hits_total", "Cache hits per cache level.", "counter", lambda: _cache_samples("hits"))
+metrics.callback("rag_cache_misses_total", "Cache misses per cache level.", "counter", lambda: _cache_samples("misses"))
+metrics.callback(
+    "rag_answer_cache_semantic_hits_total", "Answers served for a similar (not identical) query.", "counter",
+    lambda: [({}, rag_cache.answers.semantic_hits)])
+metrics.callback(
+    "rag_cache_invalidations_total", "Cache flushes caused by a new collection version.", "counter",
+    lambda: [({}, rag_cache.invalidations)])
+metrics.callback(
+    "rag_collection_documents", "Chunks in the live collection (as of its last load).", "gauge",
+    lambda: [({}, _collection_count)] if _collection is not None else [])
+metrics.callback(
+    "rag_lexical_index_terms", "Vocabulary size of the live BM25 index.", "gauge",
+    lambda: [({}, len(_lexical_index.terms))] if _lexical_index is not None else [])
+metrics.callback(
+    "rag_structure_index_articles", "Articles in the live structure index.", "gauge",
+    lambda: [({}, len(_structure_index))] if _structure_index is not None else [])
+def llm_stats() -> dict:
+    """
+    Counters of the sync and async LLM clients added up (only one of them serves requests
+    in a given server).
+    """
+    stats, async_stats = llm_client.stats(), async_llm_client.stats()
+    for key, value in async_stats.items():
+        # The circuit fields describe the one breaker both clients share
+        if isinstance(value, int) and not key.startswith("circuit"):
+            stats[key] += value
+    return stats
+
+def _llm_samples(keys):
+    stats = llm_stats()
+    return [({"result": key}, stats[key]) for key in keys]
+
+metrics.callback(
+    "rag_llm_calls_total", "Model calls through the LLM client by result.", "counter",
+    lambda: _llm_samples(("succeeded", "unavailable", "rejected", "overloaded")))
+metrics.callback(
+    "rag_llm_attempts_total", "Upstream model requests by kind, and how they failed.", "counter",
+    lambda: _llm_samples(("attempts", "retries", "hedges", "timeouts", "errors")))
+metrics.callback(
+    "rag_llm_in_flight", "Upstream model requests currently outstanding.", "gauge",
+    lambda: [({}, llm_stats()["in_flight"])])
+metrics.callback(
+    "rag_llm_circuit_open", "1 while the LLM circuit breaker rejects calls (open), else 0.", "gauge",
+    lambda: [({}, int(llm_breaker.state == CircuitBreaker.OPEN))])
+metrics.callback(
+    "rag_coalescer_batches_total", "Embed/query batches run by the query coalescer.", "counter",
+    lambda: [({}, _query_coalescer.batches)] if _query_coalescer is not None else [])
+metrics.callback(
+    "rag_coalescer_requests_total", "Queries served through the query coalescer.", "counter",
+    lambda: [({}, _query_coalescer.requests)] if _query_coalescer is not None else [])
+
+# Stage timings of the request being answered, for responses that report them (/chat/batch);
+# None outside such a request
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+@contextmanager
+def timed_stage(stage: str, endpoint: str):
+    """
+    Records a stage's latency in rag_stage_duration_seconds and, while a request is being
+    traced, adds it to that request's timings.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage, endpoint=endpoint)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+def stage_timer(endpoint: str):
+    """
+    timer callable for rag_pipeline: stage name -> context manager recording its latency.
+    """
+    return lambda stage: timed_stage(stage, endpoint)
+
+def backends_ready() -> bool:
+    """
+    Loads the embedder and collection if needed; False if either cannot be loaded.
+    """
+    try:
+        get_embedder()
+        get_collection()
+        return True
+    except Exception as e:
+        print(f"Error loading the vector store or SentenceTransformer: {e}")
+        return False
+
+
+# --- RAG Logic Functions ---
+def rag_error_reply(e: Exception, endpoint: str = "chat") -> str:
+    """
+    User-facing (Amharic) reply for an exception raised while answering.
+    """
+    errors_total.inc(endpoint=endpoint)
+    logger.error(f"An error occurred during RAG generation: {e}")
+    if "dimension" in str(e).lower() and "expecting embedding with dimension" in str(e).lower():
+        return "የመረጃ ቋቱ እና የማመንጫ ሞዴሉ እኩል ያልሆኑ ልኬቶች አላቸው። እባክዎ ፋይል ከሰቀሉ በኋላ መተግበሪያውን እንደገና ያስጀምሩት።"
+    return f"ጥያቄዎን ሲያስተናግድ ስህተት ተፈጥሯል። እባክዎ እንደገና ይሞክሩ። ስህተት: {e}"
+
+def degraded_reply(retrieval: dict) -> str:
+    """
+    Reply while the model is unavailable: the retrieved passages themselves, with their
+    article and pages where known.
+    """
+    parts = ["የቋንቋ ሞዴሉ ለጊዜው አይገኝም። ለጥያቄዎ ተዛማጅ የሆኑት የሰነዱ ክፍሎች የሚከተሉት ናቸው፦"]
+    for chunk, metadata in zip(retrieval["chunks"], retrieval["metadatas"]):
+        metadata = metadata or {}
+        source = [f"አንቀጽ {metadata['article']}"] if metadata.get("article") is not None else []
+        if metadata.get("pages"):
+            source.append(f"ገጽ {metadata['pages']}")
+        parts.append(f"({', '.join(source)}) {chunk}" if source else chunk)
+    return "\n\n".join(parts)
+
+def log_retrieval(query_text: str, n_results: int, retrieval: dict, level: int = logging.DEBUG):
+    """
+    Debug dump of what was retrieved for a query and the context sent to the LLM.
+    """
+    chunks = retrieval["chunks"]
+    lines = [
+        f"RAG query {query_text[:80]!r}: requested {n_results}, retrieved {len(chunks)} "
+        f"of {_collection_count} documents",
+    ]
+    for i, (chunk, chunk_id, distance, metadata) in enumerate(
+            zip(chunks, retrieval["ids"], retrieval["distances"], retrieval["metadatas"])):
+        distance = f"{distance:.4f}" if distance is not None else "not vector-ranked"
+        lines.append(f"  Chunk {i+1} (ID: {chunk_id}, Distance: {distance}, {len(chunk)} chars): {metadata}")
+        lines.append(f"    '{chunk[:150]}...'")
+    context = "\n\n".join(chunks)
+    lines.append("  Combined context (first 1000 chars):")
+    lines.append(context[:1000] + "..." if len(context) > 1000 else context)
+    logger.log(level, "\n".join(lines))
+
+def lookup_articles(collection, structure_index, references, endpoint: str = "chat"):
+    """
+    Query results (same shape as collection.query, distances None) holding the chunks of the
+    articles referenced in the question, in document order; None if none of them is indexed.
+    """
+    article_ids = []
+    for article, sub_article in references:
+        article_ids.extend(i for i in structure_index.article_chunk_ids(article, sub_article) if i not in article_ids)
+    article_ids = article_ids[:RAG_ARTICLE_MAX_CHUNKS]
+    if not article_ids:
+        return None
+    with timed_stage("article_lookup", endpoint):
+        found = collection.get(ids=article_ids, include=["documents", "metadatas"])
+    records = {i: (document, metadata) for i, document, metadata in zip(found["ids"], found["documents"], found["metadatas"])}
+    ids = [i for i in article_ids if i in records]
+    return {
+        "ids": [ids],
+        "documents": [[records[i][0] for i in ids]],
+        "metadatas": [[records[i][1] for i in ids]],
+        "distances": [[None] * len(ids)],
+    }
+
+PACKED_RESULT_KEYS = ("ids", "documents", "metadatas", "distances", "rrf_scores")
+
+def pack_results(collection, results: dict, query_embedding=None, endpoint: str = "chat") -> dict:
+    """
+    Narrows single-query results to the chunks pack_context picks for the prompt. The chunk
+    vectors for MMR are fetched by ID; without a query embedding candidates keep their order.
+    """
+    if not RAG_CONTEXT_TOKEN_BUDGET or not results.get("ids") or not results["ids"][0]:
+        return results
+    with timed_stage("pack", endpoint):
+        ids = results["ids"][0]
+        metadatas = (results.get("metadatas") or [[None] * len(ids)])[0]
+        # Chunks ingested before token counts were stored are counted here
+        token_counts = [
+            (metadata or {}).get("tokens") or count_tokens(document)
+            for metadata, document in zip(metadatas, results["documents"][0])
+        ]
+        chunk_embeddings = None
+        if query_embedding is not None:
+            found = collection.get(ids=ids, include=["embeddings"])
+            vectors = dict(zip(found["ids"], found["embeddings"]))
+            if all(i in vectors for i in ids):
+                chunk_embeddings = [vectors[i] for i in ids]
+        picked = pack_context(
+            token_counts, RAG_CONTEXT_TOKEN_BUDGET, query_embedding, chunk_embeddings,
+            RAG_CONTEXT_MMR_LAMBDA, RAG_CONTEXT_DUPLICATE_THRESHOLD,
+        )
+    context_tokens.observe(sum(token_counts[i] for i in picked))
+    return {key: [[results[key][0][i] for i in picked]] for key in PACKED_RESULT_KEYS if results.get(key)}
+
+def retrieval_pool_sizes(n_results: int, hybrid: bool) -> tuple[int, int]:
+    """
+    (candidate_n_results, vector_n_results): packing chooses from a wider pool than n_results,
+    and with hybrid retrieval the vector side in turn only contributes candidates to the fusion.
+    """
+    candidate_n_results = max(n_results, RAG_CONTEXT_CANDIDATES) if RAG_CONTEXT_TOKEN_BUDGET else n_results
+    vector_n_results = max(candidate_n_results, RAG_HYBRID_CANDIDATES) if hybrid else candidate_n_results
+    return candidate_n_results, vector_n_results
+
+def retrieve_context(query_text: str, n_results: int = 5, endpoint: str = "chat", chapter: int | None = None,
+                     prefetched: PrefetchedQueries | None = None):
+    """
+    Retrieval half of the RAG pipeline (caches, article lookup, embedding, vector query, BM25
+    fusion, context packing). chapter restricts retrieval to one chapter; by default it is taken from the question.
+    prefetched holds the vector search already done for a batch of questions (/chat/batch);
+    it takes the place of the query coalescer.
+    Returns (reply, retrieval): reply is a finished answer string when no generation is
+    needed (cache hit, empty database, nothing retrieved), otherwise None and retrieval
+    holds the retrieved chunks and what is needed to cache the final answer.
+    When reply is set, retrieval is {"outcome": ...} (the rag_requests_total label).
+    """
+    collection = get_collection()
+    query_coalescer = prefetched if prefetched is not None else get_query_coalescer()
+    lexical_index = _lexical_index
+    structure_index = _structure_index
+    candidate_n_results, vector_n_results = retrieval_pool_sizes(n_results, lexical_index is not None)
+
+    references = {"articles": [], "chapter": None}
+    if structure_index is not None:
+        references = parse_structure_references(query_text)
+        if chapter is None:
+            chapter = references["chapter"]
+        if chapter is not None and not structure_index.has_chapter(chapter):
+            logger.info(f"Chapter {chapter} is not in the structure index; searching all chapters.")
+            chapter = None
+    else:
+        chapter = None
+    if chapter is not None:
+        # The coalescer and batch prefetch cover unfiltered queries only
+        query_coalescer = None
+
+    normalized_query = normalize_query(query_text)
+    answer_key = (normalized_query, n_results, chapter)
+    cached_answer = rag_cache.answers.get_answer(answer_key)
+    if cached_answer is not None:
+        return cached_answer, {"outcome": "cached"}
+
+    if _collection_count == 0:
+        return "የመረጃ ቋቱ ባዶ ነው። እባክዎ ከመጠየቅዎ በፊት ሰነዶችን ይስቀሉ።", {"outcome": "empty_db"}
+
+    if references["articles"]:
+        results = lookup_articles(collection, structure_index, references["articles"], endpoint)
+        if results is not None:
+            results = pack_results(collection, results, None, endpoint)
+            return retrieved_context(query_text, n_results, answer_key, None, results)
+
+    query_embedding = rag_cache.embeddings.get(normalized_query)
+    if query_embedding is None and query_coalescer is None:
+        if prefetched is not None:
+            query_embedding = prefetched.embedding(query_text)
+        if query_embedding is None:
+            with timed_stage("embed", endpoint):
+                query_embedding = get_embedder().encode(query_text).tolist()
+        rag_cache.embeddings.put(normalized_query, query_embedding)
+
+    results = None
+    if query_embedding is not None:
+        cached_answer = rag_cache.answers.get_similar(query_embedding, n_results, chapter)
+        if cached_answer is not None:
+            return cached_answer, {"outcome": "cached"}
+        results = rag_cache.retrievals.get((embedding_key(query_embedding), n_results, chapter))
+
+    if results is None:
+        if query_coalescer is not None:
+            # Embedding (if not cached) and the ChromaDB lookup are batched with concurrent requests
+            embedding_was_cached = query_embedding is not None
+            with timed_stage("embed_retrieve", endpoint):
+                query_embedding, results = query_coalescer.submit(query_text, vector_n_results, query_embedding)
+            if not embedding_was_cached:
+                rag_cache.embeddings.put(normalized_query, query_embedding)
+                cached_answer = rag_cache.answers.get_similar(query_embedding, n_results, chapter)
+                if cached_answer is not None:
+                    return cached_answer, {"outcome": "cached"}
+        else:
+            with timed_stage("retrieve", endpoint):
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=vector_n_results,
+                    **({"where": {"chapter": chapter}} if chapter is not None else {}),
+                )
+        if lexical_index is not None:
+            with timed_stage("lexical", endpoint):
+                allowed_ids = structure_index.chapter_chunk_ids(chapter) if chapter is not None else None
+                lexical_hits = lexical_index.search(query_text, RAG_HYBRID_CANDIDATES, allowed_ids)
+                results = fuse_results(results, lexical_hits, collection, candidate_n_results)
+        results = pack_results(collection, results, query_embedding, endpoint)
+        rag_cache.retrievals.put((embedding_key(query_embedding), n_results, chapter), results)
+
+    return retrieved_context(query_text, n_results, answer_key, query_embedding, results)
+
+def retrieved_context(query_text: str, n_results: int, answer_key, query_embedding, results: dict):
+    """
+    Second half of retrieve_context: turns query results into the (reply, retrieval) pair.
+    """
+    if "documents" not in results or not results["documents"] or not results["documents"][0]:
+        logger.warning("'documents' key missing or empty in query results. No chunks retrieved.")
+        return "No matching context found in the database.", {"outcome": "no_context"}
+
+    retrieved_chunks = results["documents"][0]
+    retrieval = {
+        "answer_key": answer_key,
+        "query_embedding": query_embedding,
+        "chunks": retrieved_chunks,
+        "ids": results.get("ids", [[]])[0],
+        "distances": results.get("distances", [[]])[0],
+        "metadatas": (results.get("metadatas") or [[]])[0] or [{}] * len(retrieved_chunks),
+    }
+    retrieved_chunks_count.observe(len(retrieved_chunks))
+    if logger.isEnabledFor(logging.DEBUG):
+        log_retrieval(query_text, n_results, retrieval, logging.DEBUG)
+    elif RAG_DEBUG_SAMPLE_RATE and random.random() < RAG_DEBUG_SAMPLE_RATE:
+        log_retrieval(query_text, n_results, retrieval, logging.INFO)
+
+    if not "\n\n".join(retrieved_chunks).strip():
+        return "ከመረጃ ቋቱ ጋር የሚዛመድ መረጃ አልተገኘም። እባክዎ ጥያቄዎን በሌላ መንገድ ይሞክሩ።", {"outcome": "no_context"}
+
+    return None, retrieval
+
+def answer_from_retrieval(query_text: str, retrieval: dict, endpoint: str = "chat") -> tuple[str, str]:
+    """
+    Generation half of the RAG pipeline. Returns (answer, outcome); the answer is cached
+    only when the model produced it.
+    """
+    try:
+        final_answer = generate_answer(
+            llm_client,
+            query_text,
+            retrieval["chunks"],
+            retrieval["ids"],
+            mode=RAG_PIPELINE_MODE,
+            summary_cache=summary_cache,
+            timer=stage_timer(endpoint),
+        )
+    except LLMUnavailableError as e:
+        # Not cached: the next question should try the model again
+        logger.warning(f"Model unavailable, answering with the retrieved passages: {e}")
+        return degraded_reply(retrieval), "degraded"
+    if final_answer is None:
+        return "መልስ ማመንጨት አልተቻለም።", "no_answer"
+
+    rag_cache.answers.put_answer(retrieval["answer_key"], final_answer, retrieval["query_embedding"])
+    return final_answer, "answered"
+
+async def answer_from_retrieval_async(query_text: str, retrieval: dict, endpoint: str = "chat") -> tuple[str, str]:
+    """
+    answer_from_retrieval for the async server: the model calls are awaited.
+    """
+    try:
+        final_answer = await generate_answer_async(
+            async_llm_client,
+            query_text,
+            retrieval["chunks"],
+            retrieval["ids"],
+            mode=RAG_PIPELINE_MODE,
+            summary_cache=summary_cache,
+            timer=stage_timer(endpoint),
+        )
+    except LLMUnavailableError as e:
+        logger.warning(f"Model unavailable, answering with the retrieved passages: {e}")
+        return degraded_reply(retrieval), "degraded"
+    if final_answer is None:
+        return "መልስ ማመንጨት አልተቻለም።", "no_answer"
+
+    rag_cache.answers.put_answer(retrieval["answer_key"], final_answer, retrieval["query_embedding"])
+    return final_answer, "answered"
+
+def generate_rag_answer(query_text: str, n_results: int = 5, chapter: int | None = None) -> str:
+    if not backends_ready():
+        requests_total.inc(endpoint="chat", outcome="backend_unavailable")
         return "Backend services (ChromaDB or Embedder) are not initialized. Cannot generate answer."
 
+    start = time.perf_counter()
+    outcome = "error"
     try:
-        if collection.count() == 0:
-            return "የመረጃ ቋቱ ባዶ ነው። እባክዎ ከመጠየቅዎ በፊት ሰነዶችን ይስቀሉ።"
+        reply, retrieval = retrieve_context(query_text, n_results, endpoint="chat", chapter=chapter)
+        if reply is not None:
+            outcome = retrieval["outcome"]
+            return reply
 
-        query_embedding = embedder.encode(query_text).tolist()
+        final_answer, outcome = answer_from_retrieval(query_text, retrieval, endpoint="chat")
+        return final_answer
 
-        # --- START CRITICAL DEBUGGING ---
-        print(f"\nDEBUG INFO (RAG Query):")
-        print(f"  - Requested n_results: {n_results}") # What n_results is being used in this call
-        print(f"  - Total documents in collection: {collection.count()}") # How many total documents are there
+    except Exception as e:
+        return rag_error_reply(e, endpoint="chat")
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage="total", endpoint="chat")
+        requests_total.inc(endpoint="chat", outcome=outcome)
+
+def sse_event(event: str, data: dict) -> str:
+    """
+    Formats one Server-Sent Events message.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_rag_answer(query_text: str, n_results: int = 5, chapter: int | None = None):
+    """
+    Streaming variant of generate_rag_answer. Yields SSE messages:
+      meta  - retrieved chunk IDs/distances/metadata, sent as soon as retrieval finishes
+      token - {"text": ...} pieces of the answer as the model produces them
+      done  - end of the answer
+    Ready-made replies (cache hits, empty database, errors, the retrieved passages while the
+    model is unavailable) are sent as a single token.
+    """
+    if not backends_ready():
+        requests_total.inc(endpoint="chat_stream", outcome="backend_unavailable")
+        yield sse_event("token", {"text": "Backend services (ChromaDB or Embedder) are not initialized. Cannot generate answer."})
+        yield sse_event("done", {})
+        return
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        reply, retrieval = retrieve_context(query_text, n_results, endpoint="chat_stream", chapter=chapter)
+        if reply is not None:
+            outcome = retrieval["outcome"]
+            yield sse_event("meta", {"chunks": [], "cached": True})
+            yield sse_event("token", {"text": reply})
+            yield sse_event("done", {})
+            return
+
+        yield sse_event("meta", {
+            "cached": False,
+            "chunks": [
+                {"id": chunk_id, "distance": distance, "metadata": metadata}
+                for chunk_id, distance, metadata in zip(retrieval["ids"], retrieval["distances"], retrieval["metadatas"])
+            ],
+        })
+
+        answer_parts = []
+        try:
+            for text in stream_answer(
+                llm_client,
+                query_text,
+                retrieval["chunks"],
+                retrieval["ids"],
+                mode=RAG_PIPELINE_MODE,
+                summary_cache=summary_cache,
+                timer=stage_timer("chat_stream"),
+            ):
+                answer_parts.append(text)
+                yield sse_event("token", {"text": text})
+        except LLMUnavailableError as e:
+            # Raised before the first token, so nothing of an answer has been sent yet
+            logger.warning(f"Model unavailable, answering with the retrieved passages: {e}")
+            outcome = "degraded"
+            yield sse_event("token", {"text": degraded_reply(retrieval)})
+            yield sse_event("done", {})
+            return
+
+        final_answer = "".join(answer_parts)
+        if final_answer:
+            rag_cache.answers.put_answer(retrieval["answer_key"], final_answer, retrieval["query_embedding"])
+            outcome = "answered"
+        else:
+            outcome = "no_answer"
+            yield sse_event("token", {"text": "መልስ ማመንጨት አልተቻለም።"})
+        yield sse_event("done", {})
 
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            # include=['documents', 'distances', 'metadatas', 'ids'] # Ensure all are included for debugging
+    except Exception as e:
+        yield sse_event("error", {"message": rag_error_reply(e, endpoint="chat_stream")})
+    finally:
+        # Also reached when the client disconnects mid-stream (GeneratorExit)
+        stage_seconds.observe(time.perf_counter() - start, stage="total", endpoint="chat_stream")
+        requests_total.inc(endpoint="chat_stream", outcome=outcome)
+
+def parse_chapter(chapter) -> int | None:
+    """
+    A chapter given by a client: a number, an Amharic/Ethiopic numeral, or empty for none.
+    Raises ValueError if it is not a chapter number.
+    """
+    if chapter is None or chapter == "":
+        return None
+    number = chapter if isinstance(chapter, int) else parse_amharic_number(str(chapter))
+    if number is None:
+        raise ValueError(f"Invalid chapter: {chapter!r}")
+    return number
+
+def parse_batch_item(item, position: int) -> dict:
+    """
+    One batch question: a string, or an object with "question" (or "message") and optional
+    "id" and "chapter". Any other fields (e.g. expected_articles) are carried over to the
+    result. Raises ValueError if the question is missing or the chapter is invalid.
+    """
+    if isinstance(item, str):
+        item = {"question": item}
+    if not isinstance(item, dict):
+        raise ValueError(f"Question {position}: expected a string or an object, got {type(item).__name__}.")
+    question = item.get("question") or item.get("message")
+    if not question or not isinstance(question, str):
+        raise ValueError(f"Question {position}: no question provided.")
+    try:
+        chapter = parse_chapter(item.get("chapter"))
+    except ValueError as e:
+        raise ValueError(f"Question {position}: {e}") from None
+    extra = {key: value for key, value in item.items() if key not in ("id", "question", "message", "chapter")}
+    return {"id": item.get("id", position), "question": question, "chapter": chapter, "extra": extra}
+
+def parse_batch_jsonl(lines) -> list[dict]:
+    """
+    Batch questions from JSONL (one question per line, blank lines skipped), numbered from 1.
+    """
+    items = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e.msg}).") from None
+        items.append(parse_batch_item(item, len(items) + 1))
+    return items
+
+def answer_batch(items: list[dict], n_results: int = 5, concurrency: int = RAG_BATCH_CONCURRENCY) -> dict:
+    """
+    Answers parsed batch items (see parse_batch_item). Returns {"results": [...], "timings": {...}}:
+    one result per item, in order, with its answer, outcome, retrieved chunk IDs and articles,
+    its own stage timings and seconds spent on it; timings holds the stages shared by the
+    whole batch (batch_embed and batch_retrieve, one call each) and its total.
+    """
+    start = time.perf_counter()
+    batch_timings = {}
+    results = [
+        {**item["extra"], "id": item["id"], "question": item["question"], "answer": None, "outcome": "error",
+         "retrieved_ids": [], "articles": [], "timings": {}, "seconds": 0.0}
+        for item in items
+    ]
+    if not backends_ready():
+        for result in results:
+            result["answer"] = "Backend services (ChromaDB or Embedder) are not initialized. Cannot generate answer."
+            result["outcome"] = "backend_unavailable"
+            requests_total.inc(endpoint="batch", outcome="backend_unavailable")
+        return {"results": results, "timings": {"total": round(time.perf_counter() - start, 4)}}
+
+    prefetched = None
+    token = _request_timings.set(batch_timings)
+    try:
+        _, vector_n_results = retrieval_pool_sizes(n_results, _lexical_index is not None)
+        questions = [item["question"] for item in items]
+        prefetched = PrefetchedQueries(
+            get_embedder(),
+            get_collection(),
+            questions,
+            vector_n_results,
+            [rag_cache.embeddings.get(normalize_query(question)) for question in questions],
+            timer=lambda stage: timed_stage(f"batch_{stage}", "batch"),
         )
-        
-        if "documents" not in results or not results["documents"] or not results["documents"][0]:
-            print("  - WARNING: 'documents' key missing or empty in query results. No chunks retrieved.")
-            return "No matching context found in the database."
-
-        retrieved_chunks = results["documents"][0]
-        retrieved_ids = results.get("ids", [[]])[0]
-        retrieved_distances = results.get("distances", [[]])[0]
-
-        print(f"  - Actual number of chunks retrieved by ChromaDB: {len(retrieved_chunks)}") # How many chunks ChromaDB returned
-
-        # Print details for the first few retrieved chunks
-        for i in range(min(len(retrieved_chunks), 5)): # Print details for up to 5 chunks
-            print(f"    Chunk {i+1} (ID: {retrieved_ids[i]}, Distance: {retrieved_distances[i]:.4f}):")
-            print(f"      Text Length: {len(retrieved_chunks[i])} characters")
-            print(f"      Text Start: '{retrieved_chunks[i][:150]}...'") # Print start of text
-            print(f"      Metadata: {results.get('metadatas', [{}])[0][i]}")
-
-        print("--- END CRITICAL DEBUGGING ---\n")
-
-        context = "\n\n".join(retrieved_chunks)
-        
-        # This print will now show the combined context, but after you've seen the debug info
-        print("--- COMBINED CONTEXT SENT TO LLM (first 1000 chars) ---")
-        print(context[:1000] + "..." if len(context) > 1000 else context)
-        print("------------------------------------------------------\n")
-        if not context.strip():
-            return "ከመረጃ ቋቱ ጋር የሚዛመድ መረጃ አልተገኘም። እባክዎ ጥያቄዎን በሌላ መንገድ ይሞክሩ።"
-
-        first_prompt = f"""
-        እርስዎ አጋዥ የ AI ረዳት ነዎት። ከቀረበው የአማርኛ ጽሑፍ ውስጥ ዋና ዋና ነጥቦችን እና ዝርዝሮችን ሳይለቁ ጠቅለል ያለ ማጠቃለያ ይፍጠሩ።
-
-        ጽሑፍ:
-        {context}
-        """
-        res_summary_obj = gemini_model.generate_content(first_prompt)
-        summarized_context = res_summary_obj.text if res_summary_obj and hasattr(res_summary_obj, 'text') else "No summary could be generated from the provided context."
-
-        final_prompt = f"""
-        እርስዎ አጋዥ የ AI ረዳት ነዎት። ጥያቄውን ለመመለስ የቀረበውን ጽሑፍ ብቻ ይጠቀሙ።
-
-        ጽሑፍ:
-        {summarized_context}
-
-        ጥያቄ:
-        {query_text}
-
-        መልሱን ግልጽ እና አጭር በሆነ መንገድ በጽሑፉ ላይ ብቻ በመመስረት ይመልሱ።
-        """
-        response_obj = gemini_model.generate_content(final_prompt)
-        final_answer = response_obj.text if response_obj and hasattr(response_obj, 'text') else "መልስ ማመንጨት አልተቻለም።"
-
-        return final_answer
-
     except Exception as e:
-        print(f"An error occurred during RAG generation: {e}")
-        if "dimension" in str(e).lower() and "expecting embedding with dimension" in str(e).lower():
-            return "የመረጃ ቋቱ እና የማመንጫ ሞዴሉ እኩል ያልሆኑ ልኬቶች አላቸው። እባክዎ ፋይል ከሰቀሉ በኋላ መተግበሪያውን እንደገና ያስጀምሩት።"
-        return f"ጥያቄዎን ሲያስተናግድ ስህተት ተፈጥሯል። እባክዎ እንደገና ይሞክሩ። ስህተት: {e}"
+        # Every question is retried on its own below and reports its own error
+        logger.warning(f"Batch retrieval failed, retrieving question by question: {e}")
+    finally:
+        _request_timings.reset(token)
+
+    def traced(result: dict, step):
+        timings = result["timings"]
+        token = _request_timings.set(timings)
+        step_start = time.perf_counter()
+        try:
+            return step()
+        except Exception as e:
+            result["answer"], result["outcome"] = rag_error_reply(e, endpoint="batch"), "error"
+        finally:
+            result["seconds"] += time.perf_counter() - step_start
+            _request_timings.reset(token)
+
+    # Retrieval runs in order on this thread: with the vector search done it is cheap
+    pending = []
+    for item, result in zip(items, results):
+        def retrieve(item=item, result=result):
+            reply, retrieval = retrieve_context(item["question"], n_results, "batch", item["chapter"], prefetched)
+            if reply is not None:
+                result["answer"], result["outcome"] = reply, retrieval["outcome"]
+                return
+            result["retrieved_ids"] = list(retrieval["ids"])
+            result["articles"] = sorted({m["article"] for m in retrieval["metadatas"] if m and m.get("article") is not None})
+            pending.append((item, result, retrieval))
+        traced(result, retrieve)
+
+    def generate(task):
+        item, result, retrieval = task
+        def step():
+            result["answer"], result["outcome"] = answer_from_retrieval(item["question"], retrieval, endpoint="batch")
+        traced(result, step)
+
+    if pending:
+        # llm_client caps outstanding model calls per process; this caps the batch's share of them
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+            list(pool.map(generate, pending))
+
+    for result in results:
+        stage_seconds.observe(result["seconds"], stage="total", endpoint="batch")
+        requests_total.inc(endpoint="batch", outcome=result["outcome"])
+        result["timings"] = {stage: round(seconds, 4) for stage, seconds in result["timings"].items()}
+        result["seconds"] = round(result["seconds"], 4)
+    batch_timings["total"] = time.perf_counter() - start
+    return {"results": results, "timings": {stage: round(seconds, 4) for stage, seconds in batch_timings.items()}}
 
 
 # --- Flask Routes ---
@@ -147,34 +888,115 @@ def generate_rag_answer(query_text: str, n_results: int = 5) -> str:
 def index():
     return render_template('index.html')
 
+def requested_chapter():
+    """
+    Optional "chapter" of a /chat request body (a number, or an Amharic/Ethiopic numeral).
+    Raises ValueError if it is given but not a chapter number.
+    """
+    return parse_chapter(request.json.get('chapter'))
+
 @app.route('/chat', methods=['POST'])
 def chat():
     user_message = request.json.get('message')
     if not user_message:
         return jsonify({"response": "No message provided."}), 400
+    try:
+        chapter = requested_chapter()
+    except ValueError as e:
+        return jsonify({"response": str(e)}), 400
 
-    bot_response = generate_rag_answer(user_message)
+    bot_response = generate_rag_answer(user_message, chapter=chapter)
     return jsonify({"response": bot_response})
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    user_message = request.json.get('message')
+    if not user_message:
+        return jsonify({"response": "No message provided."}), 400
+    try:
+        chapter = requested_chapter()
+    except ValueError as e:
+        return jsonify({"response": str(e)}), 400
+
+    return Response(
+        stream_with_context(stream_rag_answer(user_message, chapter=chapter)),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Answers many questions in one request. Either JSON, {"questions": [...], "n_results": 5},
+    answered with {"results": [...], "timings": {...}}, or a JSONL body (one question per line,
+    see parse_batch_item), answered with one JSON result per line. n_results can also be
+    given as a query parameter.
+    """
+    try:
+        if request.is_json:
+            body = request.get_json()
+            questions = body.get("questions") if isinstance(body, dict) else None
+            if not isinstance(questions, list):
+                return jsonify({"response": "Expected {\"questions\": [...]}."}), 400
+            items = [parse_batch_item(item, position) for position, item in enumerate(questions, 1)]
+            n_results = body.get("n_results", request.args.get("n_results", 5))
+        else:
+            items = parse_batch_jsonl(request.get_data(as_text=True).splitlines())
+            n_results = request.args.get("n_results", 5)
+        n_results = int(n_results)
+    except (ValueError, TypeError) as e:
+        return jsonify({"response": str(e)}), 400
+    if not items:
+        return jsonify({"response": "No questions provided."}), 400
+    if len(items) > RAG_BATCH_MAX_QUESTIONS:
+        return jsonify({"response": f"At most {RAG_BATCH_MAX_QUESTIONS} questions per batch, got {len(items)}."}), 400
+    if not 1 <= n_results <= 50:
+        return jsonify({"response": "n_results must be between 1 and 50."}), 400
+
+    batch = answer_batch(items, n_results)
+    if request.is_json:
+        return jsonify(batch)
+    lines = "".join(json.dumps(result, ensure_ascii=False) + "\n" for result in batch["results"])
+    return Response(lines, mimetype="application/x-ndjson", headers={"X-Batch-Timings": json.dumps(batch["timings"])})
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = rag_cache.stats()
+    stats["pipeline_mode"] = RAG_PIPELINE_MODE
+    if summary_cache is not None:
+        stats["summaries"] = summary_cache.stats()
+    if _query_coalescer is not None:
+        stats["coalescer"] = _query_coalescer.stats()
+    stats["llm"] = llm_stats()
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
 # Removed the @app.route('/upload', methods=['POST']) function entirely
 
-@app.route('/clear_db', methods=['POST'])
-def clear_database():
+def clear_collection() -> dict:
+    """
+    Publishes a new, empty version of the collection instead of deleting files under the
+    running app; the old version is garbage-collected after the grace period.
+    Returns the /clear_db response body and status.
+    """
     try:
-        if os.path.exists(CHROMA_DB_PATH):
-            shutil.rmtree(CHROMA_DB_PATH)
-            os.makedirs(CHROMA_DB_PATH, exist_ok=True)
-            
-            global collection
-            global chroma_client
-            chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-            collection = chroma_client.get_or_create_collection(name=RAG_COLLECTION_NAME)
-            print(f"ChromaDB at {CHROMA_DB_PATH} cleared. Collection '{RAG_COLLECTION_NAME}' re-created.")
-            return jsonify({"status": "success", "message": "ChromaDB has been cleared and re-initialized. Please restart the application."})
-        else:
-            return jsonify({"status": "warning", "message": "ChromaDB directory does not exist, nothing to clear."})
+        build_name, _, _ = start_collection_build(RAG_COLLECTION_NAME, seed=False)
+        finish_collection_build(RAG_COLLECTION_NAME, build_name)
+        rag_cache.invalidate()
+        if summary_cache is not None:
+            summary_cache.clear()
+        print(f"{VECTOR_BACKEND} collection '{RAG_COLLECTION_NAME}' cleared; now serving empty version '{build_name}'.")
+        return {"status": "success", "message": f"ChromaDB collection '{RAG_COLLECTION_NAME}' has been cleared."}, 200
     except Exception as e:
-        return jsonify({"status": "error", "message": f"Error clearing database: {e}"}), 500
+        return {"status": "error", "message": f"Error clearing database: {e}"}, 500
+
+@app.route('/clear_db', methods=['POST'])
+def clear_database():
+    body, status = clear_collection()
+    return jsonify(body), status
 
 
 # --- Run the Flask App ---
@@ -0,0 +1,200 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from quart import Quart, Response, jsonify, render_template, request
+
+# The pipeline, caches, metrics and settings are app.py's; this module only serves them
+import app as rag
+from llm_client import LLMUnavailableError
+from rag_pipeline import stream_answer_async
+
+# --- Async Server ---
+# asyncio (ASGI) serving mode for the UI's routes (/, /chat, /chat/stream, /clear_db); launch it
+# with gunicorn_async.conf.py.
+# Same pipeline as the Flask app, but a question no longer holds a thread for its whole life:
+#   - retrieval (query embedding, vector search, BM25 fusion, packing) is CPU-bound and runs on
+#     a dedicated pool of RAG_ASYNC_RETRIEVAL_WORKERS threads, never on the event loop; with
+#     coalescing on, concurrent questions still share one encode/query batch, so the pool
+#     defaults to the coalescer's batch size
+#   - the LLM calls are awaited through llm_client.AsyncGeneratorClient, so a question waiting
+#     on the model costs a coroutine, and one process keeps up to RAG_LLM_ASYNC_MAX_CONCURRENCY
+#     questions in flight
+# /chat/batch is served by the Flask app (gunicorn.conf.py).
+RAG_ASYNC_RETRIEVAL_WORKERS = int(os.getenv("RAG_ASYNC_RETRIEVAL_WORKERS", str(rag.RAG_COALESCE_MAX_BATCH)))
+
+app = Quart(__name__)
+
+# Per-process pool, re-created after a fork like app.py's handles
+_retrieval_executor = None
+_retrieval_executor_pid = None
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    global _retrieval_executor, _retrieval_executor_pid
+    if _retrieval_executor is None or _retrieval_executor_pid != os.getpid():
+        _retrieval_executor = ThreadPoolExecutor(max_workers=RAG_ASYNC_RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        _retrieval_executor_pid = os.getpid()
+    return _retrieval_executor
+
+async def off_loop(function, *args, **kwargs):
+    """
+    Runs a blocking call (model inference, vector store access) on the retrieval pool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_retrieval_executor(), partial(function, *args, **kwargs))
+
+
+# --- RAG Logic Functions ---
+async def generate_rag_answer_async(query_text: str, n_results: int = 5, chapter: int | None = None) -> str:
+    """
+    app.generate_rag_answer for the event loop.
+    """
+    if not await off_loop(rag.backends_ready):
+        rag.requests_total.inc(endpoint="chat", outcome="backend_unavailable")
+        return "Backend services (ChromaDB or Embedder) are not initialized. Cannot generate answer."
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        reply, retrieval = await off_loop(rag.retrieve_context, query_text, n_results, endpoint="chat", chapter=chapter)
+        if reply is not None:
+            outcome = retrieval["outcome"]
+            return reply
+
+        final_answer, outcome = await rag.answer_from_retrieval_async(query_text, retrieval, endpoint="chat")
+        return final_answer
+
+    except Exception as e:
+        return rag.rag_error_reply(e, endpoint="chat")
+    finally:
+        # Also reached when the client disconnects and the request is cancelled
+        rag.stage_seconds.observe(time.perf_counter() - start, stage="total", endpoint="chat")
+        rag.requests_total.inc(endpoint="chat", outcome=outcome)
+
+
+async def stream_rag_answer_async(query_text: str, n_results: int = 5, chapter: int | None = None):
+    """
+    app.stream_rag_answer for the event loop: the same SSE messages (meta, token, done, error).
+    """
+    sse_event = rag.sse_event
+    if not await off_loop(rag.backends_ready):
+        rag.requests_total.inc(endpoint="chat_stream", outcome="backend_unavailable")
+        yield sse_event("token", {"text": "Backend services (ChromaDB or Embedder) are not initialized. Cannot generate answer."})
+        yield sse_event("done", {})
+        return
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        reply, retrieval = await off_loop(rag.retrieve_context, query_text, n_results, endpoint="chat_stream", chapter=chapter)
+        if reply is not None:
+            outcome = retrieval["outcome"]
+            yield sse_event("meta", {"chunks": [], "cached": True})
+            yield sse_event("token", {"text": reply})
+            yield sse_event("done", {})
+            return
+
+        yield sse_event("meta", {
+            "cached": False,
+            "chunks": [
+                {"id": chunk_id, "distance": distance, "metadata": metadata}
+                for chunk_id, distance, metadata in zip(retrieval["ids"], retrieval["distances"], retrieval["metadatas"])
+            ],
+        })
+
+        answer_parts = []
+        try:
+            async for text in stream_answer_async(
+                rag.async_llm_client,
+                query_text,
+                retrieval["chunks"],
+                retrieval["ids"],
+                mode=rag.RAG_PIPELINE_MODE,
+                summary_cache=rag.summary_cache,
+                timer=rag.stage_timer("chat_stream"),
+            ):
+                answer_parts.append(text)
+                yield sse_event("token", {"text": text})
+        except LLMUnavailableError as e:
+            # Raised before the first token, so nothing of an answer has been sent yet
+            rag.logger.warning(f"Model unavailable, answering with the retrieved passages: {e}")
+            outcome = "degraded"
+            yield sse_event("token", {"text": rag.degraded_reply(retrieval)})
+            yield sse_event("done", {})
+            return
+
+        final_answer = "".join(answer_parts)
+        if final_answer:
+            rag.rag_cache.answers.put_answer(retrieval["answer_key"], final_answer, retrieval["query_embedding"])
+            outcome = "answered"
+        else:
+            outcome = "no_answer"
+            yield sse_event("token", {"text": "መልስ ማመንጨት አልተቻለም።"})
+        yield sse_event("done", {})
+
+    except Exception as e:
+        yield sse_event("error", {"message": rag.rag_error_reply(e, endpoint="chat_stream")})
+    finally:
+        # Also reached when the client disconnects mid-stream (the generator is closed)
+        rag.stage_seconds.observe(time.perf_counter() - start, stage="total", endpoint="chat_stream")
+        rag.requests_total.inc(endpoint="chat_stream", outcome=outcome)
+
+
+# --- Quart Routes ---
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    body = await request.get_json(silent=True) or {}
+    user_message = body.get('message')
+    if not user_message:
+        return jsonify({"response": "No message provided."}), 400
+    try:
+        chapter = rag.parse_chapter(body.get('chapter'))
+    except ValueError as e:
+        return jsonify({"response": str(e)}), 400
+
+    bot_response = await generate_rag_answer_async(user_message, chapter=chapter)
+    return jsonify({"response": bot_response})
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    body = await request.get_json(silent=True) or {}
+    user_message = body.get('message')
+    if not user_message:
+        return jsonify({"response": "No message provided."}), 400
+    try:
+        chapter = rag.parse_chapter(body.get('chapter'))
+    except ValueError as e:
+        return jsonify({"response": str(e)}), 400
+
+    response = Response(
+        stream_rag_answer_async(user_message, chapter=chapter),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # The answer can take longer than Quart's default response timeout
+    response.timeout = None
+    return response
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    return Response(rag.metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route('/clear_db', methods=['POST'])
+async def clear_database():
+    body, status = await off_loop(rag.clear_collection)
+    return jsonify(body), status
+
+@app.after_serving
+async def shutdown_retrieval_executor():
+    if _retrieval_executor is not None and _retrieval_executor_pid == os.getpid():
+        _retrieval_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Run the Quart App ---
+if __name__ == '__main__':
+    app.run(debug=True, port=5000)
@@ -0,0 +1,139 @@
+# batch_answer.py
+# Answers a JSONL file of questions through the RAG pipeline, batch by batch, on the same code
+# path as POST /chat/batch (app.answer_batch): each batch is embedded in one encode call and
+# looked up with one multi-embedding collection.query, and up to --concurrency answers are
+# generated at a time. Writes one JSON result per line:
+#   {"id", "question", "answer", "outcome", "retrieved_ids", "articles", "timings", "seconds", ...}
+# where timings are the question's own stages in seconds; fields of the input line other than
+# id/question/chapter (e.g. expected_articles) are carried over. A summary goes to stderr:
+# throughput, per-question latency percentiles and, for questions with "expected_articles",
+# the share whose retrieved chunks include one of those articles.
+#
+# Input lines are a question string or {"question", "id", "chapter", ...}.
+#
+# Examples:
+#   python batch_answer.py questions.jsonl -o answers.jsonl
+#   python batch_answer.py questions.jsonl --embedder stub --llm stub --batch-size 32
+#   cat questions.jsonl | python batch_answer.py - > answers.jsonl
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from bench_utils import percentile
+
+# Backends are read by app/model_registry at import, so they are set before importing the app
+EMBEDDER_CHOICES = ("sentence_transformers", "stub")
+LLM_CHOICES = ("gemini", "stub", "fake")
+
+
+def configure_backends(embedder: str | None = None, llm: str | None = None):
+    if embedder:
+        os.environ["RAG_EMBEDDER_BACKEND"] = embedder
+        if embedder == "stub":
+            # No tokenizer download either
+            os.environ.setdefault("RAG_TOKEN_COUNTER", "estimate")
+    if llm:
+        os.environ["RAG_LLM_BACKEND"] = llm
+
+def run_batches(items: list[dict], batch_size: int, n_results: int = 5, concurrency: int | None = None, on_result=None) -> dict:
+    """
+    Answers parsed items (app.parse_batch_item) batch_size at a time.
+    Returns {"results", "batch_seconds", "batch_timings", "wall_s"}; on_result is called with
+    each result as soon as its batch finishes.
+    """
+    import app
+    concurrency = concurrency or app.RAG_BATCH_CONCURRENCY
+    batch_size = max(1, min(batch_size, app.RAG_BATCH_MAX_QUESTIONS))
+    results, batch_seconds, batch_timings = [], [], []
+    start = time.perf_counter()
+    for offset in range(0, len(items), batch_size):
+        batch_start = time.perf_counter()
+        batch = app.answer_batch(items[offset:offset + batch_size], n_results, concurrency)
+        batch_seconds.append(time.perf_counter() - batch_start)
+        batch_timings.append(batch["timings"])
+        for result in batch["results"]:
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return {"results": results, "batch_seconds": batch_seconds, "batch_timings": batch_timings,
+            "wall_s": time.perf_counter() - start}
+
+def is_hit(result: dict) -> bool:
+    return bool(set(result.get("expected_articles") or []) & set(result["articles"]))
+
+def summarize(run: dict) -> dict:
+    """
+    Throughput, latency and hit rate of a run_batches result. Cached answers carry no
+    retrieval, so they are left out of the hit rate.
+    """
+    results = run["results"]
+    seconds = [result["seconds"] for result in results]
+    graded = [result for result in results if result.get("expected_articles") and result["outcome"] != "cached"]
+    outcomes = {}
+    for result in results:
+        outcomes[result["outcome"]] = outcomes.get(result["outcome"], 0) + 1
+    return {
+        "questions": len(results),
+        "wall_s": run["wall_s"],
+        "questions_per_s": len(results) / run["wall_s"] if run["wall_s"] > 0 else 0.0,
+        "p50": percentile(seconds, 50) if seconds else 0.0,
+        "p95": percentile(seconds, 95) if seconds else 0.0,
+        "p99": percentile(seconds, 99) if seconds else 0.0,
+        "batch_p50": percentile(run["batch_seconds"], 50) if run["batch_seconds"] else 0.0,
+        "batch_max": max(run["batch_seconds"], default=0.0),
+        "graded": len(graded),
+        "hit_rate": sum(map(is_hit, graded)) / len(graded) if graded else None,
+        "outcomes": outcomes,
+    }
+
+def format_summary(summary: dict) -> str:
+    hit_rate = f"{summary['hit_rate']:.1%} of {summary['graded']}" if summary["hit_rate"] is not None else "-"
+    return (
+        f"{summary['questions']} questions in {summary['wall_s']:.2f}s ({summary['questions_per_s']:.2f} q/s); "
+        f"per question p50 {summary['p50']:.3f}s, p95 {summary['p95']:.3f}s, p99 {summary['p99']:.3f}s; "
+        f"per batch p50 {summary['batch_p50']:.3f}s, max {summary['batch_max']:.3f}s; "
+        f"hit rate {hit_rate}; outcomes {summary['outcomes']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions through the RAG pipeline in batches.")
+    parser.add_argument("questions", help="JSONL file of questions ('-' for stdin).")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file for the results (default: stdout).")
+    parser.add_argument("--batch-size", type=int, default=64, help="Questions embedded and looked up together.")
+    parser.add_argument("--concurrency", type=int, default=None, help="Answers generated at a time (default: RAG_BATCH_CONCURRENCY).")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--embedder", choices=EMBEDDER_CHOICES, help="Embedder backend (default: RAG_EMBEDDER_BACKEND).")
+    parser.add_argument("--llm", choices=LLM_CHOICES, help="LLM backend (default: RAG_LLM_BACKEND).")
+    args = parser.parse_args()
+
+    configure_backends(args.embedder, args.llm)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    # The app's status messages go to stderr so stdout carries nothing but results
+    with contextlib.redirect_stdout(sys.stderr):
+        import app
+
+        with (sys.stdin if args.questions == "-" else open(args.questions, encoding="utf-8")) as f:
+            try:
+                items = app.parse_batch_jsonl(f)
+            except ValueError as e:
+                parser.error(str(e))
+        if not items:
+            parser.error("No questions found.")
+
+        def write(result):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+        try:
+            run = run_batches(items, args.batch_size, args.n_results, args.concurrency, on_result=write)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    print(format_summary(summarize(run)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+# bench_async_serving.py
+# Load test of /chat on the sync server (Flask, gunicorn.conf.py) against the async server
+# (Quart, gunicorn_async.conf.py). Each server is started with its production config, then
+# held at each concurrency level: that many clients post distinct questions back to back.
+# For every level it reports throughput, latency percentiles and failed requests, which shows
+# how many concurrent questions each server can carry. The sync server is bounded by
+# workers x threads requests at a time; the async one by the model, not by threads.
+#
+# By default the document is ingested with the stub embedder into a collection of its own,
+# and the model is the fake LLM with a fixed latency, so the test runs offline and the
+# numbers show the serving path rather than the model.
+#
+# Examples:
+#   python bench_async_serving.py --levels 16,64,256 --llm-latency 0.5
+#   RAG_WORKERS=4 RAG_THREADS=16 python bench_async_serving.py --servers sync
+#   python bench_async_serving.py --url http://127.0.0.1:5000 --levels 32   # an already running server
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from bench_utils import percentile
+
+SERVERS = {
+    "sync": ("gunicorn.conf.py", "app:app"),
+    "async": ("gunicorn_async.conf.py", "asgi_app:app"),
+}
+TOPICS = ["የዜጎች መብት", "የፌዴራል መንግሥት ሥልጣን", "የክልሎች ሥልጣን", "የፍርድ ቤቶች ነፃነት", "የመሬት ባለቤትነት", "ሰንደቅ ዓላማ"]
+
+def post_chat(connection: http.client.HTTPConnection, message: str) -> int:
+    body = json.dumps({"message": message}, ensure_ascii=False).encode("utf-8")
+    connection.request("POST", "/chat", body=body, headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+def wait_until_ready(url: str, timeout_seconds: float, server: subprocess.Popen | None = None):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f"The server exited with code {server.returncode} before it was ready.")
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout_seconds)
+            # The first question loads the embedder and collection in the worker
+            if post_chat(connection, "ሰንደቅ ዓላማ") == 200:
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise SystemExit(f"{url} did not answer within {timeout_seconds:.0f}s.")
+
+def run_level(url: str, concurrency: int, requests: int, timeout: float, level_number: int) -> dict:
+    parts = urlsplit(url)
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        nonlocal failures
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            # Distinct questions, so no answer comes from the cache
+            message = f"ስለ {TOPICS[i % len(TOPICS)]} ምን ይላል? ({level_number}-{i})"
+            start = time.perf_counter()
+            try:
+                ok = post_chat(connection, message) == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    failures += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "failed": failures,
+        "throughput_rps": len(latencies) / wall,
+        "p50": percentile(latencies, 50) if latencies else float("nan"),
+        "p95": percentile(latencies, 95) if latencies else float("nan"),
+        "p99": percentile(latencies, 99) if latencies else float("nan"),
+    }
+
+def print_levels(name: str, url: str, args):
+    print(f"\n{name} ({url})")
+    print(f"{'clients':>8}{'ok':>7}{'failed':>8}{'req/s':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}")
+    for level_number, concurrency in enumerate(int(level) for level in args.levels.split(",")):
+        requests = max(concurrency * args.rounds, concurrency)
+        r = run_level(url, concurrency, requests, args.timeout, level_number)
+        print(f"{r['concurrency']:>8}{r['ok']:>7}{r['failed']:>8}{r['throughput_rps']:>8.1f}{r['p50']:>8.2f}{r['p95']:>8.2f}{r['p99']:>8.2f}")
+
+def prepare_collection(args):
+    """
+    Ingests the document into the benchmark collection (incremental: only the first run embeds).
+    """
+    from data_ingestion import ingest_document
+    result = ingest_document(args.document, os.environ["RAG_COLLECTION_NAME"])
+    if result["status"] != "success":
+        raise SystemExit(result["message"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /chat capacity of the sync and async servers.")
+    parser.add_argument("--servers", default="sync,async", help="Comma-separated subset of sync,async.")
+    parser.add_argument("--levels", default="8,32,128,256", help="Comma-separated numbers of concurrent clients.")
+    parser.add_argument("--rounds", type=int, default=3, help="Questions per client at each level.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request (s).")
+    parser.add_argument("--port", type=int, default=5099, help="Port the servers are started on.")
+    parser.add_argument("--url", help="Load an already running server instead of starting them.")
+    parser.add_argument("--document", default="constitution-amh.pdf", help="Document to ingest into the benchmark collection.")
+    parser.add_argument("--real-embedder", action="store_true", help="Use the SentenceTransformer instead of the stub embedder.")
+    parser.add_argument("--llm", choices=("fake", "stub", "gemini"), default="fake")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM latency per call (s).")
+    args = parser.parse_args()
+
+    if args.url:
+        wait_until_ready(args.url, args.timeout)
+        print_levels("server", args.url, args)
+        return
+
+    # Read by the servers (and by data_ingestion here) at import
+    if not args.real_embedder:
+        os.environ["RAG_EMBEDDER_BACKEND"] = "stub"
+        os.environ.setdefault("RAG_TOKEN_COUNTER", "estimate")
+    os.environ.setdefault("RAG_COLLECTION_NAME", f"bench_{'st' if args.real_embedder else 'stub'}")
+    os.environ["RAG_LLM_BACKEND"] = args.llm
+    os.environ.setdefault("RAG_FAKE_LLM_LATENCY_SECONDS", str(args.llm_latency))
+    for setting in ("RAG_FAKE_LLM_LATENCY_SIGMA", "RAG_FAKE_LLM_TAIL_RATE", "RAG_FAKE_LLM_ERROR_RATE", "RAG_FAKE_LLM_RATE_LIMIT_RATE"):
+        os.environ.setdefault(setting, "0")
+    prepare_collection(args)
+
+    url = f"http://127.0.0.1:{args.port}"
+    for name in args.servers.split(","):
+        config, target = SERVERS[name]
+        env = dict(os.environ, RAG_BIND=f"127.0.0.1:{args.port}")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", config, target],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_ready(url, 120, server)
+            print_levels(f"{name}: gunicorn -c {config} {target}", url, args)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main()
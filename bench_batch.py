@@ -0,0 +1,130 @@
+# bench_batch.py
+# Repeatable benchmark of the batch question-answering path over a document (by default
+# constitution-amh.pdf). The document is ingested into a benchmark collection of its own
+# (RAG_COLLECTION_NAME, incremental, so later runs embed nothing), a question set with known
+# answers is drawn from its structure index, and the same questions are answered:
+#   one-by-one  - batches of one, answered in order (what sending them to /chat one at a time costs)
+#   batch       - batches of --batch-size with --concurrency answers generated at a time
+# Reported per run: throughput, per-question latency percentiles, batch latency, and hit rate,
+# the share of questions whose retrieved chunks include the article the question was taken from.
+#
+# Questions are either a span of --question-words words from one of an article's chunks
+# (retrieved semantically) or, for a --reference-share of them, "አንቀጽ N ምን ይላል?" (answered by
+# the article lookup). --write-questions saves the set as JSONL for batch_answer.py;
+# --questions-file runs a saved or hand-written set instead.
+#
+# Examples:
+#   python bench_batch.py --stub-embedder --llm stub --questions 200
+#   python bench_batch.py --llm fake --latency 0.5 --batch-size 32 --concurrency 16
+#   python bench_batch.py --questions-file questions.jsonl --configs batch
+import argparse
+import json
+import os
+import random
+
+from batch_answer import LLM_CHOICES, configure_backends, run_batches, summarize
+
+CONFIGS = ("one-by-one", "batch")
+
+
+def make_questions(app, count: int, words: int, reference_share: float, seed: int) -> list[dict]:
+    """
+    Distinct questions with their expected article, drawn from the live collection's
+    structure index (fewer than count if the document is too small to yield that many).
+    A repeated question would be answered from the answer cache, which is not what is measured.
+    """
+    collection = app.get_collection()
+    index = app._structure_index
+    if index is None or not len(index):
+        raise SystemExit("The benchmark collection has no structure index (is RAG_STRUCTURE_LOOKUP off?).")
+    rng = random.Random(seed)
+    articles = sorted(int(article) for article in index.articles)
+    questions, seen = [], set()
+    for _ in range(count * 20):
+        if len(questions) == count:
+            break
+        article = rng.choice(articles)
+        if rng.random() < reference_share:
+            question = f"አንቀጽ {article} ምን ይላል?"
+        else:
+            chunk_id = rng.choice(index.article_chunk_ids(article))
+            text = collection.get(ids=[chunk_id], include=["documents"])["documents"][0].split()
+            offset = rng.randrange(max(1, len(text) - words + 1))
+            question = " ".join(text[offset:offset + words]) + "?"
+        if question not in seen:
+            seen.add(question)
+            questions.append({"id": len(questions) + 1, "question": question, "expected_articles": [article]})
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput, latency and hit rate of batch question answering.")
+    parser.add_argument("document", nargs="?", default="constitution-amh.pdf", help="PDF or TXT to ingest and draw questions from.")
+    parser.add_argument("--questions", type=int, default=200, help="Questions to draw from the document.")
+    parser.add_argument("--question-words", type=int, default=8, help="Words of chunk text per drawn question.")
+    parser.add_argument("--reference-share", type=float, default=0.25, help="Share of 'አንቀጽ N ምን ይላል?' questions.")
+    parser.add_argument("--questions-file", help="Run this JSONL question set instead of drawing one.")
+    parser.add_argument("--write-questions", help="Save the drawn question set as JSONL.")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help=f"Comma-separated subset of {CONFIGS}.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8, help="Answers generated at a time in the batch config.")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--stub-embedder", action="store_true", help="Hash-based stub embedder instead of the SentenceTransformer.")
+    parser.add_argument("--llm", choices=LLM_CHOICES, default="stub", help="LLM backend (default: stub).")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub/fake LLM latency per call (s).")
+    parser.add_argument("--collection", default=None, help="Benchmark collection (default: bench_<embedder>).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configure_backends("stub" if args.stub_embedder else None, args.llm)
+    os.environ["RAG_COLLECTION_NAME"] = args.collection or f"bench_{'stub' if args.stub_embedder else 'st'}"
+    os.environ.setdefault("RAG_FAKE_LLM_LATENCY_SECONDS", str(args.latency))
+    for setting in ("RAG_FAKE_LLM_TAIL_RATE", "RAG_FAKE_LLM_ERROR_RATE", "RAG_FAKE_LLM_RATE_LIMIT_RATE"):
+        os.environ.setdefault(setting, "0")
+    import app
+    from data_ingestion import ingest_document
+
+    if args.llm == "stub":
+        app.gemini_model.latency_seconds = args.latency
+    ingested = ingest_document(args.document, app.RAG_COLLECTION_NAME)
+    if ingested["status"] != "success":
+        raise SystemExit(ingested["message"])
+
+    if args.questions_file:
+        with open(args.questions_file, encoding="utf-8") as f:
+            items = app.parse_batch_jsonl(f)
+    else:
+        questions = make_questions(app, args.questions, args.question_words, args.reference_share, args.seed)
+        if args.write_questions:
+            with open(args.write_questions, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(question, ensure_ascii=False) + "\n" for question in questions)
+        items = [app.parse_batch_item(question, position) for position, question in enumerate(questions, 1)]
+
+    print(
+        f"\n{args.document}: {ingested['chunks']} chunks in '{app.RAG_COLLECTION_NAME}', {len(items)} questions, "
+        f"LLM {args.llm} ({args.latency}s/call), pipeline {app.RAG_PIPELINE_MODE}"
+    )
+    print(f"{'config':<12}{'q/s':>8}{'wall s':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'batch p50':>10}{'batch max':>10}{'LLM calls':>10}{'hit rate':>9}")
+    for config in args.configs.split(","):
+        # Every run starts cold: no answers, retrievals or embeddings from the previous one
+        app.rag_cache.invalidate()
+        if app.summary_cache is not None:
+            app.summary_cache.clear()
+        calls_before = getattr(app.gemini_model, "call_count", 0)
+        if config == "one-by-one":
+            run = run_batches(items, 1, args.n_results, concurrency=1)
+        else:
+            run = run_batches(items, args.batch_size, args.n_results, args.concurrency)
+        summary = summarize(run)
+        calls = getattr(app.gemini_model, "call_count", 0) - calls_before
+        hit_rate = f"{summary['hit_rate']:.1%}" if summary["hit_rate"] is not None else "-"
+        print(
+            f"{config:<12}{summary['questions_per_s']:>8.2f}{summary['wall_s']:>8.1f}{summary['p50']:>8.3f}{summary['p95']:>8.3f}"
+            f"{summary['p99']:>8.3f}{summary['batch_p50']:>10.3f}{summary['batch_max']:>10.3f}{calls:>10}{hit_rate:>9}"
+        )
+        if set(summary["outcomes"]) - {"answered"}:
+            print(f"{'':<12}outcomes: {summary['outcomes']}")
+
+
+if __name__ == '__main__':
+    main()
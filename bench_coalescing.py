@@ -0,0 +1,90 @@
+# bench_coalescing.py
+# Load test for the retrieval stage (embed + ChromaDB query) with and without
+# cross-request coalescing. N client threads each issue queries back to back;
+# throughput and p50/p99 latency are reported for both paths.
+#
+# Example:
+#   python bench_coalescing.py --concurrency 32 --requests 512 --max-batch 16 --max-wait-ms 5
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import percentile
+from collection_aliases import resolve_collection_name
+from model_registry import VECTOR_DB_PATH, get_embedder, get_vector_store
+from query_batcher import QueryCoalescer
+
+RAG_COLLECTION_NAME = "collection4"
+
+
+def make_queries(count: int) -> list[str]:
+    # Distinct texts so no request can be answered from another's embedding
+    topics = ["የዜጎች መብት", "የፌዴራል መንግሥት ሥልጣን", "የክልሎች ሥልጣን", "የፍርድ ቤቶች ነፃነት", "የመሬት ባለቤትነት"]
+    return [f"ስለ {topics[i % len(topics)]} አንቀጽ {i % 106 + 1} ምን ይላል? ({i})" for i in range(count)]
+
+def run_load(retrieve, queries: list[str], concurrency: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def one(query_text):
+        start = time.perf_counter()
+        retrieve(query_text)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, queries))
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": len(queries),
+        "throughput_rps": len(queries) / wall,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure retrieval throughput/latency with and without request coalescing.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client threads.")
+    parser.add_argument("--requests", type=int, default=512, help="Total requests per run.")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--max-batch", type=int, default=16, help="Coalescer max batch size.")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Coalescer batching window.")
+    args = parser.parse_args()
+
+    embedder = get_embedder()
+    collection = get_vector_store().get_or_create_collection(name=resolve_collection_name(VECTOR_DB_PATH, RAG_COLLECTION_NAME))
+    if collection.count() == 0:
+        print(f"Collection '{RAG_COLLECTION_NAME}' is empty; ingest a document first.")
+        return
+
+    queries = make_queries(args.requests)
+    # Warm up the model and the collection so neither run pays first-call costs
+    embedder.encode(queries[:8])
+    collection.query(query_embeddings=[embedder.encode(queries[0]).tolist()], n_results=args.n_results)
+
+    def direct(query_text):
+        embedding = embedder.encode(query_text).tolist()
+        return collection.query(query_embeddings=[embedding], n_results=args.n_results)
+
+    coalescer = QueryCoalescer(get_embedder, lambda: collection, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    def coalesced(query_text):
+        return coalescer.submit(query_text, args.n_results)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, n_results {args.n_results}\n")
+    print(f"{'path':<12}{'req/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, retrieve in (("direct", direct), ("coalesced", coalesced)):
+        r = run_load(retrieve, queries, args.concurrency)
+        print(f"{name:<12}{r['throughput_rps']:>10.1f}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    print(f"\nCoalescer: {coalescer.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# bench_context_packing.py
+# Prompt size per query for the old fixed 5-sentence chunking and the token-budgeted chunking,
+# each with the old context assembly (top n_results chunks joined) and with MMR packing under
+# a token budget (rag_pipeline.pack_context):
+#   chunks      - chunks the document is split into
+#   over limit  - share of chunks longer than the embedder's input (embedded only in part)
+#   tokens      - prompt tokens per query (single-pass answer prompt): mean, p50, p95, max, stdev
+#   chunks/q    - chunks per prompt
+#   hit rate    - share of queries whose source sentence is in the context
+# Tokens are counted with the embedder's tokenizer (model_registry.count_tokens), a stand-in
+# for the LLM's own count.
+#
+# Queries are the opening words of sentences drawn from the document, so each has a known
+# source; retrieval is exact cosine search in memory and nothing touches the vector store.
+#
+# Examples:
+#   python bench_context_packing.py constitution-amh.pdf --queries 200
+#   RAG_TOKEN_COUNTER=estimate python bench_context_packing.py notes.txt --budget 512
+import argparse
+import random
+import statistics
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+from bench_utils import percentile
+from data_ingestion import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    clean_page_text,
+    iter_document_chunks,
+    iter_document_pages,
+    iter_page_sentences,
+)
+from model_registry import EMBEDDER_MAX_TOKENS, count_tokens, get_embedder
+from rag_pipeline import build_answer_prompt, pack_context
+
+
+# --- Fixed Sentence Chunking (the chunker ingestion used before token budgets) ---
+def iter_sentences(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Splits a stream of cleaned pages into sentences (see data_ingestion.iter_page_sentences).
+    """
+    for sentence, _, _ in iter_page_sentences(enumerate(pages, start=1)):
+        yield sentence
+
+def iter_sentence_chunks(sentences: Iterable[str], max_sentences_per_chunk: int = 10) -> Iterator[str]:
+    """
+    Groups sentences into chunks of max_sentences_per_chunk as they arrive.
+    """
+    current_chunk_sentences = []
+    for sentence in sentences:
+        current_chunk_sentences.append(sentence)
+        if len(current_chunk_sentences) >= max_sentences_per_chunk:
+            yield " ".join(current_chunk_sentences).strip()
+            current_chunk_sentences = []
+    if current_chunk_sentences:
+        yield " ".join(current_chunk_sentences).strip()
+
+
+# --- Benchmark ---
+def load_chunkings(file_path: str, args) -> dict[str, list[str]]:
+    def cleaned_pages():
+        return (clean_page_text(raw_text) for _, raw_text in iter_document_pages(file_path))
+    return {
+        "sentences-5": [chunk for chunk in iter_sentence_chunks(iter_sentences(cleaned_pages()), 5) if chunk],
+        f"tokens-{args.max_tokens}/{args.overlap_tokens}": [
+            text for text, _ in iter_document_chunks(file_path, args.max_tokens, args.overlap_tokens)
+        ],
+    }
+
+def make_queries(file_path: str, count: int, words: int, seed: int) -> list[tuple[str, str]]:
+    """
+    (query, source sentence) pairs: the first `words` words of randomly chosen sentences.
+    """
+    pages = (clean_page_text(raw_text) for _, raw_text in iter_document_pages(file_path))
+    sentences = [s for s in iter_sentences(pages) if len(s.split()) > words]
+    rng = random.Random(seed)
+    picks = rng.sample(sentences, min(count, len(sentences)))
+    return [(" ".join(sentence.split()[:words]), sentence) for sentence in picks]
+
+def embed(texts: list[str]) -> np.ndarray:
+    vectors = np.asarray(get_embedder().encode(texts, batch_size=64, show_progress_bar=False), dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def run(chunks: list[str], chunk_vectors: np.ndarray, token_counts: list[int], queries, query_vectors: np.ndarray,
+        packed: bool, args) -> dict:
+    pool = max(args.n_results, args.candidates) if packed else args.n_results
+
+    prompt_tokens, chunks_per_query, hits = [], [], 0
+    for (query, source), query_vector in zip(queries, query_vectors):
+        top = np.argsort(-(chunk_vectors @ query_vector), kind='stable')[:pool]
+        if packed:
+            picked = pack_context(
+                [token_counts[i] for i in top], args.budget, query_vector, chunk_vectors[top],
+                args.mmr_lambda, args.duplicate_threshold,
+            )
+            top = top[picked]
+        context = "\n\n".join(chunks[i] for i in top)
+        prompt_tokens.append(count_tokens(build_answer_prompt(context, query)))
+        chunks_per_query.append(len(top))
+        # Chunking may split a sentence, so its opening words stand in for it
+        hits += " ".join(source.split()[:args.query_words + 3]) in context
+
+    return {
+        "chunks": len(chunks),
+        "over_limit": sum(tokens > EMBEDDER_MAX_TOKENS - 2 for tokens in token_counts) / len(chunks),
+        "mean": statistics.mean(prompt_tokens),
+        "p50": percentile(prompt_tokens, 50),
+        "p95": percentile(prompt_tokens, 95),
+        "max": max(prompt_tokens),
+        "stdev": statistics.pstdev(prompt_tokens),
+        "chunks_per_query": statistics.mean(chunks_per_query),
+        "hit_rate": hits / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens per query for chunking and context packing strategies.")
+    parser.add_argument("file", nargs="?", default="constitution-amh.pdf", help="PDF or TXT document (default: constitution-amh.pdf).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=6, help="Words of the source sentence used as the query.")
+    parser.add_argument("--n-results", type=int, default=5, help="Chunks per prompt without packing.")
+    parser.add_argument("--candidates", type=int, default=12, help="Candidates MMR packing chooses from.")
+    parser.add_argument("--budget", type=int, default=600, help="Context token budget for MMR packing.")
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    parser.add_argument("--duplicate-threshold", type=float, default=0.95)
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS, help="Tokens per chunk for token-budgeted chunking.")
+    parser.add_argument("--overlap-tokens", type=int, default=CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = make_queries(args.file, args.queries, args.query_words, args.seed)
+    if not queries:
+        print(f"No sentences of more than {args.query_words} words found in {args.file}.")
+        return
+    query_vectors = embed([query for query, _ in queries])
+    print(f"{args.file}: {len(queries)} queries, n_results={args.n_results}, packing budget {args.budget} tokens from {args.candidates} candidates")
+
+    print(f"{'chunking':<18}{'context':<9}{'chunks':>7}{'over limit':>11}{'mean':>7}{'p50':>6}{'p95':>6}{'max':>6}{'stdev':>7}{'chunks/q':>9}{'hit rate':>9}")
+    for name, chunks in load_chunkings(args.file, args).items():
+        chunk_vectors = embed(chunks)
+        token_counts = [count_tokens(chunk) for chunk in chunks]
+        for packed in (False, True):
+            result = run(chunks, chunk_vectors, token_counts, queries, query_vectors, packed, args)
+            print(
+                f"{name:<18}{'mmr' if packed else 'top-n':<9}{result['chunks']:>7}{result['over_limit']:>11.1%}"
+                f"{result['mean']:>7.0f}{result['p50']:>6.0f}{result['p95']:>6.0f}{result['max']:>6.0f}{result['stdev']:>7.1f}"
+                f"{result['chunks_per_query']:>9.1f}{result['hit_rate']:>9.1%}"
+            )
+
+
+if __name__ == '__main__':
+    main()
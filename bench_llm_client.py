@@ -0,0 +1,135 @@
+# bench_llm_client.py
+# Offline tail-latency test of llm_client.GeneratorClient against llm_stub.FaultyGenerativeModel
+# (lognormal latency, stalled requests, 503s and 429s, optionally a full outage).
+# The same request stream is sent through each configuration:
+#   direct   - model.generate_content with no protection (the app before the client existed)
+#   client   - per-attempt timeout, jittered retries, concurrency cap, circuit breaker
+#   hedged   - client plus a hedged request after --hedge-after seconds
+# and reported as: answered / unavailable (the app would reply with the retrieved passages) /
+# raw error shares, latency percentiles over all requests, and upstream calls per request.
+#
+# Examples:
+#   python bench_llm_client.py --requests 400 --concurrency 32
+#   python bench_llm_client.py --tail-rate 0.05 --tail-seconds 20 --hedge-after 1.5
+#   python bench_llm_client.py --outage-after 2 --outage-seconds 5     # circuit breaker
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import percentile
+from llm_client import CircuitBreaker, GeneratorClient, LLMUnavailableError
+from llm_stub import FaultyGenerativeModel
+
+CONFIGS = ("direct", "client", "hedged")
+
+def make_model(args) -> FaultyGenerativeModel:
+    return FaultyGenerativeModel(
+        latency_seconds=args.latency,
+        latency_sigma=args.sigma,
+        tail_rate=args.tail_rate,
+        tail_seconds=args.tail_seconds,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+
+def run(config: str, args) -> dict:
+    model = make_model(args)
+    target = model
+    client = None
+    if config != "direct":
+        client = GeneratorClient(
+            model,
+            timeout_seconds=args.timeout,
+            deadline_seconds=args.deadline,
+            max_retries=args.retries,
+            backoff_base_seconds=args.backoff,
+            hedge_after_seconds=args.hedge_after if config == "hedged" else None,
+            max_concurrency=args.max_concurrency,
+            breaker=CircuitBreaker(args.breaker_failures, args.breaker_cooldown),
+        )
+        target = client
+
+    latencies, outcomes = [], {"answered": 0, "unavailable": 0, "error": 0}
+    lock = threading.Lock()
+
+    def one(i: int):
+        start = time.perf_counter()
+        try:
+            target.generate_content(f"ጥያቄ {i}")
+            outcome = "answered"
+        except LLMUnavailableError:
+            outcome = "unavailable"
+        except Exception:
+            outcome = "error"
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            outcomes[outcome] += 1
+
+    if args.outage_after is not None:
+        timer = threading.Timer(args.outage_after, model.start_outage, [args.outage_seconds])
+        timer.daemon = True
+        timer.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    result = {
+        "config": config,
+        "wall_s": wall,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "calls_per_request": model.call_count / args.requests,
+        **{key: value / args.requests for key, value in outcomes.items()},
+    }
+    if client is not None:
+        result["circuit_opened"] = client.stats()["circuit_opened"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail latency of the resilient LLM client against a faulty fake model.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent callers (request threads).")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help=f"Comma-separated subset of {CONFIGS}.")
+    # Fake model
+    parser.add_argument("--latency", type=float, default=0.3, help="Median model latency (s).")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Lognormal shape of the latency.")
+    parser.add_argument("--tail-rate", type=float, default=0.03, help="Share of requests that stall.")
+    parser.add_argument("--tail-seconds", type=float, default=10.0, help="Extra latency of a stalled request.")
+    parser.add_argument("--error-rate", type=float, default=0.03, help="Share of requests failing with 503.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.03, help="Share of requests failing with 429.")
+    parser.add_argument("--outage-after", type=float, default=None, help="Start a full outage this many seconds in.")
+    parser.add_argument("--outage-seconds", type=float, default=5.0)
+    # Client
+    parser.add_argument("--timeout", type=float, default=2.0, help="Per-attempt timeout (s).")
+    parser.add_argument("--deadline", type=float, default=6.0, help="Deadline per call including retries (s).")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--backoff", type=float, default=0.2, help="Base of the jittered exponential backoff (s).")
+    parser.add_argument("--hedge-after", type=float, default=0.8, help="Hedge delay for the hedged config (s).")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Outstanding upstream calls allowed.")
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-cooldown", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{args.requests} requests from {args.concurrency} callers; model median {args.latency}s (sigma {args.sigma}), "
+        f"{args.tail_rate:.0%} stall {args.tail_seconds}s, {args.error_rate:.0%} 503, {args.rate_limit_rate:.0%} 429"
+    )
+    print(f"{'config':<8}{'answered':>9}{'unavail.':>9}{'error':>7}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'max s':>8}{'calls/req':>10}{'opened':>7}{'wall s':>8}")
+    for config in args.configs.split(","):
+        result = run(config, args)
+        print(
+            f"{config:<8}{result['answered']:>9.1%}{result['unavailable']:>9.1%}{result['error']:>7.1%}"
+            f"{result['p50']:>8.2f}{result['p95']:>8.2f}{result['p99']:>8.2f}{result['max']:>8.2f}"
+            f"{result['calls_per_request']:>10.2f}{result.get('circuit_opened', '-'):>7}{result['wall_s']:>8.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
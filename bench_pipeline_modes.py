@@ -0,0 +1,102 @@
+# bench_pipeline_modes.py
+# Offline comparison of the generation pipeline modes (single_pass, two_pass, two_pass_cached)
+# using the stub LLM. Reports LLM calls and latency per query for each mode.
+#
+# Example:
+#   python bench_pipeline_modes.py --queries 200 --distinct-retrievals 20 --latency 0.2
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from bench_utils import percentile
+from llm_stub import StubGenerativeModel
+from rag_pipeline import PIPELINE_MODES, generate_answer, summary_cache_namespace
+from summary_cache import SummaryCache
+
+
+def load_chunk_pool(text_file: str | None, pool_size: int) -> list[str]:
+    """
+    Chunks to retrieve from: paragraphs of text_file if given, otherwise synthetic text.
+    """
+    if text_file:
+        with open(text_file, 'r', encoding='utf-8') as f:
+            paragraphs = [p.strip() for p in f.read().split('\n\n') if p.strip()]
+        if paragraphs:
+            return paragraphs
+    return [f"አንቀጽ {i}። " + "የኢትዮጵያ ሕገ መንግሥት ድንጋጌ። " * 40 for i in range(pool_size)]
+
+def make_retrievals(chunk_pool: list[str], distinct: int, chunks_per_query: int, rng: random.Random):
+    """
+    Builds `distinct` retrieval results (lists of (chunk_id, chunk_text)) that queries will draw from.
+    """
+    retrievals = []
+    for _ in range(distinct):
+        indices = rng.sample(range(len(chunk_pool)), min(chunks_per_query, len(chunk_pool)))
+        retrievals.append([(f"bench.txt::{i:016x}::0", chunk_pool[i]) for i in indices])
+    return retrievals
+
+def run_mode(mode: str, retrievals, query_plan, args, cache_dir: str) -> dict:
+    model = StubGenerativeModel(latency_seconds=args.latency, seconds_per_1k_chars=args.seconds_per_1k_chars)
+    summary_cache = None
+    if mode == "two_pass_cached":
+        summary_cache = SummaryCache(os.path.join(cache_dir, f"{mode}.sqlite3"), namespace=summary_cache_namespace("stub"))
+
+    order_rng = random.Random(args.seed)
+    latencies = []
+    for query_number, retrieval_index in enumerate(query_plan):
+        # Retrieval order varies between queries even when the set of chunks is the same
+        retrieved = list(retrievals[retrieval_index])
+        order_rng.shuffle(retrieved)
+        ids = [chunk_id for chunk_id, _ in retrieved]
+        chunks = [text for _, text in retrieved]
+
+        start = time.perf_counter()
+        generate_answer(model, f"ጥያቄ {query_number}", chunks, ids, mode=mode, summary_cache=summary_cache)
+        latencies.append(time.perf_counter() - start)
+
+    result = {
+        "mode": mode,
+        "queries": len(query_plan),
+        "llm_calls": model.call_count,
+        "calls_per_query": model.call_count / len(query_plan),
+        "prompt_chars_per_query": model.prompt_chars / len(query_plan),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+    if summary_cache is not None:
+        result["summary_hit_rate"] = summary_cache.stats()["hit_rate"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare RAG pipeline modes offline with a stub LLM.")
+    parser.add_argument("--queries", type=int, default=100, help="Number of questions to simulate.")
+    parser.add_argument("--distinct-retrievals", type=int, default=20, help="How many different chunk sets queries retrieve (smaller = more repetition).")
+    parser.add_argument("--chunks-per-query", type=int, default=5, help="Chunks retrieved per query (n_results).")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM base latency per call, seconds.")
+    parser.add_argument("--seconds-per-1k-chars", type=float, default=0.005, help="Stub LLM extra latency per 1000 prompt characters.")
+    parser.add_argument("--text-file", help="Optional UTF-8 text whose paragraphs are used as chunks.")
+    parser.add_argument("--modes", nargs="+", default=list(PIPELINE_MODES), choices=PIPELINE_MODES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunk_pool = load_chunk_pool(args.text_file, pool_size=200)
+    retrievals = make_retrievals(chunk_pool, args.distinct_retrievals, args.chunks_per_query, rng)
+    query_plan = [rng.randrange(len(retrievals)) for _ in range(args.queries)]
+
+    print(f"{args.queries} queries over {len(retrievals)} distinct retrievals, stub latency {args.latency}s + {args.seconds_per_1k_chars}s/1k chars\n")
+    print(f"{'mode':<16}{'calls/q':>9}{'chars/q':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'summary hits':>14}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode in args.modes:
+            r = run_mode(mode, retrievals, query_plan, args, cache_dir)
+            hit_rate = f"{r['summary_hit_rate']:.1%}" if "summary_hit_rate" in r else "-"
+            print(f"{r['mode']:<16}{r['calls_per_query']:>9.2f}{r['prompt_chars_per_query']:>10.0f}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{hit_rate:>14}")
+
+
+if __name__ == '__main__':
+    main()
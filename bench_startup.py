@@ -0,0 +1,98 @@
+# bench_startup.py
+# Measures cold-start time and resident memory of the app in a fresh interpreter:
+#   import     - time to `import app`
+#   ready      - time until the embedder and collection are loaded (first request could be served)
+#   rss_mb     - resident set size once ready
+#   models     - number of embedder instances (SentenceTransformer or StubEmbedder) alive in the process
+#
+# --stub measures the app with the offline stub embedder and the NumPy store, for machines
+# without the model weights or chromadb; it then shows the app's own cost, not the model's.
+#
+# Pass --git-ref to run the same measurement against another revision (checked out into a
+# temporary worktree) for a before/after comparison, e.g.:
+#   python bench_startup.py --git-ref HEAD~1
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+MEASURE = r"""
+import gc, json, os, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+if hasattr(app, "backends_ready"):
+    app.backends_ready()
+ready = time.perf_counter()
+
+# By class name, so a stub run never imports sentence_transformers
+models = sum(1 for obj in gc.get_objects() if type(obj).__name__ in ("SentenceTransformer", "StubEmbedder"))
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print("RESULT " + json.dumps({
+    "import_s": round(imported - start, 3),
+    "ready_s": round(ready - start, 3),
+    "rss_mb": round(rss_kb / 1024, 1),
+    "models": models,
+}))
+"""
+
+
+STUB_ENV = {"RAG_EMBEDDER_BACKEND": "stub", "RAG_TOKEN_COUNTER": "estimate", "RAG_VECTOR_BACKEND": "numpy"}
+
+
+def measure(tree: str) -> dict:
+    env = dict(os.environ, RAG_PRELOAD_MODELS="0")
+    completed = subprocess.run(
+        [sys.executable, "-c", MEASURE],
+        cwd=tree, env=env, capture_output=True, text=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"Measurement failed in {tree}:\n{completed.stderr[-2000:]}")
+
+def measure_git_ref(ref: str) -> dict:
+    worktree = tempfile.mkdtemp(prefix="rag-startup-")
+    subprocess.run(["git", "worktree", "add", "--detach", worktree, ref], check=True, capture_output=True)
+    try:
+        # Both trees must see the same data, model cache and .env
+        for name in ("chroma_db_data", "vector_index_data", ".env"):
+            target = os.path.join(worktree, name)
+            if os.path.exists(name):
+                if os.path.exists(target):
+                    shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+                os.symlink(os.path.abspath(name), target)
+        return measure(worktree)
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", worktree], capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app cold-start time and RSS.")
+    parser.add_argument("--git-ref", help="Also measure this git revision (e.g. the commit before the registry change).")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per tree; the best is reported.")
+    parser.add_argument("--stub", action="store_true", help="Use the stub embedder and the NumPy store (offline).")
+    args = parser.parse_args()
+    if args.stub:
+        os.environ.update(STUB_ENV)
+
+    trees = [("current", lambda: measure("."))]
+    if args.git_ref:
+        trees.insert(0, (args.git_ref, lambda: measure_git_ref(args.git_ref)))
+
+    print(f"{'tree':<14}{'import s':>10}{'ready s':>10}{'RSS MB':>10}{'models':>8}")
+    for name, run in trees:
+        results = [run() for _ in range(args.runs)]
+        best = min(results, key=lambda r: r["ready_s"])
+        print(f"{name:<14}{best['import_s']:>10.2f}{best['ready_s']:>10.2f}{best['rss_mb']:>10.1f}{best['models']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+# bench_utils.py
+# Helpers shared by the benchmark and batch scripts.
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of values (pct in 0-100); values must not be empty.
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,191 @@
+# bench_vector_stores.py
+# Compares the ChromaDB backend with the memory-mapped NumPy backend (float16 and int8) on
+# the same vectors:
+#   build s   - time to write all vectors into a fresh collection
+#   disk MB   - size of the collection on disk
+#   load s    - fresh interpreter: open the store and answer the first query (for -resident
+#               backends this includes decoding the matrix to float32 in RAM)
+#   rss MB    - resident set size after load and the latency runs
+#   p50/p99   - single-query latency
+#   batch qps - queries per second when sent in batches of --batch-size
+#   recall@k  - overlap with exact float32 top-k (ChromaDB's HNSW index is approximate)
+#
+# Vectors come from the live collection (--collection, read through the configured backend)
+# or are synthetic (--synthetic N). Everything is built in a temporary directory.
+#
+# Examples:
+#   python bench_vector_stores.py --synthetic 300000 --queries 200
+#   python bench_vector_stores.py --collection collection4
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench_utils import percentile
+
+MEASURE = r"""
+import json, sys, time
+import numpy as np
+backend, path, name, queries_file, n_results, batch_size = sys.argv[1:7]
+n_results, batch_size = int(n_results), int(batch_size)
+queries = np.load(queries_file)
+
+start = time.perf_counter()
+if backend == "chroma":
+    import chromadb
+    collection = chromadb.PersistentClient(path=path).get_collection(name=name)
+else:
+    from vector_store import NumpyVectorStore
+    options = backend.split("-")
+    collection = NumpyVectorStore(path, dtype=options[1], resident="resident" in options).get_collection(name)
+collection.query(query_embeddings=queries[:1].tolist(), n_results=n_results)
+load_s = time.perf_counter() - start
+
+latencies, ids = [], []
+for query in queries:
+    start = time.perf_counter()
+    result = collection.query(query_embeddings=[query.tolist()], n_results=n_results)
+    latencies.append(time.perf_counter() - start)
+    ids.append(result["ids"][0])
+
+start = time.perf_counter()
+for i in range(0, len(queries), batch_size):
+    collection.query(query_embeddings=queries[i:i + batch_size].tolist(), n_results=n_results)
+batch_s = time.perf_counter() - start
+
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+print("RESULT " + json.dumps({"load_s": load_s, "latencies": latencies, "batch_s": batch_s, "rss_mb": rss_kb / 1024, "ids": ids}))
+"""
+
+BENCH_COLLECTION = "bench"
+
+
+def load_vectors(args):
+    """
+    Returns (ids, embeddings float32, documents, metadatas) to benchmark with.
+    """
+    if args.synthetic:
+        rng = np.random.default_rng(args.seed)
+        # Clustered rather than uniform noise, so nearest neighbours are meaningful
+        centers = rng.normal(size=(max(1, args.synthetic // 100), args.dim)).astype(np.float32)
+        embeddings = centers[rng.integers(0, len(centers), args.synthetic)]
+        embeddings += 0.3 * rng.normal(size=embeddings.shape).astype(np.float32)
+        ids = [f"synthetic::{i:016x}::0" for i in range(args.synthetic)]
+        documents = [f"አንቀጽ {i}።" for i in range(args.synthetic)]
+        metadatas = [{"source_file": "synthetic", "chunk_index": i} for i in range(args.synthetic)]
+        return ids, embeddings, documents, metadatas
+
+    from collection_aliases import resolve_collection_name
+    from model_registry import VECTOR_DB_PATH, get_vector_store
+    source = get_vector_store().get_collection(name=resolve_collection_name(VECTOR_DB_PATH, args.collection))
+    data = source.get(include=["embeddings", "documents", "metadatas"])
+    return data["ids"], np.asarray(data["embeddings"], dtype=np.float32), data["documents"], data["metadatas"]
+
+def make_queries(embeddings: np.ndarray, count: int, seed: int) -> np.ndarray:
+    # Perturbed copies of stored vectors: each query has a true neighbourhood to find
+    rng = np.random.default_rng(seed + 1)
+    picks = embeddings[rng.integers(0, len(embeddings), count)]
+    scale = float(np.std(embeddings)) * 0.5
+    return (picks + scale * rng.normal(size=picks.shape)).astype(np.float32)
+
+def exact_top_k(embeddings: np.ndarray, queries: np.ndarray, ids: list[str], k: int) -> list[list[str]]:
+    norms = np.einsum('ij,ij->i', embeddings, embeddings)
+    top = []
+    for start in range(0, len(queries), 64):
+        block = queries[start:start + 64]
+        distances = norms[None, :] - 2 * block @ embeddings.T
+        nearest = np.argsort(distances, axis=1)[:, :k]
+        top.extend([[ids[i] for i in row] for row in nearest])
+    return top
+
+def build(backend: str, path: str, ids, embeddings, documents, metadatas, batch_size: int = 4096) -> float:
+    start = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+        collection = chromadb.PersistentClient(path=path).create_collection(name=BENCH_COLLECTION)
+        # ChromaDB caps the number of records per call
+        batch_size = min(batch_size, 5000)
+    else:
+        from vector_store import NumpyVectorStore
+        collection = NumpyVectorStore(path, dtype=backend.split("-")[1]).create_collection(BENCH_COLLECTION)
+    for i in range(0, len(ids), batch_size):
+        collection.add(
+            ids=ids[i:i + batch_size],
+            embeddings=embeddings[i:i + batch_size].tolist() if backend == "chroma" else embeddings[i:i + batch_size],
+            documents=documents[i:i + batch_size],
+            metadatas=metadatas[i:i + batch_size],
+        )
+    if backend != "chroma":
+        collection.compact()
+    return time.perf_counter() - start
+
+def directory_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / (1024 * 1024)
+
+def measure(backend: str, path: str, queries_file: str, n_results: int, batch_size: int) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", MEASURE, backend, path, BENCH_COLLECTION, queries_file, str(n_results), str(batch_size)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"Measurement of {backend} failed:\n{completed.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ChromaDB and the NumPy vector store backends.")
+    parser.add_argument("--collection", default="collection4", help="Logical collection to read vectors from.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of a collection.")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension of synthetic vectors.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=16, help="Queries per call in the batch run.")
+    parser.add_argument(
+        "--backends", default="chroma,numpy-float16,numpy-int8,numpy-float16-resident",
+        help="Comma-separated: chroma, numpy-<float16|int8>[-resident].")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ids, embeddings, documents, metadatas = load_vectors(args)
+    if not len(ids):
+        print("No vectors to benchmark; ingest a document first or pass --synthetic N.")
+        return
+    queries = make_queries(embeddings, args.queries, args.seed)
+    truth = exact_top_k(embeddings, queries, ids, args.n_results)
+    print(f"{len(ids)} vectors of dimension {embeddings.shape[1]}, {len(queries)} queries, k={args.n_results}")
+
+    work_dir = tempfile.mkdtemp(prefix="rag-vector-bench-")
+    try:
+        queries_file = os.path.join(work_dir, "queries.npy")
+        np.save(queries_file, queries)
+        print(f"{'backend':<24}{'build s':>9}{'disk MB':>9}{'load s':>8}{'rss MB':>8}{'p50 ms':>8}{'p99 ms':>8}{'batch qps':>11}{'recall@k':>10}")
+        for backend in args.backends.split(","):
+            path = os.path.join(work_dir, backend)
+            build_s = build(backend, path, ids, embeddings, documents, metadatas)
+            result = measure(backend, path, queries_file, args.n_results, args.batch_size)
+            recall = np.mean([len(set(found) & set(expected)) / len(expected) for found, expected in zip(result["ids"], truth)])
+            print(
+                f"{backend:<24}{build_s:>9.2f}{directory_size_mb(path):>9.1f}{result['load_s']:>8.2f}{result['rss_mb']:>8.0f}"
+                f"{percentile(result['latencies'], 50) * 1000:>8.2f}{percentile(result['latencies'], 99) * 1000:>8.2f}"
+                f"{len(queries) / result['batch_s']:>11.0f}{recall:>10.3f}"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer use only
+    fcntl = None
+
+# --- Collection Alias Table ---
+# The logical collection name used by the app (RAG_COLLECTION_NAME, e.g. "collection4")
+# maps to a versioned physical ChromaDB collection ("collection4__v17"; ChromaDB names may
+# not contain '@'). Ingestion builds a new version next to the live one and then flips the
+# alias, so queries always hit a complete collection. Replaced versions are kept for a grace
+# period (for in-flight queries and slow-to-notice processes) and then deleted.
+#
+# The table is a small JSON file in the vector store directory (model_registry.VECTOR_DB_PATH):
+#   {"collection4": {
+#       "active": "collection4__v17",
+#       "next_version": 18,
+#       "building": {"name": "collection4__v18", "seeded": true,
+#                    "owner": "host:pid:token", "heartbeat": 1718000300.0} | null,
+#       "retired": [{"name": "collection4__v16", "retired_at": 1718000000.0}]}}
+# A logical name with no entry resolves to itself, so a pre-existing unversioned
+# collection keeps working until its first versioned build.
+#
+# A build belongs to the process that began it. The owner renews its heartbeat while it
+# works (BuildHeartbeat); a build whose owner has exited (same host) or whose heartbeat is
+# older than the lease counts as interrupted and can be resumed by someone else. Only the
+# owner can promote its build, so a build that was retired meanwhile (by /clear_db or a
+# takeover) never goes live.
+
+ALIAS_FILE_NAME = "collection_aliases.json"
+DEFAULT_GRACE_SECONDS = 300
+DEFAULT_LEASE_SECONDS = 60
+
+
+class BuildInProgressError(RuntimeError):
+    """
+    Another live process is building a version of the collection.
+    """
+
+class BuildSupersededError(RuntimeError):
+    """
+    The build is no longer the collection's build (retired or taken over) and must not be promoted.
+    """
+
+
+def versioned_collection_name(logical_name: str, version: int) -> str:
+    return f"{logical_name}__v{version}"
+
+def _alias_path(db_path: str) -> str:
+    return os.path.join(db_path, ALIAS_FILE_NAME)
+
+@contextmanager
+def _locked_table(db_path: str):
+    """
+    Yields the whole alias table for modification and writes it back atomically.
+    Writers in different processes are serialized with a lock file where fcntl is available.
+    """
+    os.makedirs(db_path, exist_ok=True)
+    path = _alias_path(db_path)
+    with open(f"{path}.lock", 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        table = load_alias_table(db_path)
+        yield table
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, indent=1)
+        os.replace(tmp_path, path)
+
+def load_alias_table(db_path: str) -> dict:
+    try:
+        with open(_alias_path(db_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _entry(table: dict, logical_name: str) -> dict:
+    return table.setdefault(logical_name, {"active": None, "next_version": 1, "building": None, "retired": []})
+
+def resolve_collection_name(db_path: str, logical_name: str) -> str:
+    """
+    Physical collection currently serving logical_name.
+    """
+    entry = load_alias_table(db_path).get(logical_name)
+    return entry["active"] if entry and entry.get("active") else logical_name
+
+def new_build_owner() -> str:
+    """
+    Identity of one build: host and pid (to tell whether its process is still running) and a
+    token, so two builds started by the same process are not mistaken for each other.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def _owner_alive(building: dict, lease_seconds: float) -> bool:
+    owner = building.get("owner")
+    if owner is None or time.time() - building.get("heartbeat", 0) > lease_seconds:
+        return False # builds recorded before owners were, or lease expired
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _owns(entry: dict, name: str, owner: str) -> bool:
+    building = entry.get("building")
+    return bool(building) and building["name"] == name and building.get("owner") == owner
+
+def begin_build(db_path: str, logical_name: str, owner: str, resume: bool = True,
+                lease_seconds: float = DEFAULT_LEASE_SECONDS) -> tuple[str, bool]:
+    """
+    Reserves the physical collection for a new version of logical_name, owned by owner
+    (see new_build_owner). Returns (name, seeded). With resume, a build that was interrupted
+    is taken over instead of starting a new one (seeded=True if its initial copy had
+    completed); if its owner is still working, BuildInProgressError is raised. Without
+    resume, an unfinished build is retired, even a live one (so it gets garbage-collected
+    and its owner cannot promote it), and a fresh version is allocated.
+    """
+    with _locked_table(db_path) as table:
+        entry = _entry(table, logical_name)
+        building = entry.get("building")
+        if building and resume:
+            if _owner_alive(building, lease_seconds):
+                raise BuildInProgressError(
+                    f"'{building['name']}' of '{logical_name}' is being built by {building['owner']}.")
+            building.update(owner=owner, heartbeat=time.time())
+            return building["name"], building["seeded"]
+        if building:
+            entry["retired"].append({"name": building["name"], "retired_at": time.time()})
+        name = versioned_collection_name(logical_name, entry["next_version"])
+        entry["next_version"] += 1
+        entry["building"] = {"name": name, "seeded": False, "owner": owner, "heartbeat": time.time()}
+        return name, False
+
+def renew_build(db_path: str, logical_name: str, name: str, owner: str) -> bool:
+    """
+    Refreshes the heartbeat of owner's build; False if the build is no longer theirs.
+    """
+    with _locked_table(db_path) as table:
+        entry = _entry(table, logical_name)
+        if not _owns(entry, name, owner):
+            return False
+        entry["building"]["heartbeat"] = time.time()
+        return True
+
+def mark_build_seeded(db_path: str, logical_name: str, name: str, owner: str):
+    with _locked_table(db_path) as table:
+        entry = _entry(table, logical_name)
+        if not _owns(entry, name, owner):
+            raise BuildSupersededError(f"'{name}' is no longer the build of '{logical_name}'.")
+        entry["building"]["seeded"] = True
+
+def promote_build(db_path: str, logical_name: str, name: str, owner: str):
+    """
+    Atomically makes owner's build name the active version of logical_name and retires the
+    previous one. Raises BuildSupersededError if the build is no longer theirs.
+    """
+    with _locked_table(db_path) as table:
+        entry = _entry(table, logical_name)
+        if not _owns(entry, name, owner):
+            raise BuildSupersededError(f"'{name}' is no longer the build of '{logical_name}'; not promoting it.")
+        previous = entry.get("active") or logical_name
+        entry["active"] = name
+        entry["building"] = None
+        entry["retired"] = [r for r in entry["retired"] if r["name"] != name]
+        if previous != name:
+            entry["retired"].append({"name": previous, "retired_at": time.time()})
+
+def abandon_build(db_path: str, logical_name: str, name: str, owner: str) -> bool:
+    """
+    Forgets owner's unpromoted build; True if it was theirs (the caller then deletes the
+    collection; a superseded build is already retired and gets garbage-collected).
+    """
+    with _locked_table(db_path) as table:
+        entry = _entry(table, logical_name)
+        if not _owns(entry, name, owner):
+            return False
+        entry["building"] = None
+        return True
+
+
+class BuildHeartbeat:
+    """
+    Renews a build's heartbeat every interval_seconds on a daemon thread until stop(), or
+    until the build is found to be someone else's.
+    """
+
+    def __init__(self, db_path: str, logical_name: str, name: str, owner: str,
+                 interval_seconds: float = DEFAULT_LEASE_SECONDS / 4):
+        self.db_path = db_path
+        self.logical_name = logical_name
+        self.name = name
+        self.owner = owner
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                if not renew_build(self.db_path, self.logical_name, self.name, self.owner):
+                    return
+            except OSError as e:
+                print(f"Heartbeat of build '{self.name}' failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+def collect_retired_versions(vector_store, db_path: str, logical_name: str,
+                             grace_seconds: float = DEFAULT_GRACE_SECONDS) -> list[str]:
+    """
+    Deletes versions of logical_name that were retired more than grace_seconds ago.
+    Returns the deleted collection names.
+    """
+    cutoff = time.time() - grace_seconds
+    with _locked_table(db_path) as table:
+        entry = _entry(table, logical_name)
+        due = [r for r in entry["retired"] if r["retired_at"] <= cutoff and r["name"] != entry.get("active")]
+        entry["retired"] = [r for r in entry["retired"] if r not in due]
+
+    deleted = []
+    for retired in due:
+        try:
+            vector_store.delete_collection(name=retired["name"])
+            deleted.append(retired["name"])
+        except Exception as e:
+            print(f"Retired collection '{retired['name']}' could not be deleted (may already be gone): {e}")
+    if deleted:
+        print(f"🧹 Deleted retired collection version(s): {', '.join(deleted)}")
+    return deleted
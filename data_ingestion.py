@@ -1,33 +1,47 @@
+import copy
 import os
-import chromadb
-from sentence_transformers import SentenceTransformer
 import fitz  # PyMuPDF
 import re
 import json
+import time
+import hashlib
+import threading
+from itertools import chain, islice
+from typing import Iterable, Iterator
 
-# Define paths and model names (must match app.py for consistency)
-CHROMA_DB_PATH = "./chroma_db_data"
-EMBEDDER_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2' # The 768-dim model
-
-# --- Global Initialization for Ingestion ---
-ingestion_chroma_client = None
-ingestion_embedder = None
-
-try:
-    print(f"Initializing ChromaDB client for ingestion at: {CHROMA_DB_PATH}")
-    ingestion_chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    print("ChromaDB client initialized for ingestion.")
-except Exception as e:
-    print(f"Error initializing ChromaDB client for ingestion: {e}")
-    ingestion_chroma_client = None
-
-try:
-    print(f"Loading SentenceTransformer model for ingestion: {EMBEDDER_MODEL_NAME}")
-    ingestion_embedder = SentenceTransformer(EMBEDDER_MODEL_NAME)
-    print("SentenceTransformer model loaded for ingestion.")
-except Exception as e:
-    print(f"Error loading SentenceTransformer for ingestion: {e}")
-    ingestion_embedder = None
+from rag_cache import bump_collection_version
+from collection_aliases import (
+    DEFAULT_GRACE_SECONDS,
+    DEFAULT_LEASE_SECONDS,
+    BuildHeartbeat,
+    abandon_build,
+    begin_build,
+    collect_retired_versions,
+    mark_build_seeded,
+    new_build_owner,
+    promote_build,
+    resolve_collection_name,
+)
+# The vector store client and embedder are shared with app.py and loaded lazily on first use
+from model_registry import VECTOR_DB_PATH, EMBEDDER_ID, EMBEDDER_MAX_TOKENS, count_tokens, get_vector_store, get_embedder
+
+# Streaming pipeline sizes: chunks are embedded EMBED_BATCH_SIZE at a time and
+# written to the vector store WRITE_BATCH_SIZE at a time, so peak memory is bounded by
+# WRITE_BATCH_SIZE chunks no matter how long the document is.
+EMBED_BATCH_SIZE = 32
+WRITE_BATCH_SIZE = 256
+TXT_LINES_PER_PAGE = 200 # .txt files have no pages; stream them in blocks of lines
+
+# Chunks are sized in embedder tokens (model_registry.count_tokens) so they fit the embedder's
+# input; a few tokens of EMBEDDER_MAX_TOKENS are left for the special tokens the model adds.
+# Consecutive chunks of the same article share up to CHUNK_OVERLAP_TOKENS of trailing sentences.
+CHUNK_MAX_TOKENS = int(os.getenv("RAG_CHUNK_MAX_TOKENS", str(EMBEDDER_MAX_TOKENS - 8)))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "24"))
+
+# Replaced collection versions are kept this long before deletion, so in-flight queries finish
+COLLECTION_GRACE_SECONDS = float(os.getenv("RAG_COLLECTION_GRACE_SECONDS", str(DEFAULT_GRACE_SECONDS)))
+# A build whose owner has not renewed its heartbeat for this long counts as interrupted
+COLLECTION_BUILD_LEASE_SECONDS = float(os.getenv("RAG_COLLECTION_BUILD_LEASE_SECONDS", str(DEFAULT_LEASE_SECONDS)))
 
 # --- Helper Functions for Text Processing ---
 
@@ -96,128 +110,675 @@ def split_into_sentences_amharic(text: str) -> list[str]:
     # Filter out empty strings that might result from the split
     sentences = [s.strip() for s in sentences if s.strip()]
     return sentences
-sentences= "እኛ የኢትዮጵያ ብሔሮች፣ ብሔረሰቦች፣ ሕዝቦች፡በሀገራችን ኢትዮጵያ ውስጥ ዘላቂ ሰላም፣ ዋስትና ያለው ዴሞክራሲ እንዲሰፍን፣ኢኮኖሚያዊና ማኅበራዊ እድገታችን እንዲፋጠን፣ የራሳችንን ዕድል በራሳችን የመወሰን መብታችንን ተጠቅመን፣ በነጻ ፍላጐታችን፣ በሕግ የበላይነት እና በራሳችን ፈቃድ ላይ የተመሰረተ አንድ የፖለቲካ ማኅበረሰብ በጋራ ለመገንባት ቆርጠን በመነሳት፤ይህን ዓላማ ከግብ ለማድረስ፣ የግለሰብና የብሔር ብሔረሰብ መሰረታዊ መብቶች መከበራቸው፣ የጾታ እኩልነት መረጋገጡ፣ ባሕሎችና ሃይማኖቶች ካለአንዳች ልዩነት እንዲራመዱ የማድረጉ አስፈላጊነት ጽኑ እምነታችን በመሆኑ፤ኢትዮጵያ ሀገራችን የየራሳችን አኩሪ ባሕል ያለን፣ የየራሳችን መልክዓ ምድር አሰፋፈር የነበረንና ያለን፣ ብሔር ብሔረሰቦችና ሕዝቦች በተለያዩ መስኮችና የግንኙነት ደረጃዎችተሳስረንአብረን የኖርንባትና የምንኖርባት ሀገር በመሆንዋ፤ ያፈራነው የጋራ ጥቅምና አመለካከት አለን ብለን ስለምናምን፤መጪው የጋራ ዕድላችን መመስረት ያለበት ከታሪካችን የወረስነውን የተዛባ ግንኙነት በማረምና የጋራ ጥቅማችንን በማሳደግ ላይ መሆኑን በመቀበል፤ ጥቅማችንን፣ መብታችንና ነጻነታችንን በጋራ እና በተደጋጋፊነት ለማሳደግ አንድ የኢኮኖሚ ማኅበረሰብ የመገንባቱን አስፈላጊነት በማመን፤ በትግላችንና በከፈልነው መስዋዕትነት የተገኘውን ዴሞክራሲና ሰላም ዘላቂነቱንለማረጋገጥ፤ይህ ሕገ መንግሥት ከዚህ በላይ ለገለጽናቸው ዓላማዎችና እምነቶች ማሰሪያ እንዲሆነንእንዲወክሉን መርጠን በላክናቸው ተወካዮቻቸን አማካይነት በሕገ መንግሥት ጉባኤ ዛሬ ኅዳር 29 ቀን 1987 አጽድቀነዋል፡፡ ምዕራፍ አንድ : ጠቅላላ ድንጋጌዎች አንቀጽ 1: የኢትዮጵያ መንግሥት ስያሜ ይህ ሕገ መንግሥት ፌዴራላዊና ዴሞክራሲያዊ የመንግሥት አወቃቀር ይደነግጋል፡፡በዚህ መሰረት የኢትዮጵያ መንግሥት የኢትዮጵያ ፌዴራላዊ ዴሞክራሲያዊ ሪፐብሊክ በሚል ስም ይጠራል፡፡ አንቀጽ 2: የኢትዮጵያ የግዛት ወሰን የኢትዮጵያ የግዛት ወሰን የፌዴራሉን አባሎች ወሰን የሚያጠቃልል ሆኖ በዓለም አቀፍ ስምምነቶች መሰረት የተወሰነው ነው፡፡ አንቀጽ 3:የኢትዮጵያ ሰንደቅ ዓላማ 1. የኢትዮጵያ ሰንደቅ ዓላማ ከላይ አረንጓዴ፣ ከመሐል ቢጫ፣ ከታች ቀይ ሆኖበመሐሉ ብሔራዊ ዓርማ ይኖረዋል፡፡ ሦስቱም ቀለማት እኩል ሆነው በአግድም ይቀመጣሉ፡፡ 2. ከሰንደቅ ዓላማው ላይ የሚቀመጠው ብሔራዊ ዓርማ የኢትዮጵያ ብሔሮች፣ብሔረሰቦች፣ ሕዝቦች እና ሃይማኖቶች በእኩልነትና በአንድነት ለመኖር ያላቸውን ተስፋ የሚያንጸባርቅ ይሆናል፡፡ 3. የፌዴራሉ አባሎች የየራሳቸው ሰንደቅ ዓላማና ዓርማ ሊኖራቸው ይችላል፡፡ ዝርዝሩን በየራሳቸው ምክር ቤት ይወስናሉ፡፡ አንቀጽ 4:የኢትዮጵያ ብሔራዊ መዝሙር የኢትዮጵያ ብሔራዊ መዝሙር የሕገ መንግሥቱን ዓላማዎችና የኢትዮጵያ ሕዝቦች በዴሞክራሲ ሥርዓት አብረው ለመኖር ያላቸውን እምነት፣ እንዲሁም የወደፊት የጋራ ዕድላቸውን የሚያንጸባርቅ ሆኖ በሕግ ይወሰናል፡፡ አንቀጽ 5:ስለ ቋንቋ 1. ማናቸውም የኢትዮጵያ ቋንቋዎች በእኩልነት የመንግሥት እውቅና ይኖራቸዋል፡፡ 2. አማርኛ የፌዴራሉ መንግሥት የሥራ ቋንቋ ይሆናል፡፡ 3. የፌዴሬሽኑ አባሎች የየራሳቸውን የሥራ ቋንቋ በሕግ ይወስናሉ፡፡ አንቀጽ 6: ስለ ዜግነት 1. ወላጆቹ ወላጆኟ ወይም ከወላጆቹ ከወላጆኟ አንደኛቸው ኢትዮጵያዊ ኢትዮጵያዊት የሆነ የሆነች የኢትዮጵያ ዜጋ ነው ናት፡፡ 2. የውጭ ሀገር ዜጐች የኢትዮጵያ ዜግነት ሊያገኙ ይችላሉ፡፡ 3. ዜግነትን በሚመለከት ዝርዝሩ በሕግ ይወሰናል፡፡ አንቀጽ 7: የፆታ አገላለጽ በዚህ ሕገ መንግሥት ውስጥ በወንድ ፆታ የተደነገገው የሴትንም ፆታ ያካትታል፡፡ ምዕራፍ ሁለት: የሕገ መንግሥቱ መሰረታዊ መርሆዎች አንቀጽ 8: የሕዝብ ሉዓላዊነት 1. የኢትዮጵያ ብሔሮች፣ ብሔረሰቦች፣ ሕዝቦች የኢትዮጵያ ሉዓላዊ ሥልጣንባለቤቶች ናቸው፡፡ 2. ይህ ሕገ መንግሥት የሉዓላዊነታቸው መግለጫ ነው፡፡ 3. ሉዓላዊነታቸውም የሚገለጸው በዚህ ሕገ መንግሥት መሰረት በሚመርጧቸው ተወካዮቻቸውና በቀጥታ በሚያደርጉት ዴሞክራሲያዊ ተሳትፎ አማካይነት ይሆናል፡፡ አንቀጽ 9: የሕገ መንግሥት የበላይነት 1. ሕገ መንግሥቱ የሀገሪቱ የበላይ ሕግ ነው፡፡ ማንኛውም ሕግ፣ ልማዳዊ አሰራር፣እንዲሁም የመንግሥት አካል ወይም ባለሥልጣን ውሳኔ ከዚህ ሕገ መንግሥት ጋር የሚቃረን ከሆነ ተፈጻሚነት አይኖረውም፡፡ 2. ማንኛውም ዜጋ፣ የመንግሥት አካላት፣ የፖለቲካ ድርጅቶች፣ ሌሎች ማኅበራት እንዲሁም ባለሥልጣኖቻቸው፣ ሕገ መንግሥቱን የማስከበርና ለሕገ መንግሥቱ ተገዢ የመሆን ኃላፊነት አለባቸው፡፡ 3. በዚህ ሕገ መንግሥት ከተደነገገው ውጭ በማናቸውም አኳኊን የመንግሥት ሥልጣን መያዝ የተከለከለ ነው፡፡ 4. ኢትዮጵያ ያጸደቀቻቸው ዓለም አቀፍ ስምምነቶች የሀገሪቱ ሕግ አካል ናቸው፡፡ አንቀጽ 10: የሰብዓዊና ዴሞክራሲያዊ መብቶች 1. ሰብዓዊ መብቶችና ነጻነቶች ከሰው ልጅ ተፈጥሮ የሚመነጩ፣ የማይጣሱና የማይገፈፉ ናቸው፡፡ 2. የዜጐች እና የሕዝቦች ሰብዓዊና ዴሞክራሲያዊ መብቶች ይከበራሉ፡፡ አንቀጽ 11: የመንግሥትና የሃይማኖት መለያየት 1. መንግሥትና ሃይማኖት የተለያዩ ናቸው፡፡ 2. መንግሥታዊ ሃይማኖት አይኖርም፡፡ 3. መንግሥት በሃይማኖት ጉዳይ ጣልቃ አይገባም፡፡ ሃይማኖትም በመንግሥት ጉዳይ ጣልቃ አይገባም፡፡ አንቀጽ 12: የመንግሥት አሠራርና ተጠያቂነት 1. የመንግሥት አሠራር ለሕዝብ ግልጽ በሆነ መንገድ መከናወን አለበት፡፡ 2. ማንኛውም ኃላፊና የሕዝብ ተመራጭ ኃላፊነቱን ሲያጓድል ተጠያቂ ይሆናል፡፡ሕዝብ በመረጠው ተወካይ ላይ እምነት ባጣ ጊዜ ከቦታው ለማንሳት ይችላል፡፡ዝርዝሩ በሕግ ይወሰናል፡፡ ምዕራፍ ሦስት: መሰረታዊ መብቶችና ነጻነቶች አንቀጽ 13: ተፈጻሚነትና አተረጓጐም 1. በማንኛውም ደረጃ የሚገኙ የፌዴራል መንግሥትና የክልል ሕግ አውጪ፣ ሕግ አስፈጻሚ እና የዳኝነት አካሎች በዚህ ምዕራፍ የተካተቱን ድንጋጌዎች የማክበርና የማስከበር ኃላፊነትና ግዴታ አለባቸው፡፡ 2. በዚህ ምዕራፍ የተዘረዘሩት መሠረታዊ የመብቶችና የነጻነቶች ድንጋጌዎች ኢትዮጵያ ከተቀበለቻቸው ዓለም አቀፍ የሰብዓዊ መብቶች ሕግጋት፣ ዓለም አቀፍ የሰብዓዊ ስምምነቶችና ዓለም አቀፍ ሰነዶች መርሆዎች ጋር በተጣጣመ መንገድ ይተረጐማል፡፡ ክፍል አንድ ሰብዓዊ መብቶች አንቀጽ 14 የሕይወት፣ የአካል ደህንነትና የነጻነት መብት ማንኛውም ሰው ሰብዓዊ በመሆኑ የማይደፈርና የማይገሰስ በሕይወት የመኖር፣ የአካል ደህንነትና የነጻነት መብት አለው፡፡ አንቀጽ 15 የሕይወት መብት ማንኛውም ሰው በሕይወት የመኖር መብት አለው፡፡ ማንኛውም ሰው በሕግ በተደነገገ ከባድ የወንጀል ቅጣት ካልሆነ በስተቀር ሕይወቱን አያጣም፡፡ አንቀጽ 16 የአካል ደህንነት መብት ማንኛውም ሰው በአካሉ ላይ ጉዳት እንዳይደርስበት የመጠበቅ መብት አለው፡፡ አንቀጽ 17 የነጻነት መብት 1. በሕግ ከተደነገገው ሥርዓት ውጭ ማንኛውም ሰው ወንድም ሆነ ሴት ነጻነቱን ቷን አያጣም አታጣም፡፡ 2. ማንኛውም ሰው በሕግ ከተደነገገው ሥርዓት ውጭ ሊያዝ፣ ክስ ሳይቀርብበት ወይም ሳይፈረድበት ሊታሰር አይችልም፡፡ አንቀጽ 18 ኢሰብዓዊ አያያዝ ስለመከልከሉ 1. ማንኛውም ሰው ጭካኔ ከተሞላበት፣ ኢሰብዓዊ ከሆነ ወይም ክብሩን ከሚያዋርድ አያያዝ ወይም ቅጣት የመጠበቅ መብት አለው፡፡ 2. ማንኛውም ሰው በባርነት ወይም በግዴታ አገልጋይነት ሊያዝ አይችልም፡፡ለማንኛውም ዓላማ በሰው የመነገድ ተግባር የተከለከለ ነው፡፡ 3. ማንኛውም ሰው በኃይል ተገዶ ወይም ግዴታ ለማሟላት ማንኛውንም ሥራ እንዲሠራ ማድረግ የተከለከለ ነው፡፡ 4. በዚህ አንቀጽ ንዑስ አንቀጽ 3 በኃይል ተገዶ ወይም ግዴታን ለማሟላትየሚለው ሐረግ የሚከተሉትን ሁኔታዎች አያካትትም፤ ማንኛውም እስረኛ በእስራት ላይ ባለበት ጊዜ በሕግ መሠረት አንዲሠራ የተወሰነውን ወይም በገደብ ከእስር በተለቀቀበት ጊዜ፣ የሚሠራውን ማንኛውም ሥራ፣ ማንኛውም ወታደራዊ አገልግሎት ለመስጠት ሕሊናው የማይፈቅድለት ሰው በምትክ የሚሰጠውን አገልግሎት፣ የማኅበረሰቡን ሕይወት ወይም ደህንነት የሚያሰጋ የአስቸኳይ ጊዜ ሁኔታ ወይም አደጋ በሚያጋጥምበት ጊዜ የሚሰጥ ማንኛውም አገልግሎት፣ በሚመለከተው ሕዝብ ፈቃድ በአካባቢው የሚፈጸመውን ማንኛውንም ኢኮኖሚያዊና ማሕበራዊ የልማት ሥራ፡፡ አንቀጽ 19 የተያዙ ሰዎች መብት 1. ወንጀል ፈጽመዋል በመባል የተያዙ ሰዎች የቀረበባቸው ክስና ምክንያቶቹ በዝርዝር ወዲያውኑ በሚገባቸው ቋንቋ እንዲነገራቸው መብት አላቸው፡፡ 2. የተያዙ ሰዎች ላለመናገር መብት አላቸው፤ የሚሰጡት ማንኛውም ቃል ፍርድ ቤት በማስረጃነት ሊቀርብባቸው እንደሚችል መረዳት በሚችሉት ቋንቋ እንደተያዙ ወዲያውኑ ማስገንዘቢያ እንዲሰጣቸው መብት አላቸው፡፡ 3. የተያዙ ሰዎች በአርባ ስምንት ሰዓታት ውስጥ ፍርድ ቤት የመቅረብ መብት አላቸው፡፡ ይህም ጊዜ ሰዎቹ ከተያዙበት ቦታ ወደ ፍርድ ቤት ለመምጣት አግባብ ባለው ግምት የሚጠይቀውን ጊዜ አይጨምርም፡፡ ወዲያውኑ ፍርድ ቤት እንደቀረቡ በተጠረጠሩበት ወንጀል ለመታሰር የሚያበቃ ምክንያት ያለ መሆኑ ተለይቶ አንዲገለጽላቸው መብት አላቸው፡፡ 4. የያዛቸው የፖሊስ መኮንን ወይም የሕግ አስከባሪ በጊዜው ገደብ ፍርድ ቤት በማቅረብ የተያዙበትን ምክንያት ካላስረዳ፣ ፍርድ ቤቱ የአካል ነጻነታቸውን እንዲያስከብርላቸው የመጠየቅ ሊጣስ የማይችል መብት አላቸው፡፡ ሆኖም ፍትሕ እንዳይጓደል ሁኔታው የሚጠይቅ ከሆነ ፍርድ ቤቱ የተያዘው ሰው በጥበቃ ሥር እንዲቆይ ለማዘዝ ወይም ምርመራ ለማካሄድ ተጨማሪ የምርመራ ጊዜ ሲጠየቅ አስፈላጊ በሆነ መጠን ብቻ ሊፈቅድ ይችላል፡፡ የሚያስፈልገውን ተጨማሪ ጊዜ ፍርድ ቤቱ ሲወስን ኃላፊ የሆኑት የሕግ አስከባሪ ባለሥልጣኖች ምርመራውን አጣርተው የተያዘው ሰው በተቻለ ፍጥነት ፍርድ ቤት እንዲቀርብ ያለውን መብት የሚያስከብር መሆን አለበት፡፡ 5. የተያዙ ሰዎች በራሳቸው ላይ በማስረጃነት ሊቀርብ የሚችል የእምነት ቃል እንዲሰጡ ወይም ማናቸውንም ማስረጃ እንዲያምኑ አይገደዱም፡፡ በማስገደድ የተገኘ ማስረጃ ተቀባይነት አይኖረውም፡፡ 6. የተያዙ ሰዎች በዋስ የመፈታት መብት አላቸው፡፡ ሆኖም በሕግ በተደነገጉ ልዩ ሁኔታዎች ፍርድ ቤት ዋስትና ላለመቀበል ወይም በገደብ መፍታትን ጨምሮ በቂ የሆነ የዋስትና ማረጋገጫ እንዲቀርብ ለማዘዝ ይችላል፡፡ አንቀጽ 20 የተከሰሱ ሰዎች መብት 1. የተከሰሱ ሰዎች ክስ ከቀረበባቸው በኃላ ተገቢ በሆነ አጭር ጊዜ ውስጥ በመደበኛ ፍርድ ቤት ለሕዝብ ግልጽ በሆነ ችሎት የመሰማት መብት አላቸው፡፡ ሆኖም የተከራካሪዎቹን የግል ሕይወት፣ የሕዝብን የሞራል ሁኔታና የሀገሪቱን ደህንነት ለመጠበቅ ሲባል ብቻ ክርክሩ በዝግ ችሎት ሊሰማ ይችላል፡፡ 2. ክሱ በቂ በሆነ ዝርዝር እንዲነገራቸው እና ክሱን በጽሁፍ የማግኘት መብት አላቸው፡፡ 3. በፍርድ ሂደት ባሉበት ጊዜ በተከሰሱበት ወንጀል እንደ ጥፋተኛ ያለመቆጠር፣በምስክርነት እንዲቀርቡም ያለመገደድ መብት አላቸው፡፡ 4. የቀረበባቸውን ማናቸውንም ማስረጃ የመመልከት፣ የቀረቡባቸውን ምስክሮች የመጠየቅ፣ ለመከላከል የሚያስችላቸውን ማስረጃ የማቅረብ ወይም የማስቀረብ እንዲሁም ምስክሮቻቸው ቀርበው እንዲሰሙላቸው የመጠየቅ መብት አላቸው፡፡ 5. በመረጡት የሕግ ጠበቃ የመወከል ወይም ጠበቃ ለማቆም አቅም በማጣታቸው ፍትሕ ሊጓደል የሚችልበት ሁኔታ ሲያጋጥም ከመንግሥት ጠበቃ የማግኘት መብት አላቸው፡፡ 6. ክርክሩ በሚታይበት ፍርድ ቤት በተሰጠባቸው ትእዛዝ ወይም ፍርድ ላይ ሥልጣን ላለው ፍርድ ቤት ይግባኝ የማቅረብ መብት አላቸው፡፡ 7. የፍርዱ ሂደት በማይገባቸው ቋንቋ በሚካሄድበት ሁኔታ በመንግሥት ወጪ ክርክሩ እንዲተረጐምላቸው የመጠየቅ መብት አላቸው፡፡ አንቀጽ 21 በጥበቃ ሥር ያሉና በፍርድ የታሰሩ ሰዎች መብት 1. በጥበቃ ሥር ያሉና በፍርድ የታሰሩ ሰዎች ሰብዓዊ ክብራቸውን በሚጠብቁ ሁኔታዎች የመያዝ መብት አላቸው፡፡ 2. ከትዳር ጓደኞቻቸው፣ ከቅርብ ዘመዶቻቸው፣ ከጓደኞቻቸው፣ ከሃይማኖት አማካሪዎቻቸው፣ ከሐኪሞቻቸው እና ከሕግ አማካሪዎቸው ጋር ለመገናኘትና እንዲጐበቿቸውም ዕድል የማግኘት መብት አላቸው፡፡ አንቀጽ 22 የወንጀል ሕግ ወደኊላ ተመልሶ የማይሰራ ስለመሆኑ 1. ማንኛውም ሰው የወንጀል ክስ ሲቀርብበት የተከሰሰበት ድርጊት በተፈጸመበት ጊዜ ድርጊቱን መፈጸሙ ወይም አለመፈጸሙ ወንጀል መሆኑ በሕግ የተደነገገ ካልሆነ በስተቀር ሊቀጣ አይችልም፡፡ እንዲሁም ወንጀሉን በፈጸመበት ጊዜ ለወንጀሉ ተፈጻሚ ከነበረው የቅጣት ጣሪያ በላይ የከበደ ቅጣት በማንኛውም ሰው ላይ አይወሰንም፡፡ 2. የዚህ አንቀጽ ንዑስ አንቀጽ 1 ቢኖርም፣ ድርጊቱ ከተፈጸመ በኊላ የወጣ ሕግ ለተከሳሹ ወይም ለተቀጣው ሰው ጠቃሚ ሆኖ ከተገኘ ከድርጊቱ በኊላ የወጣው ሕግ ተፈጻሚነት ይኖረዋል፡፡ አንቀጽ 23 በአንድ ወንጀል ድጋሚ ቅጣት ስለመከልከሉ ማንኛውም ሰው በወንጀል ሕግና ሥነ ሥርዓት መሠረት ተከሶ የመጨረሻ በሆነ ውሳኔ ጥፋተኛነቱ በተረጋገጠበት ወይም በነጻ በተለቀቀበት ወንጀል እንደገና አይከሰስም ወይም አይቀጣም፡፡ አንቀጽ 24 የክብርና የመልካም ስም መብት 1. ማንኛውም ሰው ሰብዓዊ ክብሩና መልካም ስሙ የመከበር መብት አለው፡፡ 2. ማንኛውም ሰው የራሱን ስብዕና ከሌሎች ዜጐች መብቶች ጋር በተጣጣመ ሁኔታ በነጻ የማሳደግ መብት አለው፡፡ 3. ማንኛውም ሰው በማንኛውም ስፍራ በሰብዓዊነቱ እውቅና የማግኘት መብት አለው፡፡ አንቀጽ 25 የእኩልነት መብት ሁሉም ሰዎች በሕግ ፊት እኩል ናቸው፤ በመካከላቸውም ማንኛውም ዓይነት ልዩነት ሳይደረግ በሕግ እኩል ጥበቃ ይደረግላቸዋል፡፡ በዚህ ረገድ በዘር፣በብሔር፣ ብሔረሰብ፣በቀለም፣ በጾታ፣ በቋንቋ፣ በሃይማኖት፣ በፖለቲካ፣ በማኅበራዊ አመጣጥ፣ በሀብት፣በትውልድ ወይም በሌላ አቋም ምክንያት ልዩነት ሳይደረግ ሰዎች ሁሉ እኩልና ተጨባጭ የሕግ ዋስትና የማግኘት መብት አላቸው፡፡ አንቀጽ 26 የግል ሕይወት የመከበርና የመጠበቅ መብት 1. ማንኛውም ሰው የግል ሕይወቱ፣ ግላዊነቱ፣ የመከበር መብት አለው፡፡ ይህ መብት መኖሪያ ቤቱ፣ ሰውነቱና ንብረቱ ከመመርመር እንዲሁም በግል ይዞታው ያለ ንብረት ከመያዝ የመጠበቅ መብትን ያካትታል፡፡ 2. ማንኛውም ሰው በግል የሚጽፋቸውንና የሚጻጻፋቸው፣ በፖስታ የሚልካቸው ደብዳቤዎች፣ እንዲሁም በቴሌፎን፣ በቴሌኮሙኒኬሽንና በኤሌክትሮኒክስ መሣሪያዎች የሚያደርጋቸው ግንኙነቶች አይደፈሩም፡፡ 3. የመንግሥት ባለሥለጣኖች እነዚህን መብቶች የማክበርና የማስከበር ግዴታ አለባቸው፡፡ አስገዳጅ ሁኔታዎቸ ሲፈጠሩና ብሔራዊ ደህንነትን፣ የሕዝብን ሰላም፣ወንጀልን በመከላከል፣ ጤናንና የሕዝብን የሞራል ሁኔታ በመጠበቅ ወይም የሌሎችን መብትና ነጻነት በማስከበር ዓላማዎች ላይ በተመሰረቱ ዝርዝር ሕጐች መሰረት ካልሆነ በስተቀር የእነዚህ መብቶች አጠቃቀም ሊገደብ አይችለም፡፡ አንቀጽ 27 የሃይማኖት፣ የእምነትና የአመለካከት ነጻነት 1. ማንኛውም ሰው የማሰብ፣ የሕሊና እና የሃይማኖት ነጻነት አለው፡፡ ይህ መብት ማንኛውም ሰው የመረጠውን ሃይማኖት ወይም እምነት የመያዝ ወይም የመቀበል፣ ሃይማኖቱንና እምነቱን ለብቻ ወይም ከሌሎች ጋር በመሆን በይፋ ወይም በግል የማምለክ፣ የመከተል፣ የመተግበር፣ የማስተማር ወይም የመግለጽ መብትን ያካትታል፡፡ 2. በአንቀጽ 90 ንዑስ አንቀጽ 2 የተጠቀሰው አንደተጠበቀ ሆኖ የሃይማኖት ተከታዮች ሃይማኖታቸውን ለማስፋፋትና ለማደራጀት የሚያስችሏቸው የሃይማኖት ትምህርትና የአስተዳደር ተቋማት ማቋቋም ይችላሉ፡፡ 3. ማንኛውንም ሰው የሚፈልገውን እምነት ለመያዝ ያለውን ነጻነት በኃይል ወይም በሌላ ሁኔታ በማስገደድ መገደብ ወይም መከልከል አይቻልም፡፡ 4. ወላጆችና ሕጋዊ ሞግዚቶች በእምነታቸው መሰረት የሃይማኖታቸውንና የመልካም ሥነ ምግባር ትምህርት በመስጠት ልጆቻቸውን የማሳደግ መብት አላቸው፡፡ 5. ሃይማኖትና እምነትን የመግለጽ መብት ሊገደብ የሚችለው የሕዝብን ደህንነት፣ሰላምን፣ ጤናን፣ ትምህርትን፣ የሕዝብን የሞራል ሁኔታ፣ የሌሎች ዜችን መሰረታዊ መብቶች፣ ነጻነቶች እና መንግስት ከሃይማኖት ነጻ መሆኑን ለማረጋረገጥ በሚወጡ ሕጐች ይሆናል፡፡ አንቀጽ 28 በስብእና ስለሚፈደሙ ወንጀሎች 1. ኢትዮጵያ ባጸደቀቻቸው ዓለም አቀፍ ስምምነቶች እና በሌሎች የኢትዮጵያ ሕጐች በሰው ልጅ ላይ የተፈጸሙ ወንጀሎች ተብለው የተወሰኑትን ወንጀሎች፤የሰው ዘር የማጥፋት፣ ያለፍርድ የሞት ቅጣት እርምጃ የመውሰድ፣ በአስገዳጅ ሰውን የመሰወር፣ ወይም ኢሰብዓዊ የድብደባ ድርጊቶችን በፈጸሙ ሰዎች ላይ ክስ ማቅረብ በይርጋ አይታገድም፡፡ በሕግ አውጪው ክፍልም ሆነ በማንኛውም የመንግሥት አካል ውሳኔዎች በምሕረት ወይም በይቅርታ አይታለፉም፡፡ 2. ከዚህ በላይ የተደነገገው እንደተጠበቀ ሆኖ፣ በዚህ አንቀጽ ንዑስ አንቀጽ 1 የተቀሱትን ወንጀሎች ፈጽመው የሞት ቅጣት ለተፈረደባቸው ሰዎች ርዕሰ ብሔሩ ቅጣቱን ወደ ዕድሜ ልክ ጽኑ እስራት ሊያሻሽለው ይችላል፡፡ ዴሞክራሲያዊ መብቶች አንቀጽ 29 የአመለካከት እና ሐሳብን በነጻ የመያዝና የመግለጽ መብት 1. ማንኛውም ሰው ያለማንም ጣልቃ ገብነት የመሰለውን አመለካከት ለመያዝ ይችላል፡፡ 2. ማንኛውም ሰው ያለማንም ጣልቃ ገብነት ሐሳቡን የመግለጽ ነጻነት አለው፡፡ ይህ ነጻነት በሀገር ውስጥም ሆነ ከሀገር ውጭ ወሰን ሳይደረግበት በቃልም ሆነ በጽሑፍ ወይም በሕትመት፣ በሥነ ጥበብ መልክ ወይም በመረጠው በማንኛውም የማሰራጫ ዘዴ፣ ማንኛውንም ዓይነት መረጃና ሐሳብ የመሰብሰብ፣ የመቀበልና የማሰራጨት ነጻነቶችን የካትታል፡፡ 3. የኘሬስና የሌሎች መገናኛ ብዙኃን፣ እንዲሁም የሥነ ጥበብ ፈጠራ ነጻነት ተረጋግጧል፡፡ የኘሬስ ነጻነት በተለይ የሚከተሉትን መብቶች ያጠኝልላል፣ የቅድሚያ ምርመራ በማንኛውም መልኩ የተከለከለ መሆኑን፣ የሕዝብን ጥቅም የሚመለከት መረጃ የማግኘት ዕድልን፡፡ 4. ለዴሞክራሲያዊ ሥርዓት አስፈላጊ የሆኑ መረጃዎች፣ ሐሳቦችና አመለካከቶች በነጻ መንሸራሸራቸውን ለማረጋገጥ ሲባል ኘሬስ በተቋምነቱ የአሠራር ነጻነትና የተለያዩ አስተያየቶች የማስተናገድ ችሎታ እንዲኖረው የሕግ ጥበቃ ይደረግለታል፡፡ 5. በመንግሥት ገንዘብ የሚካሄድ ወይም በመንግሥት ቁጥጥር ሥር ያለ መገናኛ ብዙኃን የተለያዩ አስተያየቶችን ለማስተናገድ በሚያስችለው ሁኔታ እንዲመራ ይደረጋል፡፡ 6. እነዚህ መብቶች ገደብ ሊጣልባቸው የሚችለው የሀሳብና መረጃ የማግኘት ነጻነት በአስተሳሰባዊ ይዘቱና ሊያስከትል በሚችለው አስተሳሰባዊ ውጤት ሊገታ አይገባውም በሚል መርህ ላይ ተመስርተው በሚወጡ ሕጐች ብቻ ይሆናል፡፡ የወጣቶችን ደህንነት፣ የሰውን ክብርና መልካም ስም ለመጠበቅ ሲባል ሕጋዊ ገደቦች በነዚህ መብቶች ላይ ሊደነገጉ ይችላሉ፡፡ የጦር ቅስቃሴዎች እንዲሁም ሰብዓዊ ክብርን የሚነኩ የአደባባይ መግለጫዎች በህግ የሚከለከሉ ይሆናል፡፡ 7. ማንኛውም ዜጋ ከላይ በተጠቀሱት መብቶች አጠቃቀም ረገድ የሚጣሉ ሕጋዊ ገደቦችን ጥሶ ከተገኘ በሕግ ተጠያቂ ሊሆን የችላል፡፡ አንቀጽ 30 የመሰብሰብ፣ ሰላማዊ ሰልፍ የማድረግ ነጻነትና አቤቱታ የማቅረብ መብት 1. ማንኛውም ሰው ከሌሎች ጋር በመሆን መሣሪያ ሳይዝ በሰላም የመሰብሰብ፣ሰላማዊ ሰልፍ የማድረግ ነጻነትና፣ አቤቱታ የማቅረብ መብት አለው፡፡ ከቤት ውጭ የሚደረጉ ስብሰባዎችና ሰላማዊ ሰልፎች በሚንቀሳቀሱባቸው ቦታዎች በሕዝብ እንቅስቃሴ ላይ ችግር እንዳይፈጥሩ ለማድረግ ወይም በመካሔድ ላይ ያለ ስብሰባ ወይም ሰላማዊ ሰልፍ ሰላምን፣ ዴሞክራሲያዊ መብቶችንና የሕዝብን የሞራል ሁኔታ እንዳይጥሱ ለማስጠበቅ አግባብ ያላቸው ሥርዓቶች ሊደነገጉ ይችላሉ፡፡ 2. ይህ መብት የወጣቶችን ደህንነት፣ የሰውን ክብርና መልካም ስምን ለመጠበቅ፣የጦርነት ቅስቀሳዎች እንዲሁም ሰብዓዊ ክብርን የሚነኩ የአደባባይ መግለጫዎችን ለመከላከል ሲባል በሚወጡ ሕጐች መሰረት ተጠያቂ ከመሆን አያድንም፡፡ አንቀጽ 31 የመደራጀት መብት ማንኛውም ሰው ለማንኛውም ዓላማ በማኅበር የመደራጀት መብት አለው፡፡ ሆኖም አግባብያለውን ሕግ በመጣስ ወይም ሕገ መንግሥታዊ ሥርዓቱን በሕገ ወጥ መንገድ ለማፍረስ የተመሰረቱ ወይም የተጠቀሱትን ተግባራት የሚያራምዱ ድርጅቶች የተከለከሉ ይሆናሉ፡፡ አንቀጽ 32 የመዘዋወር ነጻነት 1. ማንኛውም ኢትዮጵያዊ ወይም በሕጋዊ መንገድ ሀገሪቱ ውስጥ የሚገኝ የውጭ ዜጋ በመረጠው የሀገሪቱ አካባቢ የመዘዋወርና የመኖሪያ ቦታ የመመስረት፣እንዲሁም በፈለገው ጊዜ ከሀገር የመውጣት ነጻነት አለው፡፡ 2. ማንኛውም ኢትዮጵያዊ ወደ ሀገሩ የመመለስ መብት አለው፡፡ አንቀጽ 33 የዜግነት መብቶች 1. ማንኛውም ኢትዮጵያዊ ኢትዮጵያዊት ከፈቃዱ ከፈቃዷ ውጭ ኢትዮጵያዊ ዜግነቱን ዜግነትዋን ሊገፈፍ ወይም ልትገፈፍ አይችልም አትችልም፡፡ኢትዮጵያዊ ኢትዮጵያዊት ዜጋ ከሌላ ሀገር ዜጋ ጋር የሚፈጽመው የምጽትፈጽመው ጋብቻ ኢትዮጵያዊ ዜግነቱን ዜግነትዋን አያስቀርም፡፡ 2. ማንኛውም ኢትዮጵያዊ ዜጋ የኢትዮጵያ ዜግነት በሕግ የሚያስገኘውን መብት ጥበቃና ጥቅም የማግኘት መብት አለው፡፡ 3. ማንኛውም ዜጋ ኢትዮጵያዊ ዜግነቱን የመለወጥ መብት አለው፡፡ 4. ኢትዮጵያ ከአጸደቀቻቸው ዓለም አቀፍ ስምምነቶች ጋር በማይቃረን መንገድ በሚወጣ ሕግ እና በሚደነገግ ሥርዓት መሰረት የኢትዮጵያ ዜግነት ለውጭ ሀገር ሰዎች ሊሰጥ ይችላል፡፡ አንቀጽ 34 የጋብቻ፣ የግልና የቤተሰብ መብቶች 1. በሕግ ከተወሰነው የጋብቻ ዕድሜ የደረሱ ወንዶችና ሴቶች በዘር፣ በበሔር፣በብሔረሰብ ወይም በሃይማኖት ልዩነት ሳይደረግባቸው የማግባትና ቤተሰብ የመመስረት መብት አላቸው፡፡ በጋብቻ አፈጻጸም፣ በጋብቻው ዘመንና በፍቺ ጊዜ እኩል መብት አላቸው፡፡ በፍቺም ጊዜ የልጆችን መብትና ጥቅም እንዲከበር የሚያደርጉ ድንጋጌዎች ይደነገጋሉ፡፡ 2. ጋብቻ በተጋቢዎች ነጻና ሙሉ ፈኝድ ላይ ብቻ ይመሰረታል፡፡ 3. ቤተሰብ የኅብረተሰብ የተፈጥሮ መሰረታዊ መነሻ ነው፡፡ ከኅብረተሰብና ከመንግሥት ጥበቃ የማግኘት መብት አለው፡፡ 4. በሕግ በተለይ በሚዘረዘረው መሰረት በሃይማኖት፣ በባሕል የሕግ ሥርዓቶች ላይ ተመስርትው ለሚፈጸሙ ጋብቻዎች እውቅና የሚሰጥ ሕግ ሊወጣ ይችላል፡፡ 5. ይህ ሕገ መንግሥት የግል እና የቤተሰብ ሕግን በተመለከተ በተከራካሪዎች ፈቃድ በሃይማኖቶች ወይም በባሕሎች ሕጐች መሰረት መዳኘትን አይከለክልም፡፡ ዝርዝሩ በሕግ ይወሰናል፡፡ አንቀጽ 35 የሴቶች መብት 1. ሴቶች ይህ ሕገ መንግሥት በአረጋገጣቸው መብቶችና ጥበቃዎች በመጠቀም ረገድ ከወንዶች ጋር እኩል መብት አላቸው፡፡ 2. ሴቶች በዚህ ሕገ መንግሥት በተደነገገው መሰረት በጋብቻ ከወንዶች ጋር እኩል መብት አላቸው፡"
-print(len(split_into_sentences_amharic(sentences)))
-# --- MODIFIED CHUNKING FUNCTION ---
-def chunk_text_by_sentences(text: str, max_sentences_per_chunk: int = 10) -> list[str]:
+
+
+# --- Streaming Pipeline Stages ---
+
+def iter_document_pages(file_path: str) -> Iterator[tuple[int, str]]:
+    """
+    Yields (page_number, raw_text) one page at a time so the whole document is never held in memory.
+    Plain text files are streamed in blocks of TXT_LINES_PER_PAGE lines.
+    """
+    if file_path.endswith('.pdf'):
+        doc = fitz.open(file_path)
+        try:
+            for page_number, page in enumerate(doc, start=1):
+                yield page_number, page.get_text()
+        finally:
+            doc.close()
+    elif file_path.endswith('.txt'):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            page_number = 1
+            while True:
+                lines = list(islice(f, TXT_LINES_PER_PAGE))
+                if not lines:
+                    break
+                yield page_number, ''.join(lines)
+                page_number += 1
+    else:
+        raise ValueError("Unsupported file type. Only .txt and .pdf are supported for ingestion.")
+
+def clean_page_text(raw_text: str) -> str:
+    """
+    Applies the header removal, normalization and Amharic extraction steps to a single page.
+    """
+    cleaned_text = remove_common_headers(raw_text)
+    cleaned_text = clean_text_and_normalize_whitespace(cleaned_text)
+    return extract_amharic_text_only(cleaned_text)
+
+def iter_page_sentences(pages: Iterable[tuple[int, str]]) -> Iterator[tuple[str, int, int]]:
+    """
+    Splits a stream of (page_number, cleaned text) into (sentence, first_page, last_page).
+    A sentence that runs over a page break is carried over and joined with the next page.
     """
-    Splits text into chunks, each containing approximately max_sentences_per_chunk.
+    carry, carry_page = "", None
+    for page_number, page_text in pages:
+        text = f"{carry} {page_text}".strip() if carry else page_text.strip()
+        if not text:
+            continue
+        first_page = carry_page if carry else page_number
+        sentences = split_into_sentences_amharic(text)
+        # The last piece is incomplete unless the page ends on a sentence terminator
+        if re.search(r'[\.\?\!።]$', text):
+            carry = ""
+        else:
+            carry = sentences.pop()
+            carry_page = first_page if not sentences else page_number
+        for i, sentence in enumerate(sentences):
+            # Only the first sentence can have started on the carried-over page
+            yield sentence, first_page if i == 0 else page_number, page_number
+    if carry:
+        yield carry, carry_page, page_number
+
+# --- Document Structure (chapters / articles) ---
+# Legal texts such as the constitution are organized as ምዕራፍ (chapter) -> አንቀጽ N (article)
+# -> numbered sub-articles ("1.", "2.", ...). Chunks never span two articles and carry their
+# chapter, article, sub-articles and pages as metadata; structure_index builds the
+# article/chapter -> chunk lookup from that metadata.
+
+ETHIOPIC_NUMERALS = {
+    **{chr(0x1369 + i): i + 1 for i in range(9)},         # ፩..፱ = 1..9
+    **{chr(0x1372 + i): (i + 1) * 10 for i in range(9)},  # ፲..፺ = 10..90
+    '፻': 100,
+}
+AMHARIC_NUMBER_WORDS = {
+    "አንድ": 1, "ሁለት": 2, "ሦስት": 3, "ሶስት": 3, "አራት": 4, "አምስት": 5, "ስድስት": 6,
+    "ሰባት": 7, "ስምንት": 8, "ዘጠኝ": 9, "አሥር": 10, "አስር": 10, "ሃያ": 20, "ሀያ": 20,
+}
+AMHARIC_TEENS_PREFIXES = ("አሥራ", "አስራ") # "አሥራ አንድ" = 11
+
+# Headings start a sentence or follow whitespace ("ንዑስ አንቀጽ 2" is a sub-article reference, not a heading).
+# Chapter headings stand on a line of their own, which after cleaning means they start the text or
+# follow a sentence terminator: "በዚህ ሕገ መንግሥት ምዕራፍ ሦስት የተዘረዘሩት" is a reference. The number
+# is Ethiopic letters only, so "ምዕራፍ ሁለት:" does not carry the colon into it.
+CHAPTER_HEADING = re.compile(r'(?:(?<=[፡።\.\?\!:]\s)|^)ም[ዕእ]ራፍ\s+((?:አሥራ|አስራ|ሃያ|ሀያ)\s+[ሀ-ፚ]+|\d+|[፩-፼]+|[ሀ-ፚ]+)')
+ARTICLE_HEADING = re.compile(r'(?<!ንዑስ )(?:(?<=\s)|^)አንቀ[ጽፅ]\s+(\d+|[፩-፼]+)')
+SUB_ARTICLE_START = re.compile(r'^(\d+)\.(?:\s|$)')
+# Sentence splitting leaves a sub-article number at the end of the previous sentence ("... ዓላማ 1.")
+SUB_ARTICLE_MARK = re.compile(r'(?<=\s)\d+\.(?=\s|$)')
+
+def parse_amharic_number(text: str) -> int | None:
     """
-    sentences = split_into_sentences_amharic(text)
-    chunks = []
-    current_chunk_sentences = []
+    Integer value of Arabic digits ("39"), Ethiopic numerals ("፴፱") or number words
+    ("ሦስት", "አሥራ አንድ"); None if text is not a number.
+    """
+    text = text.strip()
+    if text.isdecimal(): # not isdigit(): Ethiopic numerals count as digits there
+        return int(text)
+    if text and all(c in ETHIOPIC_NUMERALS for c in text):
+        return sum(ETHIOPIC_NUMERALS[c] for c in text)
+    words = text.split()
+    if len(words) == 2:
+        tens = 10 if words[0] in AMHARIC_TEENS_PREFIXES else AMHARIC_NUMBER_WORDS.get(words[0])
+        unit = AMHARIC_NUMBER_WORDS.get(words[1])
+        return tens + unit if tens in (10, 20) and unit and unit < 10 else None
+    return AMHARIC_NUMBER_WORDS.get(text)
+
+def split_at_headings(sentence: str, tracker: "StructureTracker") -> Iterator[str]:
+    """
+    Cleaning joins heading lines with the text around them; splits a sentence so that every
+    chapter/article heading and sub-article number starts its own piece. Lazy on purpose:
+    the caller observes each piece before the next one is cut, and a cut is checked against
+    a copy of the tracker that has also seen the piece in front of it.
+    """
+    cuts = sorted({
+        m.start() for pattern in (CHAPTER_HEADING, ARTICLE_HEADING, SUB_ARTICLE_MARK)
+        for m in pattern.finditer(sentence)
+    } - {0})
+    start = 0
+    for cut in cuts:
+        rest = sentence[cut:]
+        probe = copy.copy(tracker)
+        probe.observe(sentence[start:cut].strip())
+        if SUB_ARTICLE_START.match(rest) or probe.starts_section(rest):
+            yield sentence[start:cut].strip()
+            start = cut
+    yield sentence[start:].strip()
+
+class StructureTracker:
+    """
+    Follows chapter, article and sub-article numbers through a document's sentence pieces.
+    Headings are only accepted in sequence (a number a little above the current one, or any
+    higher article number right after a chapter heading), so in-text references such as
+    "የዚህ ሕገ መንግሥት አንቀጽ 39" do not move the position.
+    """
+
+    def __init__(self):
+        self.chapter = None
+        self.article = None
+        self.sub_article = None
+        self._after_chapter = False
+
+    @staticmethod
+    def _next_in_sequence(current, number, max_step: int) -> bool:
+        return number is not None and (current is None or current < number <= current + max_step)
 
-    for sentence in sentences:
-        current_chunk_sentences.append(sentence)
-        
-        # If we have reached the desired number of sentences or this is the last sentence
-        if len(current_chunk_sentences) >= max_sentences_per_chunk or sentence == sentences[-1]:
-            combined_chunk = " ".join(current_chunk_sentences).strip()
-            if combined_chunk: # Add only non-empty chunks
-                chunks.append(combined_chunk)
-            current_chunk_sentences = [] # Reset for next chunk
+    def starts_section(self, piece: str) -> bool:
+        """
+        True if piece begins with a heading observe() would accept (the position is not changed).
+        """
+        chapter = CHAPTER_HEADING.match(piece)
+        if chapter:
+            return self._next_in_sequence(self.chapter, parse_amharic_number(chapter.group(1)), 2)
+        article = ARTICLE_HEADING.match(piece)
+        return bool(article) and self._next_in_sequence(
+            self.article, parse_amharic_number(article.group(1)), 10 ** 6 if self._after_chapter else 3)
 
-    # Filter out any lingering empty strings just in case
-    return [chunk for chunk in chunks if chunk]
+    def observe(self, piece: str) -> str | None:
+        """
+        Updates the position with a heading at the start of piece.
+        Returns "chapter" or "article" if one starts here, else None.
+        """
+        after_chapter, self._after_chapter = self._after_chapter, False
+        chapter = CHAPTER_HEADING.match(piece)
+        if chapter:
+            number = parse_amharic_number(chapter.group(1))
+            if self._next_in_sequence(self.chapter, number, 2):
+                self.chapter, self.sub_article = number, None
+                self._after_chapter = True
+                return "chapter"
+            return None
+        article = ARTICLE_HEADING.match(piece)
+        if article:
+            number = parse_amharic_number(article.group(1))
+            if self._next_in_sequence(self.article, number, 10 ** 6 if after_chapter else 3):
+                self.article, self.sub_article = number, None
+                return "article"
+            return None
+        sub_article = SUB_ARTICLE_START.match(piece)
+        if sub_article and self.article is not None and self._next_in_sequence(self.sub_article, int(sub_article.group(1)), 2):
+            self.sub_article = int(sub_article.group(1))
+        return None
+
+    def metadata(self) -> dict:
+        return {key: value for key, value in (("chapter", self.chapter), ("article", self.article)) if value is not None}
+
+def split_to_token_budget(piece: str, max_tokens: int, count_tokens=count_tokens) -> list[str]:
+    """
+    Splits a piece longer than max_tokens into runs of whole words of at most max_tokens
+    (a single word over the budget is kept whole and left to the embedder to truncate).
+    """
+    if count_tokens(piece) <= max_tokens:
+        return [piece]
+    parts, words, used = [], [], 0
+    for word in piece.split():
+        tokens = count_tokens(word)
+        if words and used + tokens > max_tokens:
+            parts.append(" ".join(words))
+            words, used = [], 0
+        words.append(word)
+        used += tokens
+    if words:
+        parts.append(" ".join(words))
+    return parts
+
+def _is_bare_number(piece: str) -> bool:
+    return piece.endswith(".") and piece[:-1].isdigit()
+
+def iter_structured_chunks(
+    sentences: Iterable[tuple[str, int, int]],
+    max_tokens_per_chunk: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    count_tokens=count_tokens,
+) -> Iterator[tuple[str, dict]]:
+    """
+    Groups (sentence, first_page, last_page) into chunks of at most max_tokens_per_chunk
+    tokens, starting a new chunk at every chapter/article heading (a chapter heading stays
+    with the article that follows it). Sentences over the budget are split at word
+    boundaries. A chunk cut short by the budget hands up to overlap_tokens of its trailing
+    sentences on to the next one; chunks of different articles never overlap.
+    Yields (chunk_text, metadata) with pages, page_start, page_end, tokens and, where known,
+    chapter, article and sub_articles.
+    """
+    tracker = StructureTracker()
+    # (text, tokens, first_page, last_page, sub_article, position) per sentence piece
+    current = []
+    heading_only = False # current holds nothing but a chapter heading
+
+    def finish():
+        text = " ".join(entry[0] for entry in current).strip()
+        metadata = dict(current[-1][5])
+        metadata["page_start"] = min(entry[2] for entry in current)
+        metadata["page_end"] = max(entry[3] for entry in current)
+        metadata["pages"] = (
+            str(metadata["page_start"]) if metadata["page_start"] == metadata["page_end"]
+            else f"{metadata['page_start']}-{metadata['page_end']}"
+        )
+        sub_articles = list(dict.fromkeys(entry[4] for entry in current if entry[4] is not None))
+        if sub_articles:
+            metadata["sub_articles"] = ",".join(str(n) for n in sub_articles)
+        metadata["tokens"] = count_tokens(text)
+        return text, metadata
+
+    def overlap(entries):
+        # Trailing entries of a finished chunk (never all of it) within overlap_tokens
+        kept, used = [], 0
+        for entry in reversed(entries[1:]):
+            if used + entry[1] > overlap_tokens:
+                break
+            kept.insert(0, entry)
+            used += entry[1]
+        return kept
+
+    for sentence, first_page, last_page in sentences:
+        for piece in split_at_headings(sentence, tracker):
+            section = tracker.observe(piece)
+            if section and current and not heading_only:
+                yield finish()
+                current = []
+            was_heading_only, starts_empty = heading_only, not current
+            for part in split_to_token_budget(piece, max_tokens_per_chunk, count_tokens):
+                tokens = count_tokens(part)
+                if (current and not heading_only and not (len(current) == 1 and _is_bare_number(current[0][0]))
+                        and sum(entry[1] for entry in current) + tokens > max_tokens_per_chunk):
+                    # A bare sub-article number ("2.") belongs with the text after it
+                    carried = [current.pop()] if _is_bare_number(current[-1][0]) else []
+                    yield finish()
+                    current = overlap(current) + carried
+                    while current and sum(entry[1] for entry in current) + tokens > max_tokens_per_chunk:
+                        current.pop(0)
+                current.append((part, tokens, first_page, last_page, tracker.sub_article, tracker.metadata()))
+            heading_only = section == "chapter" and (was_heading_only or starts_empty)
+    if current:
+        yield finish()
+
+def iter_document_chunks(
+    file_path: str,
+    max_tokens_per_chunk: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> Iterator[tuple[str, dict]]:
+    """
+    Full streaming extraction: pages -> cleaned text -> sentences -> structured chunks.
+    Yields (chunk_text, metadata) (see iter_structured_chunks).
+    """
+    cleaned_pages = ((page_number, clean_page_text(raw_text)) for page_number, raw_text in iter_document_pages(file_path))
+    chunks = iter_structured_chunks(iter_page_sentences(cleaned_pages), max_tokens_per_chunk, overlap_tokens)
+    return (chunk for chunk in chunks if chunk[0])
+
+def extract_document_chunks(
+    file_path: str,
+    max_tokens_per_chunk: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> tuple[str, list[tuple[str, dict]], float]:
+    """
+    Process-pool task for corpus ingestion: runs extraction, cleaning and chunking for one
+    file (no embedder or database access; only the tokenizer is loaded) and returns
+    (file_path, chunks, seconds taken).
+    """
+    start_time = time.perf_counter()
+    chunks = list(iter_document_chunks(file_path, max_tokens_per_chunk, overlap_tokens))
+    return file_path, chunks, time.perf_counter() - start_time
+
+def batched(iterable: Iterable, batch_size: int) -> Iterator[list]:
+    """
+    Yields lists of up to batch_size items from iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+# --- Incremental Upsert Helpers ---
+
+def content_hash(text: str) -> str:
+    """
+    Short, stable fingerprint of a chunk's text.
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def make_chunk_id(source_file: str, chunk_hash: str, occurrence: int = 0) -> str:
+    """
+    Stable chunk ID derived from the source file and the chunk's content hash.
+    occurrence disambiguates identical chunks that appear more than once in the same file.
+    """
+    return f"{source_file}::{chunk_hash}::{occurrence}"
+
+def _has_compatible_vectors(collection) -> bool:
+    """
+    True if collection's vectors came from the current embedder and can be copied as-is.
+    Collections created before the embedder was recorded are checked by vector dimension.
+    """
+    built_with = (collection.metadata or {}).get("embedder")
+    if built_with is not None:
+        return built_with == EMBEDDER_ID
+    sample = collection.get(limit=1, include=["embeddings"])
+    if not len(sample["ids"]):
+        return True
+    return len(sample["embeddings"][0]) == get_embedder().get_sentence_embedding_dimension()
+
+def copy_collection(source, target, batch_size: int = WRITE_BATCH_SIZE) -> int:
+    """
+    Copies every record (with its embedding) from source to target in batches. No re-embedding.
+    """
+    copied = 0
+    while True:
+        page = source.get(limit=batch_size, offset=copied, include=["embeddings", "documents", "metadatas"])
+        if not len(page["ids"]):
+            return copied
+        target.add(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"],
+        )
+        copied += len(page["ids"])
+
+def active_collection(collection_name: str):
+    """
+    The live version of collection_name, or None if there is none yet.
+    """
+    try:
+        return get_vector_store().get_collection(name=resolve_collection_name(VECTOR_DB_PATH, collection_name))
+    except Exception:
+        return None
+
+# Builds begun by this process: build name -> (owner, BuildHeartbeat)
+_own_builds = {}
+_own_builds_lock = threading.Lock()
+
+def release_collection_build(build_name: str):
+    """
+    Stops renewing a build this process will not finish; once its lease runs out (or this
+    process exits) the next start_collection_build resumes it.
+    """
+    with _own_builds_lock:
+        _, heartbeat = _own_builds.pop(build_name, (None, None))
+    if heartbeat is not None:
+        heartbeat.stop()
+
+def start_collection_build(collection_name: str, seed: bool = True):
+    """
+    Begins a new version of the logical collection collection_name (see collection_aliases),
+    owned by this process until finish_collection_build or release_collection_build.
+    With seed, the new version starts as a copy of the active one (unless that was built with
+    a different embedder), so incremental upserts into it only re-embed what changed; an
+    interrupted seeded build is resumed, and collection_aliases.BuildInProgressError is raised
+    while another process is still building. Without seed it starts empty (a build in
+    progress elsewhere is retired and will not be promoted).
+    Returns (build_name, build_collection, seeded_from), where seeded_from is the collection
+    the build's contents came from (None if it started empty).
+    """
+    vector_store = get_vector_store()
+    owner = new_build_owner()
+    build_name, seeded = begin_build(VECTOR_DB_PATH, collection_name, owner, resume=seed, lease_seconds=COLLECTION_BUILD_LEASE_SECONDS)
+    heartbeat = BuildHeartbeat(VECTOR_DB_PATH, collection_name, build_name, owner, COLLECTION_BUILD_LEASE_SECONDS / 4)
+    with _own_builds_lock:
+        _own_builds[build_name] = (owner, heartbeat)
+    if seeded:
+        print(f"⏯️  Resuming unfinished build '{build_name}' of '{collection_name}'.")
+        return build_name, vector_store.get_collection(name=build_name), build_name
+
+    try:
+        # Drop whatever a previous, interrupted attempt left behind and start clean
+        try:
+            vector_store.delete_collection(name=build_name)
+        except Exception:
+            pass
+        collection = vector_store.create_collection(name=build_name, metadata={"embedder": EMBEDDER_ID})
+
+        seeded_from = None
+        if seed:
+            active_name = resolve_collection_name(VECTOR_DB_PATH, collection_name)
+            active = active_collection(collection_name)
+            if active is not None and _has_compatible_vectors(active):
+                copied = copy_collection(active, collection)
+                seeded_from = active_name
+                print(f"📋 Seeded '{build_name}' with {copied} chunks from '{active_name}'.")
+            elif active is not None:
+                print(f"🧹 '{active_name}' was built with a different embedder; '{build_name}' starts empty and everything is re-embedded.")
+
+        mark_build_seeded(VECTOR_DB_PATH, collection_name, build_name, owner)
+    except BaseException:
+        release_collection_build(build_name)
+        raise
+    print(f"🆕 Building '{build_name}' for '{collection_name}'.")
+    return build_name, collection, seeded_from
+
+def finish_collection_build(collection_name: str, build_name: str, changed: bool = True):
+    """
+    Flips the alias of collection_name to build_name (running apps pick it up on their next
+    request), or discards the build if nothing changed. A promoted build gets its BM25 index
+    (see lexical_index) and article/chapter index (see structure_index) first. Then deletes
+    versions (and their indexes) that were retired more than COLLECTION_GRACE_SECONDS ago.
+    Raises collection_aliases.BuildSupersededError if the build was retired or taken over
+    meanwhile; it is then left to garbage collection.
+    """
+    # lexical_index and structure_index import helpers from this module
+    from lexical_index import delete_lexical_index, sync_lexical_index
+    from structure_index import build_structure_index, delete_structure_index
+
+    with _own_builds_lock:
+        if build_name not in _own_builds:
+            raise ValueError(f"'{build_name}' was not started by this process.")
+        owner, _ = _own_builds[build_name]
+    vector_store = get_vector_store()
+    try:
+        if changed:
+            collection = vector_store.get_collection(name=build_name)
+            compact = getattr(collection, "compact", None)
+            if compact is not None:
+                # NumPy store: drop rows replaced or deleted during the build before it goes live
+                compact()
+            # The BM25 index goes live with the build; it is derived from the index of the version being replaced
+            sync_lexical_index(collection, VECTOR_DB_PATH, build_name, resolve_collection_name(VECTOR_DB_PATH, collection_name))
+            build_structure_index(collection, VECTOR_DB_PATH, build_name)
+            promote_build(VECTOR_DB_PATH, collection_name, build_name, owner)
+            # Tell running apps to switch collections and drop cached retrievals/answers
+            bump_collection_version(VECTOR_DB_PATH, collection_name)
+            print(f"🔀 '{collection_name}' now serves '{build_name}'.")
+        else:
+            if abandon_build(VECTOR_DB_PATH, collection_name, build_name, owner):
+                vector_store.delete_collection(name=build_name)
+            print(f"No changes; discarded build '{build_name}', '{collection_name}' unchanged.")
+    finally:
+        release_collection_build(build_name)
+    for deleted_name in collect_retired_versions(vector_store, VECTOR_DB_PATH, collection_name, COLLECTION_GRACE_SECONDS):
+        delete_lexical_index(VECTOR_DB_PATH, deleted_name)
+        delete_structure_index(VECTOR_DB_PATH, deleted_name)
+
+def iter_chunk_records(source_file: str, chunks: Iterable[str | tuple[str, dict]]) -> Iterator[tuple[str, str, dict]]:
+    """
+    (chunk ID, text, metadata) of each chunk of source_file, as they are stored.
+    """
+    occurrences = {}
+    for chunk_index, chunk in enumerate(chunks):
+        # Chunks are plain strings or (text, metadata) from iter_document_chunks
+        chunk, structure = chunk if isinstance(chunk, tuple) else (chunk, {})
+        chunk_hash = content_hash(chunk)
+        occurrence = occurrences.get(chunk_hash, 0)
+        occurrences[chunk_hash] = occurrence + 1
+        doc_metadata = {
+            "source_file": source_file,
+            "chunk_index": chunk_index,
+            "content_hash": chunk_hash,
+            "pages": "",
+            **structure,
+        }
+        yield make_chunk_id(source_file, chunk_hash, occurrence), chunk, doc_metadata
+
+def unchanged_chunk_count(collection, source_file: str, chunks: Iterable[str | tuple[str, dict]]) -> int | None:
+    """
+    Number of chunks if collection already holds exactly these chunks (and metadata) for
+    source_file, so upserting them would change nothing; None otherwise. Stops reading the
+    chunk stream at the first difference.
+    """
+    existing = collection.get(where={"source_file": source_file}, include=["metadatas"])
+    existing_metadata = dict(zip(existing["ids"], existing["metadatas"]))
+    count = 0
+    for doc_id, _, doc_metadata in iter_chunk_records(source_file, chunks):
+        if existing_metadata.get(doc_id) != doc_metadata:
+            return None
+        count += 1
+    return count if count == len(existing_metadata) else None
+
+def upsert_document_chunks(
+    collection,
+    source_file: str,
+    chunks: Iterable[str | tuple[str, dict]],
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+) -> dict:
+    """
+    Brings the chunks stored for source_file in line with the given chunk stream.
+    Unchanged chunks are skipped (at most their chunk_index metadata is updated), new or
+    edited chunks are embedded and upserted, and chunks no longer present are deleted.
+    Only chunks whose content hash is not already stored are ever embedded.
+    """
+    existing = collection.get(where={"source_file": source_file}, include=["metadatas"])
+    existing_metadata = dict(zip(existing["ids"], existing["metadatas"]))
+
+    seen_ids = set()
+    stats = {"chunks": 0, "embedded": 0, "unchanged": 0, "updated": 0, "deleted": 0}
+    start_time = time.perf_counter()
+
+    for batch in batched(iter_chunk_records(source_file, chunks), write_batch_size):
+        new_ids, new_documents, new_metadatas = [], [], []
+        moved_ids, moved_metadatas = [], []
+
+        for doc_id, chunk, doc_metadata in batch:
+            seen_ids.add(doc_id)
+            stats["chunks"] += 1
+
+            stored_metadata = existing_metadata.get(doc_id)
+            if stored_metadata is None:
+                new_ids.append(doc_id)
+                new_documents.append(chunk)
+                new_metadatas.append(doc_metadata)
+            else:
+                stats["unchanged"] += 1
+                if stored_metadata != doc_metadata:
+                    moved_ids.append(doc_id)
+                    moved_metadatas.append(doc_metadata)
+
+        if moved_ids:
+            # Position changed but text did not: refresh metadata without re-embedding
+            collection.update(ids=moved_ids, metadatas=moved_metadatas)
+            stats["updated"] += len(moved_ids)
+
+        if new_ids:
+            embeddings = get_embedder().encode(
+                new_documents,
+                batch_size=embed_batch_size,
+                show_progress_bar=False,
+            )
+            collection.upsert(
+                ids=new_ids,
+                documents=new_documents,
+                metadatas=new_metadatas,
+                embeddings=embeddings.tolist()
+            )
+            stats["embedded"] += len(new_ids)
+
+        elapsed = time.perf_counter() - start_time
+        print(f"  ... {stats['chunks']} chunks processed, {stats['embedded']} embedded ({stats['chunks'] / elapsed:.1f} chunks/sec)")
+
+    removed_ids = [doc_id for doc_id in existing_metadata if doc_id not in seen_ids]
+    for removed_batch in batched(removed_ids, write_batch_size):
+        collection.delete(ids=removed_batch)
+    stats["deleted"] = len(removed_ids)
+
+    stats["elapsed_seconds"] = time.perf_counter() - start_time
+    return stats
 
 
 # --- Main Ingestion Function ---
 def ingest_document(
     file_path: str,
     collection_name: str,
-    max_sentences_per_chunk: int = 5, # New parameter for sentence-based chunking
+    max_tokens_per_chunk: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    write_batch_size: int = WRITE_BATCH_SIZE,
 ):
     """
-    Uploads a file, extracts text, cleans, chunks, and stores it in ChromaDB.
-    Deletes existing collection to ensure embedding dimension compatibility.
+    Streams a file through extraction, cleaning, chunking and batched embedding into the vector store.
+    Ingestion is incremental: chunks are keyed by source file and content hash, so re-ingesting
+    an unchanged file embeds nothing and other files in the collection are left untouched.
+    The update is built in a new collection version and swapped in atomically.
     """
-    if not ingestion_chroma_client or not ingestion_embedder:
-        return {"status": "error", "message": "ChromaDB client or embedder not initialized."}
+    try:
+        get_vector_store()
+        get_embedder()
+    except Exception as e:
+        return {"status": "error", "message": f"Vector store client or embedder not initialized: {e}"}
 
     try:
         print(f"🔄 Processing file: {file_path}")
+        source_file = os.path.basename(file_path)
 
-        # 1. Extract raw text from file
-        raw_text = ""
-        if file_path.endswith('.pdf'):
-            doc = fitz.open(file_path)
-            for page in doc:
-                raw_text += page.get_text() + "\n" # Add newline between pages
-            doc.close()
-        elif file_path.endswith('.txt'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                raw_text = f.read()
-        else:
-            raise ValueError("Unsupported file type. Only .txt and .pdf are supported for ingestion.")
-
-        if not raw_text.strip():
-            return {"status": "error", "message": "Extracted text is empty. File might be empty or unreadable."}
-
-        # 2. Apply cleaning and normalization
-        cleaned_text = remove_common_headers(raw_text)
-        cleaned_text = clean_text_and_normalize_whitespace(cleaned_text)
-        
-        # 3. Extract specific Amharic text if any other language might be present
-        processed_text = extract_amharic_text_only(cleaned_text)
-        
-        if not processed_text.strip():
-            return {"status": "error", "message": "No meaningful text found after Amharic extraction/cleaning."}
-
-        # 4. Chunk text into smaller, manageable pieces for embedding
-        # Pass the new parameter here
-        chunks = chunk_text_by_sentences(processed_text, max_sentences_per_chunk=max_sentences_per_chunk)
-        
-        if not chunks:
+        chunks = iter_document_chunks(file_path, max_tokens_per_chunk, overlap_tokens)
+
+        # Pull the first chunk before touching the collection so an empty or unreadable
+        # file does not delete the chunks already stored for it.
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
             return {"status": "error", "message": "No chunks generated from the document after processing."}
 
-        print(f"✅ Text chunked into {len(chunks)} pieces.")
+        # A new version starts as a full copy of the live one: not worth making for a file it already holds as-is
+        start_time = time.perf_counter()
+        active = active_collection(collection_name)
+        if active is not None and _has_compatible_vectors(active):
+            unchanged = unchanged_chunk_count(active, source_file, chain([first_chunk], chunks))
+            if unchanged is not None:
+                elapsed = time.perf_counter() - start_time
+                print(f"⏭️  {source_file}: all {unchanged} chunks already stored unchanged; no new version built.")
+                return {
+                    "status": "success",
+                    "message": f"{source_file} is already ingested and unchanged ({unchanged} chunks).",
+                    "chunks": unchanged,
+                    "embedded": 0,
+                    "unchanged": unchanged,
+                    "deleted": 0,
+                    "elapsed_seconds": round(elapsed, 3),
+                    "chunks_per_sec": round(unchanged / elapsed, 2) if elapsed > 0 else 0.0,
+                }
+            # The check consumed part of the stream; start it over
+            chunks = iter_document_chunks(file_path, max_tokens_per_chunk, overlap_tokens)
+        else:
+            chunks = chain([first_chunk], chunks)
 
-        # 5. Delete existing collection and create a new one (crucial for dimension change)
+        # Changes go into a new version of the collection; the live one keeps serving queries
+        build_name, collection, _ = start_collection_build(collection_name)
         try:
-            ingestion_chroma_client.delete_collection(name=collection_name)
-            print(f"🧹 Old collection '{collection_name}' deleted to ensure dimension compatibility.")
-        except Exception as e:
-            print(f"Collection '{collection_name}' not found or could not be deleted (might be new): {e}")
-
-        collection = ingestion_chroma_client.create_collection(name=collection_name)
-        print(f"🆕 New collection '{collection_name}' created.")
-
-        # 6. Prepare data for ChromaDB
-        documents_to_add = []
-        metadatas_to_add = []
-        ids_to_add = []
-        embeddings_to_add = []
-
-        print("Embedding and adding chunks to ChromaDB...")
-        for i, chunk_content in enumerate(chunks):
-            doc_text = chunk_content
-            doc_id = f"{os.path.basename(file_path)}_{i}"
-            
-            doc_metadata = {
-                "source_file": os.path.basename(file_path),
-                "chunk_index": i,
-                "pages": "" # Still empty string as we're not tracking page numbers per chunk with this method
-            }
-            
-            embedding = ingestion_embedder.encode(doc_text).tolist()
-
-            documents_to_add.append(doc_text)
-            metadatas_to_add.append(doc_metadata)
-            ids_to_add.append(doc_id)
-            embeddings_to_add.append(embedding)
-
-        if documents_to_add:
-            collection.add(
-                documents=documents_to_add,
-                metadatas=metadatas_to_add,
-                ids=ids_to_add,
-                embeddings=embeddings_to_add
+            print(f"Embedding (batch size {embed_batch_size}) and upserting chunks into '{build_name}' (write batch size {write_batch_size})...")
+            stats = upsert_document_chunks(
+                collection,
+                source_file,
+                chunks,
+                embed_batch_size=embed_batch_size,
+                write_batch_size=write_batch_size,
             )
-            print(f"✅ Successfully added {len(documents_to_add)} chunks to ChromaDB collection '{collection_name}'.")
-        else:
-            print("No documents to add to ChromaDB after processing.")
+        except BaseException:
+            # Left for the next ingestion to resume
+            release_collection_build(build_name)
+            raise
+
+        finish_collection_build(
+            collection_name,
+            build_name,
+            changed=bool(stats["embedded"] or stats["deleted"] or stats["updated"]),
+        )
+
+        elapsed = stats["elapsed_seconds"]
+        chunks_per_sec = stats["chunks"] / elapsed if elapsed > 0 else 0.0
+        print(
+            f"✅ {source_file}: {stats['chunks']} chunks, {stats['embedded']} embedded, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted in {elapsed:.2f}s ({chunks_per_sec:.1f} chunks/sec)."
+        )
 
-        return {"status": "success", "message": f"Successfully ingested {len(documents_to_add)} chunks from {os.path.basename(file_path)}."}
+        return {
+            "status": "success",
+            "message": f"Successfully ingested {stats['chunks']} chunks from {source_file} ({stats['embedded']} embedded, {stats['deleted']} deleted).",
+            "chunks": stats["chunks"],
+            "embedded": stats["embedded"],
+            "unchanged": stats["unchanged"],
+            "deleted": stats["deleted"],
+            "elapsed_seconds": round(elapsed, 3),
+            "chunks_per_sec": round(chunks_per_sec, 2),
+        }
 
     except Exception as e:
         print(f"An error occurred during data ingestion: {e}")
@@ -0,0 +1,18 @@
+# gunicorn.conf.py
+# Production launch:  gunicorn -c gunicorn.conf.py app:app
+# (asyncio serving mode for /chat: gunicorn_async.conf.py)
+#
+# preload_app imports app.py once in the master; RAG_PRELOAD_MODELS=1 makes that import
+# load the SentenceTransformer (model_registry.warm_up) before the workers are forked, so
+# every worker shares the same model pages copy-on-write instead of loading its own copy.
+# Each worker still opens its own ChromaDB client and coalescer thread after the fork.
+import os
+
+os.environ.setdefault("RAG_PRELOAD_MODELS", "1")
+
+bind = os.getenv("RAG_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("RAG_WORKERS", "2"))
+threads = int(os.getenv("RAG_THREADS", "8"))
+preload_app = True
+# Two sequential Gemini calls can take a while; don't let the arbiter kill busy workers
+timeout = int(os.getenv("RAG_WORKER_TIMEOUT", "120"))
@@ -0,0 +1,20 @@
+# gunicorn_async.conf.py
+# Production launch of the async server (asgi_app.py):  gunicorn -c gunicorn_async.conf.py asgi_app:app
+#
+# Every worker is one process running one event loop (uvicorn's gunicorn worker class). It keeps
+# up to RAG_LLM_ASYNC_MAX_CONCURRENCY questions waiting on the model and runs retrieval on
+# RAG_ASYNC_RETRIEVAL_WORKERS threads, so workers are sized to the CPU cores available for
+# embedding, not to the number of concurrent requests as gunicorn.conf.py's threads are.
+# As there, preload_app loads the model once in the master and workers share it copy-on-write.
+import os
+
+os.environ.setdefault("RAG_PRELOAD_MODELS", "1")
+
+bind = os.getenv("RAG_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("RAG_ASYNC_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Connections not yet accepted; an async worker accepts far more clients than a threaded one
+backlog = int(os.getenv("RAG_BACKLOG", "2048"))
+# Async workers keep heartbeating while requests wait on the model; this only catches a stuck loop
+timeout = int(os.getenv("RAG_WORKER_TIMEOUT", "120"))
@@ -1,34 +1,305 @@
 # ingest_script.py
+# Ingests one or more documents (paths, directories or glob patterns) into the vector store (ChromaDB or the NumPy index, see RAG_VECTOR_BACKEND).
+#
+# Extraction and the regex-heavy cleaning/chunking run in a process pool across cores;
+# their output is fed through a bounded queue to a single consumer that embeds and
+# upserts into the collection. The whole run goes into a new version of the collection,
+# which replaces the live one atomically at the end (see collection_aliases.py), so the
+# app keeps answering from the old version until the new one is complete.
+# Progress is recorded in a state file so an interrupted run can be resumed; files whose
+# size, modification time and chunking settings are unchanged are skipped.
+#
+# A file with no extractable text (image-only or empty) is skipped, and one that cannot be
+# read at all is recorded as failed; neither holds back the rest of the corpus, and both are
+# tried again once the file changes. If embedding or writing a file fails, the build is kept
+# unpublished for a resumed run. --strict also keeps it unpublished when any file failed.
+#
+# Examples:
+#   python ingest_script.py constitution-amh.pdf
+#   python ingest_script.py docs/ "laws/**/*.pdf" --workers 8
+#   python ingest_script.py docs/ --restart            # ignore the saved state
+#   python ingest_script.py docs/ --strict             # publish only if every file was ingested
+import argparse
+import glob
+import json
 import os
-from data_ingestion import ingest_document
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# Define the path to your document
-# IMPORTANT: Make sure this path is correct on your system where you run this script.
-# Example: If your PDF is in the same directory as this script:
-DOCUMENT_TO_INGEST = "constitution-amh.pdf" # Change this to your actual file name
-# Or if it's a text file:
-# DOCUMENT_TO_INGEST = "your_amharic_text.txt"
+from data_ingestion import (
+    VECTOR_DB_PATH,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    EMBED_BATCH_SIZE,
+    WRITE_BATCH_SIZE,
+    extract_document_chunks,
+    finish_collection_build,
+    release_collection_build,
+    start_collection_build,
+    upsert_document_chunks,
+)
+from collection_aliases import BuildInProgressError, BuildSupersededError, load_alias_table, resolve_collection_name
+from model_registry import VECTOR_BACKEND, get_vector_store, get_embedder
 
 # Define the collection name (must match RAG_COLLECTION_NAME in app.py)
 COLLECTION_NAME = "collection4"
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+DEFAULT_STATE_FILE = os.path.join(VECTOR_DB_PATH, ".ingest_state.json")
+
+
+# --- Input Expansion ---
+
+def expand_inputs(inputs: list[str]) -> list[str]:
+    """
+    Resolves files, directories (searched recursively) and glob patterns to a sorted,
+    de-duplicated list of supported files.
+    """
+    files = set()
+    for item in inputs:
+        matches = glob.glob(item, recursive=True) if glob.has_magic(item) else [item]
+        for match in matches:
+            if os.path.isdir(match):
+                for root, _, names in os.walk(match):
+                    files.update(os.path.join(root, name) for name in names if name.lower().endswith(SUPPORTED_EXTENSIONS))
+            elif os.path.isfile(match) and match.lower().endswith(SUPPORTED_EXTENSIONS):
+                files.add(match)
+            elif not os.path.exists(match):
+                print(f"⚠️  '{match}' not found, skipping.")
+    return sorted(os.path.abspath(f) for f in files)
+
+def drop_duplicate_sources(files: list[str]) -> list[str]:
+    """
+    Chunks are keyed by file name, so two files with the same name would overwrite each other.
+    Keeps the first and reports the rest.
+    """
+    seen = {}
+    kept = []
+    for file_path in files:
+        name = os.path.basename(file_path)
+        if name in seen:
+            print(f"⚠️  Skipping '{file_path}': same file name as '{seen[name]}'.")
+            continue
+        seen[name] = file_path
+        kept.append(file_path)
+    return kept
+
+
+# --- Resume State ---
+# Keyed by physical collection: the files recorded for a collection are the ones whose
+# current chunks it holds, plus files that had no text ("no_text") or could not be read
+# ("error") as they were when last tried.
+
+def load_state(state_file: str, physical_name: str) -> dict:
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get(physical_name, {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state_file: str, physical_name: str, completed: dict):
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            all_state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        all_state = {}
+    all_state[physical_name] = completed
+    os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(all_state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, state_file)
+
+def file_signature(file_path: str, args) -> dict:
+    # Re-chunking with other settings changes every chunk, so they are part of the signature
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "chunking": [args.max_tokens, args.overlap_tokens]}
+
+
+# --- Pipeline ---
+
+def produce(pool: ProcessPoolExecutor, files: list[str], args, work_queue: queue.Queue):
+    """
+    Submits extraction jobs in order. The queue is bounded, so at most queue_size files are
+    extracted ahead of the embedding consumer.
+    """
+    for file_path in files:
+        work_queue.put((file_path, pool.submit(extract_document_chunks, file_path, args.max_tokens, args.overlap_tokens)))
+    work_queue.put(None)
+
+def recorded_failures(completed: dict, files: list[str]) -> dict:
+    """
+    file_path -> error of the given files recorded as unreadable in their current version.
+    """
+    return {f: completed[f]["error"] for f in files if "error" in completed.get(f, {})}
+
+def ingest_corpus(files: list[str], args) -> dict:
+    totals = {
+        "files": 0, "failed": 0, "no_text": 0, "incomplete": 0, "skipped": 0,
+        "chunks": 0, "embedded": 0, "deleted": 0, "updated": 0, "failures": {},
+    }
+
+    # Nothing to do if no build is pending and the live version already holds every file as-is
+    build_pending = bool(load_alias_table(VECTOR_DB_PATH).get(args.collection, {}).get("building"))
+    if not args.restart and not build_pending:
+        live = load_state(args.state_file, resolve_collection_name(VECTOR_DB_PATH, args.collection))
+        if all(live.get(f, {}).get("signature") == file_signature(f, args) for f in files):
+            totals["skipped"] = len(files)
+            totals["failures"] = recorded_failures(live, files)
+            print(f"⏭️  All {len(files)} file(s) already ingested and unchanged.")
+            return totals
+
+    build_name, collection, seeded_from = start_collection_build(args.collection)
+    completed = {} if args.restart or seeded_from is None else load_state(args.state_file, seeded_from)
+    pending = [f for f in files if completed.get(f, {}).get("signature") != file_signature(f, args)]
+    totals["skipped"] = len(files) - len(pending)
+    # Unreadable files that have not changed since they were tried
+    totals["failures"] = recorded_failures(completed, [f for f in files if f not in pending])
+    if totals["skipped"]:
+        print(f"⏭️  Resuming: {totals['skipped']} unchanged file(s) already processed, {len(pending)} to go.")
+    save_state(args.state_file, build_name, completed)
+
+    start_time = time.perf_counter()
+    work_queue = queue.Queue(maxsize=args.queue_size)
+    # Files recorded as unreadable or without text in this run
+    recorded = {}
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        producer = threading.Thread(target=produce, args=(pool, pending, args, work_queue), daemon=True)
+        producer.start()
+
+        for done, item in enumerate(iter(work_queue.get, None), start=1):
+            file_path, future = item
+            name = os.path.basename(file_path)
+            try:
+                _, chunks, extract_seconds = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); says nothing about the file
+                totals["incomplete"] += 1
+                print(f"❌ [{done}/{len(pending)}] {name}: extraction worker died: {e}")
+                continue
+            except Exception as e:
+                # Extraction is deterministic: the file fails the same way until it changes
+                totals["failed"] += 1
+                totals["failures"][file_path] = str(e)
+                print(f"❌ [{done}/{len(pending)}] {name} could not be read: {e}")
+                if not args.strict:
+                    completed[file_path] = recorded[file_path] = {"signature": file_signature(file_path, args), "error": str(e)}
+                    save_state(args.state_file, build_name, completed)
+                continue
+
+            if not chunks:
+                # Image-only or empty; any chunks stored for an earlier version are kept
+                totals["no_text"] += 1
+                print(f"⏭️  [{done}/{len(pending)}] {name}: no extractable text, skipped.")
+                completed[file_path] = recorded[file_path] = {"signature": file_signature(file_path, args), "chunks": 0, "no_text": True}
+                save_state(args.state_file, build_name, completed)
+                continue
+
+            try:
+                stats = upsert_document_chunks(
+                    collection,
+                    name,
+                    chunks,
+                    embed_batch_size=args.embed_batch_size,
+                    write_batch_size=args.write_batch_size,
+                )
+            except Exception as e:
+                # The file's chunks may be half written; the build must not go live like this
+                totals["incomplete"] += 1
+                print(f"❌ [{done}/{len(pending)}] {name}: embedding/writing failed: {e}")
+                continue
+
+            for key in ("chunks", "embedded", "deleted", "updated"):
+                totals[key] += stats[key]
+            totals["files"] += 1
+            completed[file_path] = {"signature": file_signature(file_path, args), "chunks": stats["chunks"]}
+            save_state(args.state_file, build_name, completed)
+
+            embed_seconds = stats["elapsed_seconds"]
+            print(
+                f"✅ [{done}/{len(pending)}] {name}: "
+                f"{stats['chunks']} chunks ({stats['embedded']} embedded, {stats['deleted']} deleted), "
+                f"extract {extract_seconds:.2f}s, embed+write {embed_seconds:.2f}s "
+                f"({stats['chunks'] / embed_seconds if embed_seconds else 0:.1f} chunks/sec)"
+            )
+
+        producer.join()
+
+    # A resumed build may already hold changes from the interrupted run
+    changed = seeded_from == build_name or bool(totals["embedded"] or totals["deleted"] or totals["updated"])
+    held_back = totals["incomplete"] or (args.strict and totals["failed"])
+    totals["published"] = False
+    if held_back and changed:
+        # Keep the partial build for a resumed run instead of publishing it
+        release_collection_build(build_name)
+        reason = f"{totals['incomplete']} file(s) were not fully written" if totals["incomplete"] else f"{totals['failed']} file(s) failed (--strict)"
+        print(f"⚠️  {reason}; '{build_name}' was not published. Re-run to resume.")
+    else:
+        if not changed and recorded:
+            # The build is discarded, so the live version records them instead of being retried next run
+            live_name = resolve_collection_name(VECTOR_DB_PATH, args.collection)
+            save_state(args.state_file, live_name, {**load_state(args.state_file, live_name), **recorded})
+        try:
+            finish_collection_build(args.collection, build_name, changed)
+            totals["published"] = changed
+        except BuildSupersededError as e:
+            print(f"⚠️  {e} It was retired (e.g. by /clear_db) while this run was building it.")
+
+    totals["elapsed_seconds"] = time.perf_counter() - start_time
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest PDF/TXT documents into the vector store.")
+    parser.add_argument("inputs", nargs="*", default=["constitution-amh.pdf"], help="Files, directories or glob patterns (default: constitution-amh.pdf).")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help=f"Target collection (default: {COLLECTION_NAME}).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Extraction/cleaning processes (default: CPU count).")
+    parser.add_argument("--queue-size", type=int, default=8, help="Max extracted files waiting for the embedder.")
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS, help=f"Embedder tokens per chunk (default: {CHUNK_MAX_TOKENS}).")
+    parser.add_argument("--overlap-tokens", type=int, default=CHUNK_OVERLAP_TOKENS, help=f"Tokens shared by consecutive chunks of an article (default: {CHUNK_OVERLAP_TOKENS}).")
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE)
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="Where progress is recorded for resuming.")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and process every file.")
+    parser.add_argument("--strict", action="store_true", help="Do not publish the build if any file could not be read.")
+    args = parser.parse_args()
+
+    files = drop_duplicate_sources(expand_inputs(args.inputs))
+    if not files:
+        print("Error: no .pdf or .txt files found for the given inputs.")
+        return
+
+    try:
+        get_vector_store()
+        get_embedder()
+    except Exception as e:
+        print(f"Error: vector store client or embedder not initialized: {e}")
+        return
+
+    print(f"Ingesting {len(files)} file(s) into {VECTOR_BACKEND} collection '{args.collection}' with {args.workers} worker(s).")
+    try:
+        totals = ingest_corpus(files, args)
+    except BuildInProgressError as e:
+        print(f"Error: {e} Wait for it to finish (or for its process to exit) and run again.")
+        return
 
-print(f"Attempting to ingest data from: {DOCUMENT_TO_INGEST}")
-print(f"Into ChromaDB collection: {COLLECTION_NAME}")
-
-if not os.path.exists(DOCUMENT_TO_INGEST):
-    print(f"Error: Document '{DOCUMENT_TO_INGEST}' not found. Please place it in the same directory or update the path.")
-else:
-    # Call the ingestion function
-    # You can adjust chunk_by, group_size, max_characters, language_type as needed
-    result = ingest_document(
-        file_path=DOCUMENT_TO_INGEST,
-        collection_name=COLLECTION_NAME,
-    )
     print("\nIngestion Result:")
-    print(result)
+    print(
+        f"  files ingested: {totals['files']}, skipped (unchanged): {totals['skipped']}, no text: {totals['no_text']}, "
+        f"failed: {totals['failed']}, not fully written: {totals['incomplete']}"
+    )
+    print(f"  chunks: {totals['chunks']}, embedded: {totals['embedded']}, deleted: {totals['deleted']}")
+    if totals["failures"]:
+        print(f"  unreadable files (tried again once they change, or with --restart):")
+        for file_path, error in totals["failures"].items():
+            print(f"    {file_path}: {error}")
+    if totals.get("elapsed_seconds"):
+        elapsed = totals["elapsed_seconds"]
+        print(f"  wall time: {elapsed:.2f}s, {totals['files'] / elapsed:.2f} files/sec, {totals['chunks'] / elapsed:.1f} chunks/sec")
+
 
-    if result["status"] == "success":
-        print("\n--- IMPORTANT ---")
-        print("Data ingestion completed. To use the new data in your chatbot,")
-        print("PLEASE RESTART YOUR FLASK APPLICATION (`python app.py`).")
-        print("-----------------")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+import os
+import re
+import math
+from collections import Counter
+
+import numpy as np
+
+from data_ingestion import clean_text_and_normalize_whitespace, extract_amharic_text_only
+
+# --- BM25 Lexical Index ---
+# Complements embedding retrieval with exact term matching, which matters for legal terms and
+# article numbers ("አንቀጽ 39") that embeddings tend to blur. One index file per physical
+# collection version, next to the alias table:
+#   {db_path}/lexical_index/{physical_name}.npz
+# holding CSR postings (term_offsets into postings_docs/postings_tfs), document lengths and
+# the vocabulary and document IDs as newline-joined UTF-8 blobs, so loading is a handful of
+# array reads. data_ingestion updates the index when it promotes a build by diffing the
+# build's chunk IDs against the index of the version it replaces: only added chunks are
+# tokenized, removed ones are dropped from the postings.
+
+LEXICAL_INDEX_DIR = "lexical_index"
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60 # reciprocal rank fusion constant (as in Cormack et al.)
+
+# Ethiopic syllables, Ethiopic numerals and Arabic digits; punctuation (። ፣ ፤ ...) separates tokens
+TOKEN_PATTERN = re.compile(r'[ሀ-ፚ]+|[፩-፼]+|[0-9]+')
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Index/query terms: the text is run through the same cleaning as ingestion
+    (clean_text_and_normalize_whitespace, extract_amharic_text_only) and split into words and numbers.
+    """
+    cleaned = extract_amharic_text_only(clean_text_and_normalize_whitespace(text))
+    return TOKEN_PATTERN.findall(cleaned.casefold())
+
+def lexical_index_path(db_path: str, physical_name: str) -> str:
+    return os.path.join(db_path, LEXICAL_INDEX_DIR, f"{physical_name}.npz")
+
+def _join(strings) -> np.ndarray:
+    return np.frombuffer("\n".join(strings).encode('utf-8'), dtype=np.uint8)
+
+def _split(blob: np.ndarray) -> list[str]:
+    text = blob.tobytes().decode('utf-8')
+    return text.split("\n") if text else []
+
+
+class BM25Index:
+    def __init__(self, doc_ids, doc_lengths, terms, term_offsets, postings_docs, postings_tfs):
+        self.doc_ids = list(doc_ids)
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.int32)
+        self.terms = list(terms)
+        self.term_offsets = np.asarray(term_offsets, dtype=np.int64)
+        self.postings_docs = np.asarray(postings_docs, dtype=np.int32)
+        self.postings_tfs = np.asarray(postings_tfs, dtype=np.uint16)
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+        self._doc_index = None # doc_id -> document number, built on first filtered search
+        self.average_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    @classmethod
+    def empty(cls) -> "BM25Index":
+        return cls([], [], [], [0], [], [])
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    # --- Building ---
+
+    def update(self, added, removed_ids=()) -> "BM25Index":
+        """
+        Returns a new index without removed_ids and with added, an iterable of (doc_id, text).
+        Existing postings are carried over as arrays; only the added texts are tokenized.
+        """
+        removed_ids = set(removed_ids)
+        keep = np.fromiter((doc_id not in removed_ids for doc_id in self.doc_ids), dtype=bool, count=len(self.doc_ids))
+        new_doc_number = np.cumsum(keep) - 1
+
+        # Existing postings as (term, doc, tf) triples, minus removed documents
+        posting_terms = np.repeat(np.arange(len(self.terms), dtype=np.int32), np.diff(self.term_offsets))
+        kept_postings = keep[self.postings_docs] if len(self.postings_docs) else np.zeros(0, dtype=bool)
+        term_parts = [posting_terms[kept_postings]]
+        doc_parts = [new_doc_number[self.postings_docs[kept_postings]].astype(np.int32)]
+        tf_parts = [self.postings_tfs[kept_postings]]
+
+        doc_ids = [doc_id for doc_id, kept in zip(self.doc_ids, keep) if kept]
+        doc_lengths = list(self.doc_lengths[keep])
+        terms = list(self.terms)
+        term_index = dict(self.term_index)
+
+        new_terms, new_docs, new_tfs = [], [], []
+        for doc_id, text in added:
+            tokens = tokenize(text)
+            doc_number = len(doc_ids)
+            doc_ids.append(doc_id)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                if term not in term_index:
+                    term_index[term] = len(terms)
+                    terms.append(term)
+                new_terms.append(term_index[term])
+                new_docs.append(doc_number)
+                new_tfs.append(min(tf, np.iinfo(np.uint16).max))
+        term_parts.append(np.asarray(new_terms, dtype=np.int32))
+        doc_parts.append(np.asarray(new_docs, dtype=np.int32))
+        tf_parts.append(np.asarray(new_tfs, dtype=np.uint16))
+
+        posting_terms = np.concatenate(term_parts)
+        postings_docs = np.concatenate(doc_parts)
+        postings_tfs = np.concatenate(tf_parts)
+
+        # Drop terms no document uses any more, then regroup postings by term
+        document_frequency = np.bincount(posting_terms, minlength=len(terms))
+        used = document_frequency > 0
+        term_number = np.cumsum(used) - 1
+        posting_terms = term_number[posting_terms] if len(posting_terms) else posting_terms
+        order = np.lexsort((postings_docs, posting_terms))
+        term_offsets = np.concatenate([[0], np.cumsum(document_frequency[used])])
+
+        return BM25Index(
+            doc_ids,
+            doc_lengths,
+            [term for term, is_used in zip(terms, used) if is_used],
+            term_offsets,
+            postings_docs[order],
+            postings_tfs[order],
+        )
+
+    # --- Persistence ---
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            doc_ids=_join(self.doc_ids),
+            doc_lengths=self.doc_lengths,
+            terms=_join(self.terms),
+            term_offsets=self.term_offsets,
+            postings_docs=self.postings_docs,
+            postings_tfs=self.postings_tfs,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            return cls(
+                _split(data["doc_ids"]),
+                data["doc_lengths"],
+                _split(data["terms"]),
+                data["term_offsets"],
+                data["postings_docs"],
+                data["postings_tfs"],
+            )
+
+    # --- Search ---
+
+    def search(self, query_text: str, n_results: int = 10, allowed_ids=None) -> list[tuple[str, float]]:
+        """
+        Top n_results (doc_id, BM25 score) for query_text; documents without any query term
+        are not returned. allowed_ids, if given, restricts the results to those IDs.
+        """
+        n_docs = len(self.doc_ids)
+        if not n_docs:
+            return []
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query_text)):
+            term_id = self.term_index.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tfs = self.postings_tfs[start:end].astype(np.float32)
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / self.average_length)
+            scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+        if allowed_ids is not None:
+            if self._doc_index is None:
+                self._doc_index = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+            allowed = np.zeros(n_docs, dtype=bool)
+            allowed[[self._doc_index[doc_id] for doc_id in allowed_ids if doc_id in self._doc_index]] = True
+            scores[~allowed] = 0.0
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > n_results:
+            matched = matched[np.argpartition(-scores[matched], n_results - 1)[:n_results]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(self.doc_ids[i], float(scores[i])) for i in matched]
+
+
+# --- Index Lifecycle ---
+
+def _collection_ids(collection, batch_size: int = 10000) -> list[str]:
+    ids = []
+    while True:
+        page = collection.get(limit=batch_size, offset=len(ids), include=[])
+        if not len(page["ids"]):
+            return ids
+        ids.extend(page["ids"])
+
+def _documents(collection, ids: list[str], batch_size: int = 1000):
+    for start in range(0, len(ids), batch_size):
+        page = collection.get(ids=ids[start:start + batch_size], include=["documents"])
+        yield from zip(page["ids"], page["documents"])
+
+def sync_lexical_index(collection, db_path: str, physical_name: str, base_name: str | None = None) -> BM25Index:
+    """
+    Brings the index of physical_name in line with the collection's contents and saves it.
+    Starts from the saved index of physical_name, else of base_name (the version a build
+    was seeded from), else from scratch; only chunks missing from it are tokenized.
+    """
+    base = BM25Index.empty()
+    for name in (physical_name, base_name):
+        if name and os.path.exists(lexical_index_path(db_path, name)):
+            base = BM25Index.load(lexical_index_path(db_path, name))
+            break
+
+    current_ids = _collection_ids(collection)
+    indexed = set(base.doc_ids)
+    current = set(current_ids)
+    added = [doc_id for doc_id in current_ids if doc_id not in indexed]
+    removed = indexed - current
+
+    index = base
+    if added or removed or not os.path.exists(lexical_index_path(db_path, physical_name)):
+        index = base.update(_documents(collection, added), removed)
+        index.save(lexical_index_path(db_path, physical_name))
+        print(f"🔤 Lexical index for '{physical_name}': {len(index)} chunks, {len(index.terms)} terms (+{len(added)} / -{len(removed)}).")
+    return index
+
+def load_lexical_index(collection, db_path: str, physical_name: str) -> BM25Index:
+    """
+    Loads the saved index of a live collection; collections ingested before the index
+    existed get one built (and saved) on first load.
+    """
+    path = lexical_index_path(db_path, physical_name)
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    return sync_lexical_index(collection, db_path, physical_name)
+
+def delete_lexical_index(db_path: str, physical_name: str):
+    try:
+        os.remove(lexical_index_path(db_path, physical_name))
+    except FileNotFoundError:
+        pass
+
+
+# --- Fusion ---
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K) -> list[tuple[str, float]]:
+    """
+    Fuses ranked ID lists: score(id) = sum over rankings of 1 / (k + rank), rank from 1.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def fuse_results(vector_results: dict, lexical_hits, collection, n_results: int, k: int = RRF_K) -> dict:
+    """
+    Fuses a single-query collection.query result with BM25 hits and returns the top
+    n_results in the same result shape. Chunks found only lexically are fetched from the
+    collection and have a distance of None; "rrf_scores" holds the fused scores.
+    """
+    vector_ids = vector_results["ids"][0]
+    records = {
+        doc_id: (document, metadata, distance)
+        for doc_id, document, metadata, distance in zip(
+            vector_ids,
+            vector_results["documents"][0],
+            (vector_results.get("metadatas") or [[None] * len(vector_ids)])[0],
+            (vector_results.get("distances") or [[None] * len(vector_ids)])[0],
+        )
+    }
+    fused = reciprocal_rank_fusion([vector_ids, [doc_id for doc_id, _ in lexical_hits]], k)[:n_results]
+
+    missing = [doc_id for doc_id, _ in fused if doc_id not in records]
+    if missing:
+        fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+        for doc_id, document, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+            records[doc_id] = (document, metadata, None)
+    fused = [(doc_id, score) for doc_id, score in fused if doc_id in records]
+
+    return {
+        "ids": [[doc_id for doc_id, _ in fused]],
+        "documents": [[records[doc_id][0] for doc_id, _ in fused]],
+        "metadatas": [[records[doc_id][1] for doc_id, _ in fused]],
+        "distances": [[records[doc_id][2] for doc_id, _ in fused]],
+        "rrf_scores": [[score for _, score in fused]],
+    }
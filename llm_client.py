@@ -0,0 +1,449 @@
+import random
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- Resilient LLM Client ---
+# GeneratorClient wraps a generative model (genai.GenerativeModel or the llm_stub models) and
+# exposes the same generate_content(prompt, stream=False), so rag_pipeline can use either.
+# Every call gets:
+#   - a per-attempt timeout and an overall deadline: attempts run on a worker thread, so a
+#     stuck upstream response no longer holds the calling request thread;
+#   - retries with exponential backoff and full jitter for timeouts, rate limits (429) and
+#     server errors (5xx), within the deadline;
+#   - optionally a hedged request: if the first attempt has not answered after
+#     hedge_after_seconds, an identical second one is sent and the first answer wins;
+#   - a cap of max_concurrency outstanding upstream calls (calls wait for a slot until their
+#     deadline; hedges are only sent when a slot is free);
+#   - a circuit breaker that fails calls fast while the upstream keeps failing.
+# When no answer can be produced, LLMUnavailableError is raised and the app falls back to
+# returning the retrieved passages.
+# AsyncGeneratorClient applies the same policy to generate_content_async for the asyncio
+# server (asgi_app.py); there a waiting call costs no thread and losing hedges are cancelled.
+
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+class LLMUnavailableError(Exception):
+    """
+    The model did not produce a response: it timed out, kept failing, was overloaded or the circuit is open.
+    """
+
+class LLMTimeoutError(LLMUnavailableError):
+    pass
+
+class LLMOverloadedError(LLMUnavailableError):
+    pass
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Timeouts, connection errors and HTTP 408/429/5xx (google.api_core exceptions carry the
+    status as .code) are worth retrying; anything else (bad request, safety block) is not.
+    """
+    if isinstance(error, (LLMTimeoutError, TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """
+    Closed until failure_threshold consecutive failures, then open: calls are rejected for
+    cooldown_seconds. After that it is half-open and lets one trial call through, which
+    closes the circuit on success and opens it again on failure.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self.opened = 0 # times the circuit has opened
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self.clock() - self._opened_at < self.cooldown_seconds:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        Ends a half-open trial call that told nothing about the upstream (e.g. a bad request).
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = self.clock()
+                self.opened += 1
+            self._trial_in_flight = False
+
+
+class _ResilientClient:
+    """
+    Settings, retry policy and counters shared by GeneratorClient and AsyncGeneratorClient.
+    """
+
+    def __init__(
+        self,
+        model,
+        timeout_seconds: float = 20.0,
+        deadline_seconds: float = 45.0,
+        max_retries: int = 2,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8.0,
+        hedge_after_seconds: float | None = None,
+        max_concurrency: int = 16,
+        breaker: CircuitBreaker | None = None,
+        forward_timeout: bool = False,
+    ):
+        """
+        forward_timeout passes each attempt's timeout to the model as
+        request_options={"timeout": ...} (google.generativeai), so abandoned attempts are
+        also cut off upstream instead of only being stopped from waiting on.
+        """
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge_after_seconds = hedge_after_seconds
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.forward_timeout = forward_timeout
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            ("calls", "succeeded", "unavailable", "attempts", "retries", "hedges", "timeouts", "errors", "rejected", "overloaded"), 0)
+        self._in_flight = 0
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._counts[key] += amount
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counts)
+            stats["in_flight"] = self._in_flight
+        stats["circuit"] = self.breaker.state
+        stats["circuit_opened"] = self.breaker.opened
+        return stats
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spread retries of concurrent callers over the whole backoff window
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (attempt - 1)))
+
+    def _request_options(self, timeout: float) -> dict:
+        return {"request_options": {"timeout": timeout}} if self.forward_timeout else {}
+
+    def _started(self):
+        with self._lock:
+            self._in_flight += 1
+            self._counts["attempts"] += 1
+
+    def _ended(self):
+        with self._lock:
+            self._in_flight -= 1
+
+
+class GeneratorClient(_ResilientClient):
+    def __init__(self, model, **settings):
+        super().__init__(model, **settings)
+        # One worker per slot: a submitted attempt never waits in the executor's queue
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+
+    # --- Calls ---
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """
+        Same contract as genai.GenerativeModel.generate_content. With stream=True the deadline,
+        retries and hedging cover the request up to the first piece of the answer (nothing
+        has reached the caller before that); the rest of the stream is passed through.
+        """
+        if stream:
+            return self._stream(prompt)
+        return self._generate(prompt, stream=False)
+
+    def _stream(self, prompt: str):
+        iterator, first = self._generate(prompt, stream=True)
+        if first is not None:
+            yield first
+        yield from iterator
+
+    def _generate(self, prompt: str, stream: bool):
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline_seconds
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                backoff = self._backoff(attempt)
+                if time.monotonic() + backoff >= deadline:
+                    break
+                time.sleep(backoff)
+                self._count("retries")
+            elif self.deadline_seconds <= 0:
+                break
+            if not self.breaker.allow():
+                self._count("rejected")
+                self._count("unavailable")
+                raise CircuitOpenError("The model is unavailable (circuit open).") from last_error
+            try:
+                result = self._attempt(prompt, stream, deadline)
+            except LLMOverloadedError:
+                # Our own slots are busy; says nothing about the upstream
+                self.breaker.release()
+                self._count("overloaded")
+                self._count("unavailable")
+                raise
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                continue
+            self.breaker.record_success()
+            self._count("succeeded")
+            return result
+        self._count("unavailable")
+        raise LLMUnavailableError(f"The model did not answer within {self.deadline_seconds:.0f}s: {last_error}") from last_error
+
+    def _attempt(self, prompt: str, stream: bool, deadline: float):
+        """
+        One attempt (plus its hedge, if any); returns the first successful response.
+        """
+        timeout = min(self.timeout_seconds, deadline - time.monotonic())
+        first = self._start(prompt, stream, timeout, block_seconds=deadline - time.monotonic())
+        if first is None:
+            raise LLMOverloadedError(f"All {self.max_concurrency} model call slots stayed busy until the deadline.")
+        attempt_deadline = time.monotonic() + timeout
+        pending = {first}
+
+        if self.hedge_after_seconds and self.hedge_after_seconds < timeout:
+            done, _ = wait(pending, timeout=self.hedge_after_seconds)
+            if not done:
+                hedge = self._start(prompt, stream, attempt_deadline - time.monotonic(), block_seconds=0)
+                if hedge is not None:
+                    self._count("hedges")
+                    pending.add(hedge)
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, attempt_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+                self._count("errors")
+        if error is not None and not pending:
+            raise error
+        self._count("timeouts")
+        raise LLMTimeoutError(f"No response from the model within {timeout:.1f}s.")
+
+    def _start(self, prompt: str, stream: bool, timeout: float, block_seconds: float):
+        """
+        Sends one upstream call on a worker thread and returns its Future, or None if no slot
+        frees up within block_seconds. The slot is held until the call returns, even if the
+        caller has stopped waiting for it.
+        """
+        if not self._slots.acquire(timeout=max(0.0, block_seconds)):
+            return None
+        self._started()
+        try:
+            future = self._executor.submit(self._call, prompt, stream, timeout)
+        except BaseException:
+            self._finished()
+            raise
+        future.add_done_callback(lambda _: self._finished())
+        return future
+
+    def _finished(self):
+        self._ended()
+        self._slots.release()
+
+    def _call(self, prompt: str, stream: bool, timeout: float):
+        kwargs = self._request_options(timeout)
+        if not stream:
+            return self.model.generate_content(prompt, **kwargs)
+        iterator = iter(self.model.generate_content(prompt, stream=True, **kwargs))
+        return iterator, next(iterator, None)
+
+
+class AsyncGeneratorClient(_ResilientClient):
+    """
+    GeneratorClient for asyncio code: wraps model.generate_content_async with the same
+    timeouts, retries, hedging, concurrency cap and circuit breaker. Attempts are tasks on
+    the caller's event loop, so max_concurrency is limited by what the upstream accepts
+    rather than by threads; attempts that lose a hedge, time out, or whose caller goes away
+    are cancelled.
+    """
+
+    def __init__(self, model, **settings):
+        super().__init__(model, **settings)
+        self._slots = None # asyncio.Semaphore, created on the loop that first uses it
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        """
+        Same contract as genai.GenerativeModel.generate_content_async. With stream=True an
+        async iterator of response pieces is returned; as in GeneratorClient, the deadline,
+        retries and hedging cover the request up to the first piece.
+        """
+        if stream:
+            iterator, first = await self._generate(prompt, stream=True)
+            return self._stream(iterator, first)
+        return await self._generate(prompt, stream=False)
+
+    @staticmethod
+    async def _stream(iterator, first):
+        if first is not None:
+            yield first
+        async for chunk in iterator:
+            yield chunk
+
+    async def _generate(self, prompt: str, stream: bool):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline_seconds
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                backoff = self._backoff(attempt)
+                if time.monotonic() + backoff >= deadline:
+                    break
+                await asyncio.sleep(backoff)
+                self._count("retries")
+            elif self.deadline_seconds <= 0:
+                break
+            if not self.breaker.allow():
+                self._count("rejected")
+                self._count("unavailable")
+                raise CircuitOpenError("The model is unavailable (circuit open).") from last_error
+            try:
+                result = await self._attempt(prompt, stream, deadline)
+            except LLMOverloadedError:
+                self.breaker.release()
+                self._count("overloaded")
+                self._count("unavailable")
+                raise
+            except asyncio.CancelledError:
+                # The caller went away; a half-open trial says nothing about the upstream
+                self.breaker.release()
+                raise
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                continue
+            self.breaker.record_success()
+            self._count("succeeded")
+            return result
+        self._count("unavailable")
+        raise LLMUnavailableError(f"The model did not answer within {self.deadline_seconds:.0f}s: {last_error}") from last_error
+
+    async def _attempt(self, prompt: str, stream: bool, deadline: float):
+        timeout = min(self.timeout_seconds, deadline - time.monotonic())
+        first = await self._start(prompt, stream, timeout, block_seconds=deadline - time.monotonic())
+        if first is None:
+            raise LLMOverloadedError(f"All {self.max_concurrency} model call slots stayed busy until the deadline.")
+        attempt_deadline = time.monotonic() + timeout
+        pending = {first}
+        try:
+            if self.hedge_after_seconds and self.hedge_after_seconds < timeout:
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_after_seconds)
+                if not done:
+                    hedge = await self._start(prompt, stream, attempt_deadline - time.monotonic(), block_seconds=0)
+                    if hedge is not None:
+                        self._count("hedges")
+                        pending.add(hedge)
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, attempt_deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    self._count("errors")
+            if error is not None and not pending:
+                raise error
+            self._count("timeouts")
+            raise LLMTimeoutError(f"No response from the model within {timeout:.1f}s.")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _start(self, prompt: str, stream: bool, timeout: float, block_seconds: float):
+        """
+        Starts one upstream call as a task and returns it, or None if no slot frees up
+        within block_seconds. The slot is released when the task ends.
+        """
+        if block_seconds <= 0:
+            if self._slots.locked():
+                return None
+            await self._slots.acquire()
+        else:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=block_seconds)
+            except asyncio.TimeoutError:
+                return None
+        self._started()
+        task = asyncio.ensure_future(self._call(prompt, stream, timeout))
+        task.add_done_callback(self._finished)
+        return task
+
+    async def _call(self, prompt: str, stream: bool, timeout: float):
+        kwargs = self._request_options(timeout)
+        if not stream:
+            return await self.model.generate_content_async(prompt, **kwargs)
+        iterator = aiter(await self.model.generate_content_async(prompt, stream=True, **kwargs))
+        return iterator, await anext(iterator, None)
+
+    def _finished(self, task):
+        self._ended()
+        self._slots.release()
+        if not task.cancelled():
+            # Mark the exception of an abandoned attempt as retrieved
+            task.exception()
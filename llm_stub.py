@@ -0,0 +1,220 @@
+import math
+import zlib
+import random
+import asyncio
+import time
+import threading
+
+import numpy as np
+
+
+class StubResponse:
+    """
+    Mimics the parts of a google.generativeai response that the app reads.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel used for benchmarks and local runs.
+    Sleeps for latency_seconds plus seconds_per_1k_chars per 1000 prompt characters
+    (to model longer prompts costing more) and counts every call. With stream=True the
+    answer is yielded word by word, token_interval_seconds apart. generate_content_async
+    is the asyncio variant, like the real model's (with stream=True it returns an async iterator).
+    Select it in the app with RAG_LLM_BACKEND=stub.
+    """
+
+    def __init__(self, latency_seconds: float = 0.05, seconds_per_1k_chars: float = 0.0,
+                 token_interval_seconds: float = 0.01):
+        self.latency_seconds = latency_seconds
+        self.token_interval_seconds = token_interval_seconds
+        self.seconds_per_1k_chars = seconds_per_1k_chars
+        self.call_count = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def _simulated_latency(self, prompt: str) -> float:
+        return self.latency_seconds + self.seconds_per_1k_chars * len(prompt) / 1000
+
+    def _answer(self, prompt: str) -> str:
+        with self._lock:
+            self.call_count += 1
+            self.prompt_chars += len(prompt)
+        # Echo a slice of the prompt so answers differ per input but stay deterministic
+        body = " ".join(prompt.split())
+        return f"[stub] {body[-200:]}"
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        text = self._answer(prompt)
+        if stream:
+            return self._stream(prompt, text)
+        time.sleep(self._simulated_latency(prompt))
+        return StubResponse(text)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        text = self._answer(prompt)
+        if stream:
+            return self._stream_async(prompt, text)
+        await asyncio.sleep(self._simulated_latency(prompt))
+        return StubResponse(text)
+
+    def _stream(self, prompt: str, text: str):
+        """
+        Streams text word by word: the first piece arrives after the prompt latency and
+        the rest after token_interval_seconds each, like a real streaming response.
+        """
+        time.sleep(self._simulated_latency(prompt))
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_interval_seconds)
+            yield StubResponse(word if i == 0 else f" {word}")
+
+    async def _stream_async(self, prompt: str, text: str):
+        await asyncio.sleep(self._simulated_latency(prompt))
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_interval_seconds)
+            yield StubResponse(word if i == 0 else f" {word}")
+
+    def reset_counters(self):
+        with self._lock:
+            self.call_count = 0
+            self.prompt_chars = 0
+
+
+class StubServiceError(Exception):
+    """
+    Upstream failure raised by FaultyGenerativeModel. Like google.api_core exceptions it
+    carries the HTTP status as .code (429 rate limited, 503 unavailable).
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FaultyGenerativeModel(StubGenerativeModel):
+    """
+    StubGenerativeModel with random latency and failures, for exercising llm_client's
+    timeouts, retries, hedging and circuit breaker offline.
+      latency: lognormal with median latency_seconds and shape latency_sigma; with probability
+               tail_rate a call stalls for tail_seconds more (a stuck upstream request)
+      errors:  with probability error_rate a call fails with 503 and with rate_limit_rate
+               with 429, after error_latency_seconds
+    start_outage(seconds) makes every call fail with 503 for that long.
+    Select it in the app with RAG_LLM_BACKEND=fake (see the RAG_FAKE_LLM_* settings).
+    """
+
+    def __init__(self, latency_seconds: float = 0.5, latency_sigma: float = 0.0, tail_rate: float = 0.0,
+                 tail_seconds: float = 10.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 error_latency_seconds: float = 0.05, token_interval_seconds: float = 0.01, seed: int | None = None):
+        super().__init__(latency_seconds, 0.0, token_interval_seconds)
+        self.latency_sigma = latency_sigma
+        self.tail_rate = tail_rate
+        self.tail_seconds = tail_seconds
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.error_latency_seconds = error_latency_seconds
+        self.failures = 0
+        self._outage_until = 0.0
+        self._rng = random.Random(seed)
+
+    def start_outage(self, seconds: float):
+        self._outage_until = time.monotonic() + seconds
+
+    def _simulated_latency(self, prompt: str) -> float:
+        with self._lock:
+            latency = self.latency_seconds * math.exp(self._rng.gauss(0, self.latency_sigma)) if self.latency_sigma else self.latency_seconds
+            if self._rng.random() < self.tail_rate:
+                latency += self.tail_seconds
+        return latency
+
+    def _failure(self) -> StubServiceError | None:
+        if time.monotonic() < self._outage_until:
+            return StubServiceError(503, "Service unavailable (simulated outage).")
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.error_rate:
+            return StubServiceError(503, "Service unavailable (simulated).")
+        if draw < self.error_rate + self.rate_limit_rate:
+            return StubServiceError(429, "Resource exhausted: rate limit (simulated).")
+        return None
+
+    def _count_failure(self):
+        with self._lock:
+            self.call_count += 1
+            self.failures += 1
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        # kwargs (e.g. request_options) are accepted like the real client's and ignored
+        failure = self._failure()
+        if failure is not None:
+            self._count_failure()
+            time.sleep(self.error_latency_seconds)
+            raise failure
+        return super().generate_content(prompt, stream=stream)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        failure = self._failure()
+        if failure is not None:
+            self._count_failure()
+            await asyncio.sleep(self.error_latency_seconds)
+            raise failure
+        return await super().generate_content_async(prompt, stream=stream)
+
+    def reset_counters(self):
+        super().reset_counters()
+        with self._lock:
+            self.failures = 0
+
+
+class StubEmbedder:
+    """
+    Offline stand-in for the SentenceTransformer embedder. A text's vector is its words and
+    their character trigrams hashed (crc32, so vectors are the same in every process) into
+    `dimensions` buckets, L2-normalized: texts sharing words come out close, which is enough
+    for retrieval to find the chunk a question was taken from. Encoding is cheap, so
+    benchmarks measure the pipeline around the model rather than the model.
+    Select it with RAG_EMBEDDER_BACKEND=stub (see model_registry).
+    """
+
+    def __init__(self, dimensions: int = 768, ngram: int = 3):
+        self.dimensions = dimensions
+        self.ngram = ngram
+        self.call_count = 0
+        self.texts_encoded = 0
+        self._lock = threading.Lock()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimensions
+
+    def _features(self, text: str):
+        for word in text.split():
+            yield word
+            padded = f"<{word}>"
+            for i in range(max(1, len(padded) - self.ngram + 1)):
+                yield padded[i:i + self.ngram]
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        """
+        Same call shape as SentenceTransformer.encode: one vector for a string, a
+        (len(sentences), dimensions) float32 array for a list.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        with self._lock:
+            self.call_count += 1
+            self.texts_encoded += len(texts)
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                bucket = zlib.crc32(feature.encode('utf-8'))
+                # The top bit picks the sign so unrelated features cancel out instead of piling up
+                vectors[row, bucket % self.dimensions] += 1.0 if bucket >> 31 else -1.0
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
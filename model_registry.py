@@ -0,0 +1,143 @@
+import gc
+import os
+import math
+import threading
+
+# Define paths and model names (shared by app.py, data_ingestion.py and the scripts)
+CHROMA_DB_PATH = "./chroma_db_data"
+EMBEDDER_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2' # The 768-dim model
+EMBEDDER_MAX_TOKENS = 128 # the model's max_seq_length: longer input is truncated before embedding
+
+# --- Embedder Backend ---
+# "sentence_transformers" loads EMBEDDER_MODEL_NAME; "stub" (llm_stub.StubEmbedder) hashes words
+# into vectors of the same size, so ingestion, retrieval and the benchmarks run offline.
+# Collections record EMBEDDER_ID, and vectors of one are never reused by the other.
+EMBEDDER_BACKENDS = ("sentence_transformers", "stub")
+EMBEDDER_BACKEND = os.getenv("RAG_EMBEDDER_BACKEND", "sentence_transformers")
+if EMBEDDER_BACKEND not in EMBEDDER_BACKENDS:
+    raise ValueError(f"RAG_EMBEDDER_BACKEND must be one of {EMBEDDER_BACKENDS}, got '{EMBEDDER_BACKEND}'.")
+EMBEDDER_DIMENSIONS = 768
+EMBEDDER_ID = EMBEDDER_MODEL_NAME if EMBEDDER_BACKEND == "sentence_transformers" else f"stub-hash-{EMBEDDER_DIMENSIONS}"
+
+# --- Token Counting ---
+# Chunks and prompt context are sized in the embedder's own tokens. "tokenizer" loads only the
+# embedder's tokenizer (not the model), so it is cheap in ingest_script's worker processes;
+# "estimate" (one token per CHARS_PER_TOKEN_ESTIMATE non-space characters) needs no download
+# and is meant for offline runs with the stub models.
+TOKEN_COUNTERS = ("tokenizer", "estimate")
+TOKEN_COUNTER = os.getenv("RAG_TOKEN_COUNTER", "tokenizer")
+if TOKEN_COUNTER not in TOKEN_COUNTERS:
+    raise ValueError(f"RAG_TOKEN_COUNTER must be one of {TOKEN_COUNTERS}, got '{TOKEN_COUNTER}'.")
+CHARS_PER_TOKEN_ESTIMATE = 3
+
+# --- Vector Store Backend ---
+# "chroma" (ChromaDB PersistentClient) or "numpy" (vector_store.NumpyVectorStore: memory-mapped
+# float16/int8 matrix with exact search). Each backend keeps its collections, alias table and
+# version stamps in its own directory, VECTOR_DB_PATH.
+VECTOR_BACKENDS = ("chroma", "numpy")
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma")
+if VECTOR_BACKEND not in VECTOR_BACKENDS:
+    raise ValueError(f"RAG_VECTOR_BACKEND must be one of {VECTOR_BACKENDS}, got '{VECTOR_BACKEND}'.")
+NUMPY_INDEX_PATH = "./vector_index_data"
+NUMPY_INDEX_DTYPE = os.getenv("RAG_NUMPY_INDEX_DTYPE", "float16") # float16 | int8
+NUMPY_INDEX_RESIDENT = os.getenv("RAG_NUMPY_INDEX_RESIDENT", "0") == "1" # decode to float32 in RAM once per process
+VECTOR_DB_PATH = CHROMA_DB_PATH if VECTOR_BACKEND == "chroma" else NUMPY_INDEX_PATH
+
+# --- Process-wide Singletons ---
+# Nothing is loaded at import time. The embedder is created on first use and is safe to
+# share with forked workers (read-only weights, shared copy-on-write). The ChromaDB client
+# holds SQLite handles that must not cross a fork, so it is re-created whenever it is
+# requested from a different process than the one that created it.
+
+_lock = threading.Lock()
+_embedder = None
+_chroma_client = None
+_chroma_client_pid = None
+_numpy_store = None
+_tokenizer = None
+
+
+def get_embedder():
+    """
+    Returns the process's SentenceTransformer (or StubEmbedder, see EMBEDDER_BACKEND), loading it on first call.
+    """
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None and EMBEDDER_BACKEND == "stub":
+                from llm_stub import StubEmbedder
+                _embedder = StubEmbedder(EMBEDDER_DIMENSIONS)
+                print("Using offline stub embedder (RAG_EMBEDDER_BACKEND=stub).")
+            elif _embedder is None:
+                from sentence_transformers import SentenceTransformer
+                print(f"Loading SentenceTransformer model: {EMBEDDER_MODEL_NAME}")
+                _embedder = SentenceTransformer(EMBEDDER_MODEL_NAME)
+                print("SentenceTransformer model loaded.")
+    return _embedder
+
+def get_chroma_client():
+    """
+    Returns the process's ChromaDB PersistentClient, creating it on first call (or after a fork).
+    """
+    global _chroma_client, _chroma_client_pid
+    if _chroma_client is None or _chroma_client_pid != os.getpid():
+        with _lock:
+            if _chroma_client is None or _chroma_client_pid != os.getpid():
+                import chromadb
+                print(f"Initializing ChromaDB client at: {CHROMA_DB_PATH}")
+                _chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+                _chroma_client_pid = os.getpid()
+    return _chroma_client
+
+def get_vector_store():
+    """
+    Returns the process's client for the configured VECTOR_BACKEND. Both expose the same
+    collection API (get_or_create_collection, create_collection, get_collection, delete_collection).
+    """
+    global _numpy_store
+    if VECTOR_BACKEND == "chroma":
+        return get_chroma_client()
+    if _numpy_store is None:
+        with _lock:
+            if _numpy_store is None:
+                from vector_store import NumpyVectorStore
+                print(f"Initializing NumPy vector store at: {NUMPY_INDEX_PATH} ({NUMPY_INDEX_DTYPE})")
+                _numpy_store = NumpyVectorStore(NUMPY_INDEX_PATH, dtype=NUMPY_INDEX_DTYPE, resident=NUMPY_INDEX_RESIDENT)
+    return _numpy_store
+
+def get_tokenizer():
+    """
+    Returns the process's copy of the embedder's (fast) tokenizer, loading it on first call.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _lock:
+            if _tokenizer is None:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(EMBEDDER_MODEL_NAME)
+    return _tokenizer
+
+def count_tokens(text: str) -> int:
+    """
+    Number of embedder tokens in text, without the special tokens the model adds (see TOKEN_COUNTER).
+    """
+    if TOKEN_COUNTER == "estimate":
+        return math.ceil(sum(1 for c in text if not c.isspace()) / CHARS_PER_TOKEN_ESTIMATE)
+    return len(get_tokenizer()(text, add_special_tokens=False)["input_ids"])
+
+def warm_up(load_vector_store: bool = False):
+    """
+    Loads shared state ahead of time. Call it in a pre-fork server's master process
+    (see gunicorn.conf.py) so workers inherit the model pages copy-on-write instead of each
+    loading their own copy. The vector store client is only loaded when load_vector_store is
+    set, since forked workers re-create the ChromaDB client anyway.
+    """
+    embedder = get_embedder()
+    # One tiny encode allocates the inference buffers before workers fork
+    embedder.encode(["warm-up"], show_progress_bar=False)
+    if load_vector_store:
+        get_vector_store()
+    # Move everything loaded so far out of the GC's reach so collections in the workers
+    # don't touch (and thereby copy) the shared pages
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+# Keys of a collection.query result that hold one list per query embedding
+PER_QUERY_RESULT_KEYS = ("ids", "documents", "distances", "metadatas", "embeddings", "uris", "data")
+
+
+class QueryCoalescer:
+    """
+    Coalesces concurrent retrieval requests into batches.
+
+    Requests that arrive within max_wait_ms of the first one in a batch (up to
+    max_batch_size requests) are embedded with one embedder.encode(list) call and looked
+    up with one collection.query(query_embeddings=[...]) call; each caller then receives
+    its own slice of the results, shaped exactly like a single-query collection.query
+    result. Requests that already have an embedding (e.g. from a cache) skip encoding.
+
+    get_embedder and get_collection are callables so the model is loaded lazily and the
+    coalescer always queries the current collection (it may be swapped by /clear_db or
+    re-ingestion).
+    """
+
+    def __init__(self, get_embedder, get_collection, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.get_embedder = get_embedder
+        self.get_collection = get_collection
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self._worker = threading.Thread(target=self._run, name="query-coalescer", daemon=True)
+        self._worker.start()
+
+    def submit(self, query_text: str, n_results: int, query_embedding=None, timeout: float | None = None):
+        """
+        Blocks until the batch containing this request has been processed.
+        Returns (query_embedding, results).
+        """
+        future = Future()
+        self._queue.put((query_text, n_results, query_embedding, future))
+        return future.result(timeout=timeout)
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._process(batch)
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch: list):
+        embeddings = [item[2] for item in batch]
+        to_encode = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if to_encode:
+            encoded = self.get_embedder().encode([batch[i][0] for i in to_encode], show_progress_bar=False)
+            for i, vector in zip(to_encode, encoded):
+                embeddings[i] = vector.tolist()
+
+        # One query for the whole batch, with the largest n_results any caller asked for
+        max_n_results = max(item[1] for item in batch)
+        results = self.get_collection().query(query_embeddings=embeddings, n_results=max_n_results)
+
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+
+        for i, (_, n_results, _, future) in enumerate(batch):
+            single_result = {
+                key: [value[i][:n_results]] if key in PER_QUERY_RESULT_KEYS and value is not None else value
+                for key, value in results.items()
+            }
+            future.set_result((embeddings[i], single_result))
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class PrefetchedQueries:
+    """
+    Retrieval for a batch of questions known up front (the /chat/batch endpoint and
+    batch_answer.py): all of them are embedded with one embedder.encode(list) call and
+    looked up with one collection.query(query_embeddings=[...]) call when the object is
+    created. submit() has the same contract as QueryCoalescer.submit and hands each question
+    its slice of the results, so retrieve_context runs unchanged on top of it; questions
+    that need a query of their own (e.g. restricted to a chapter) take their vector from
+    embedding(). Questions given an embedding (e.g. from a cache) skip encoding.
+    """
+
+    def __init__(self, embedder, collection, queries: list[str], n_results: int, embeddings=None, timer=None):
+        self.embedder = embedder
+        self.collection = collection
+        self.n_results = n_results
+        self._index = {}
+        unique = []
+        for i, query_text in enumerate(queries):
+            if query_text not in self._index:
+                self._index[query_text] = len(unique)
+                unique.append((query_text, embeddings[i] if embeddings is not None else None))
+        self.embeddings = [embedding for _, embedding in unique]
+        self.results = None
+        if not unique:
+            return
+
+        to_encode = [i for i, embedding in enumerate(self.embeddings) if embedding is None]
+        if to_encode:
+            with _timed(timer, "embed"):
+                encoded = embedder.encode([unique[i][0] for i in to_encode], show_progress_bar=False)
+            for i, vector in zip(to_encode, encoded):
+                self.embeddings[i] = vector.tolist()
+        with _timed(timer, "retrieve"):
+            self.results = collection.query(query_embeddings=self.embeddings, n_results=n_results)
+
+    def __len__(self):
+        return len(self._index)
+
+    def embedding(self, query_text: str):
+        """
+        The question's vector, or None if it was not part of the batch.
+        """
+        i = self._index.get(query_text)
+        return self.embeddings[i] if i is not None else None
+
+    def submit(self, query_text: str, n_results: int, query_embedding=None, timeout: float | None = None):
+        """
+        Returns (query_embedding, results) like QueryCoalescer.submit. Questions outside the
+        batch, or asking for more results than were fetched, are queried on their own.
+        """
+        i = self._index.get(query_text)
+        if i is None or n_results > self.n_results:
+            if query_embedding is None:
+                query_embedding = self.embedding(query_text) or self.embedder.encode(query_text).tolist()
+            return query_embedding, self.collection.query(query_embeddings=[query_embedding], n_results=n_results)
+        single_result = {
+            key: [value[i][:n_results]] if key in PER_QUERY_RESULT_KEYS and value is not None else value
+            for key, value in self.results.items()
+        }
+        return self.embeddings[i], single_result
+
+def _timed(timer, stage: str):
+    return timer(stage) if timer is not None else nullcontext()
@@ -0,0 +1,243 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+# --- Collection Version Stamp ---
+# Ingestion writes a fresh token to a small file next to the ChromaDB data whenever it
+# changes a collection. The app reads it on each request (a tiny file read) and drops
+# the retrieval and answer caches when the token changes, so re-ingesting from another
+# process never serves stale retrievals or answers.
+
+def collection_version_path(db_path: str, collection_name: str) -> str:
+    return os.path.join(db_path, f".{collection_name}.version")
+
+def bump_collection_version(db_path: str, collection_name: str) -> str:
+    """
+    Marks the collection as changed. Returns the new version token.
+    """
+    version = str(time.time_ns())
+    os.makedirs(db_path, exist_ok=True)
+    path = collection_version_path(db_path, collection_name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    return version
+
+def read_collection_version(db_path: str, collection_name: str):
+    """
+    Returns the current version token, or None if the collection was never stamped.
+    """
+    try:
+        with open(collection_version_path(db_path, collection_name), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+# --- Key Helpers ---
+
+def normalize_query(text: str) -> str:
+    """
+    Canonical form of a query used as a cache key: NFC, case-folded, single-spaced.
+    """
+    text = unicodedata.normalize('NFC', text)
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+def embedding_key(embedding) -> str:
+    """
+    Hashable key for an embedding vector (float32 bytes, hashed).
+    """
+    return hashlib.sha1(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+# --- Cache Levels ---
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a maximum size and a per-entry TTL (ttl_seconds=None disables expiry).
+    Keeps hit/miss/eviction counters.
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, ttl_seconds: float | None = 3600):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, expires_at) -> bool:
+        return expires_at is not None and expires_at < time.monotonic()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[0]):
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class AnswerCache(LRUCache):
+    """
+    Answer cache keyed on (normalized query, n_results, ...). Each entry also keeps the
+    query's unit-normalized embedding so that get_similar can serve a cached answer
+    for a differently-worded query whose cosine similarity is above a threshold.
+    Answers cached without an embedding (e.g. article lookups) are only served exactly.
+    """
+
+    def __init__(self, name: str, max_size: int = 256, ttl_seconds: float | None = 3600,
+                 semantic_threshold: float | None = None):
+        super().__init__(name, max_size, ttl_seconds)
+        self.semantic_threshold = semantic_threshold
+        self.semantic_hits = 0
+        self.semantic_misses = 0
+
+    def put_answer(self, key, answer: str, embedding=None):
+        if embedding is None:
+            self.put(key, (answer, None))
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        self.put(key, (answer, vector / norm if norm else vector))
+
+    def get_answer(self, key):
+        entry = self.get(key)
+        return entry[0] if entry else None
+
+    def get_similar(self, embedding, n_results: int, *scope):
+        """
+        Returns the cached answer closest to embedding if it is within semantic_threshold, else None.
+        Only entries cached for the same n_results (and the rest of the key after the query,
+        given as scope) are considered.
+        """
+        if not self.semantic_threshold:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        query = query / norm
+
+        with self._lock:
+            candidates = [
+                (key, value) for key, (expires_at, value) in self._entries.items()
+                if key[1:] == (n_results, *scope) and value[1] is not None and not self._expired(expires_at)
+            ]
+            if candidates:
+                similarities = np.stack([value[1] for _, value in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.semantic_threshold:
+                    best_key, (answer, _) = candidates[best]
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    return answer
+            self.semantic_misses += 1
+            return None
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        lookups = self.semantic_hits + self.semantic_misses
+        stats.update({
+            "semantic_threshold": self.semantic_threshold,
+            "semantic_hits": self.semantic_hits,
+            "semantic_misses": self.semantic_misses,
+            "semantic_hit_rate": round(self.semantic_hits / lookups, 4) if lookups else 0.0,
+        })
+        return stats
+
+
+class RagCache:
+    """
+    The three cache levels used by generate_rag_answer:
+      - embeddings: normalized query text -> query embedding
+      - retrievals: (embedding key, n_results) -> ChromaDB query results
+      - answers:    (normalized query, n_results) -> final answer (optionally semantic)
+    Retrievals and answers are dropped whenever the collection version changes; embeddings
+    are kept, since they only depend on the embedder (see invalidate).
+    """
+
+    def __init__(self, embedding_size=1024, embedding_ttl=None,
+                 retrieval_size=512, retrieval_ttl=600,
+                 answer_size=256, answer_ttl=3600, semantic_threshold=None):
+        self.embeddings = LRUCache("embeddings", embedding_size, embedding_ttl)
+        self.retrievals = LRUCache("retrievals", retrieval_size, retrieval_ttl)
+        self.answers = AnswerCache("answers", answer_size, answer_ttl, semantic_threshold)
+        self.collection_version = None
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """
+        Drops retrievals and answers. Query embeddings only depend on the embedder, not on
+        the collection, so they are kept.
+        """
+        with self._lock:
+            self.retrievals.clear()
+            self.answers.clear()
+            self.invalidations += 1
+
+    def sync_collection_version(self, version):
+        """
+        Invalidates the cache if the collection version differs from the last one seen.
+        """
+        if version != self.collection_version:
+            with self._lock:
+                changed = version != self.collection_version
+                self.collection_version = version
+            if changed:
+                self.invalidate()
+
+    def stats(self) -> dict:
+        return {
+            "collection_version": self.collection_version,
+            "invalidations": self.invalidations,
+            "embeddings": self.embeddings.stats(),
+            "retrievals": self.retrievals.stats(),
+            "answers": self.answers.stats(),
+        }
@@ -0,0 +1,223 @@
+import hashlib
+from contextlib import nullcontext
+
+import numpy as np
+
+# --- Pipeline Modes ---
+# single_pass:     one LLM call, retrieved chunks + question in the same prompt
+# two_pass:        summarize the retrieved chunks, then answer from the summary (original behaviour)
+# two_pass_cached: as two_pass, but summaries are reused for the same set of retrieved chunk IDs
+PIPELINE_MODES = ("single_pass", "two_pass", "two_pass_cached")
+
+NO_SUMMARY_TEXT = "No summary could be generated from the provided context."
+
+
+# --- Prompt Builders ---
+
+def build_summary_prompt(context: str) -> str:
+    return f"""
+        እርስዎ አጋዥ የ AI ረዳት ነዎት። ከቀረበው የአማርኛ ጽሑፍ ውስጥ ዋና ዋና ነጥቦችን እና ዝርዝሮችን ሳይለቁ ጠቅለል ያለ ማጠቃለያ ይፍጠሩ።
+
+        ጽሑፍ:
+        {context}
+        """
+
+def build_answer_prompt(context: str, query_text: str) -> str:
+    """
+    Answer prompt. In two-pass modes context is the summary; in single-pass mode it is
+    the retrieved chunks themselves.
+    """
+    return f"""
+        እርስዎ አጋዥ የ AI ረዳት ነዎት። ጥያቄውን ለመመለስ የቀረበውን ጽሑፍ ብቻ ይጠቀሙ።
+
+        ጽሑፍ:
+        {context}
+
+        ጥያቄ:
+        {query_text}
+
+        መልሱን ግልጽ እና አጭር በሆነ መንገድ በጽሑፉ ላይ ብቻ በመመስረት ይመልሱ።
+        """
+
+def summary_cache_namespace(model_name: str) -> str:
+    """
+    Namespace for SummaryCache keys: changes whenever the model or the summary prompt changes.
+    """
+    prompt_fingerprint = hashlib.sha256(build_summary_prompt("").encode('utf-8')).hexdigest()[:12]
+    return f"{model_name}:{prompt_fingerprint}"
+
+
+# --- Context Packing ---
+# Retrieval returns more candidates than the prompt should hold; pack_context picks the ones
+# that go in by maximal marginal relevance: each step takes the candidate that best trades
+# relevance to the query against similarity to the chunks already picked, among those that
+# still fit the token budget. Near-copies of a picked chunk (overlapping chunks, the same
+# text in two documents) are dropped outright.
+
+def pack_context(token_counts, token_budget: int, query_embedding=None, chunk_embeddings=None,
+                 lambda_mult: float = 0.7, duplicate_threshold: float = 0.95) -> list[int]:
+    """
+    Indices of the candidates (given in retrieval order) to put in the prompt, in the order
+    picked. Without embeddings (e.g. article lookups) candidates are taken in retrieval order
+    while they fit. The first pick is always taken, even if it alone exceeds the budget.
+    """
+    token_counts = np.asarray(token_counts, dtype=np.int64)
+    if query_embedding is None or chunk_embeddings is None:
+        selected, used = [], 0
+        for i, tokens in enumerate(token_counts):
+            if not selected or used + tokens <= token_budget:
+                selected.append(i)
+                used += int(tokens)
+        return selected
+
+    vectors = np.asarray(chunk_embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    selected, used = [], 0
+    redundancy = np.zeros(len(token_counts), dtype=np.float32)
+    available = np.ones(len(token_counts), dtype=bool)
+    while True:
+        candidates = available & (used + token_counts <= token_budget) if selected else available
+        if not candidates.any():
+            return selected
+        scores = np.where(candidates, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        used += int(token_counts[best])
+        available[best] = False
+        available &= similarity[best] < duplicate_threshold
+        redundancy = np.maximum(redundancy, similarity[best])
+
+
+# --- Generation ---
+# Every function below takes an optional timer: a callable mapping a stage name
+# ("summarize_llm", "answer_llm") to a context manager that measures it.
+
+def _timed(timer, stage: str):
+    return timer(stage) if timer is not None else nullcontext()
+
+def response_text(response_obj):
+    """
+    Returns the text of a generate_content response, or None if there is none.
+    """
+    return response_obj.text if response_obj and hasattr(response_obj, 'text') else None
+
+def summarize_context(model, context: str, chunk_ids=None, summary_cache=None, timer=None) -> str:
+    """
+    First pass of the two-pass pipeline. With a summary_cache and chunk_ids, a summary
+    previously produced for the same set of chunks is returned without calling the model.
+    """
+    if summary_cache is not None and chunk_ids:
+        cached_summary = summary_cache.get(chunk_ids)
+        if cached_summary is not None:
+            return cached_summary
+
+    with _timed(timer, "summarize_llm"):
+        summary = response_text(model.generate_content(build_summary_prompt(context)))
+    if summary is None:
+        return NO_SUMMARY_TEXT
+
+    if summary_cache is not None and chunk_ids:
+        summary_cache.put(chunk_ids, summary)
+    return summary
+
+def build_final_prompt(model, query_text: str, retrieved_chunks, retrieved_ids=None,
+                       mode: str = "two_pass", summary_cache=None, timer=None) -> str:
+    """
+    Runs every step of the pipeline except the final answer call and returns its prompt.
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{mode}'. Expected one of {PIPELINE_MODES}.")
+
+    context = "\n\n".join(retrieved_chunks)
+    if mode == "single_pass":
+        return build_answer_prompt(context, query_text)
+
+    cache = summary_cache if mode == "two_pass_cached" else None
+    summarized_context = summarize_context(model, context, retrieved_ids, cache, timer)
+    return build_answer_prompt(summarized_context, query_text)
+
+def generate_answer(model, query_text: str, retrieved_chunks, retrieved_ids=None,
+                    mode: str = "two_pass", summary_cache=None, timer=None):
+    """
+    Produces the final answer for query_text from the retrieved chunks using the given
+    pipeline mode. Returns None if the model returned no text.
+    """
+    final_prompt = build_final_prompt(model, query_text, retrieved_chunks, retrieved_ids, mode, summary_cache, timer)
+    with _timed(timer, "answer_llm"):
+        return response_text(model.generate_content(final_prompt))
+
+def stream_answer(model, query_text: str, retrieved_chunks, retrieved_ids=None,
+                  mode: str = "two_pass", summary_cache=None, timer=None):
+    """
+    Like generate_answer, but yields the final answer's text as the model streams it
+    (generate_content(..., stream=True)). In two-pass modes the summary step still runs
+    to completion first, since the answer prompt needs the whole summary.
+    """
+    final_prompt = build_final_prompt(model, query_text, retrieved_chunks, retrieved_ids, mode, summary_cache, timer)
+    # answer_llm covers the whole stream, from the request to the last token
+    with _timed(timer, "answer_llm"):
+        for chunk in model.generate_content(final_prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Gemini raises on .text for chunks without text parts (e.g. safety stops)
+                continue
+            if text:
+                yield text
+
+
+# --- Async Generation ---
+# Counterparts of the functions above for the asyncio server (asgi_app.py): the model calls
+# are awaited (model.generate_content_async), everything else is the same. Summary cache
+# lookups are local SQLite reads and stay synchronous.
+
+async def summarize_context_async(model, context: str, chunk_ids=None, summary_cache=None, timer=None) -> str:
+    if summary_cache is not None and chunk_ids:
+        cached_summary = summary_cache.get(chunk_ids)
+        if cached_summary is not None:
+            return cached_summary
+
+    with _timed(timer, "summarize_llm"):
+        summary = response_text(await model.generate_content_async(build_summary_prompt(context)))
+    if summary is None:
+        return NO_SUMMARY_TEXT
+
+    if summary_cache is not None and chunk_ids:
+        summary_cache.put(chunk_ids, summary)
+    return summary
+
+async def build_final_prompt_async(model, query_text: str, retrieved_chunks, retrieved_ids=None,
+                                   mode: str = "two_pass", summary_cache=None, timer=None) -> str:
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{mode}'. Expected one of {PIPELINE_MODES}.")
+
+    context = "\n\n".join(retrieved_chunks)
+    if mode == "single_pass":
+        return build_answer_prompt(context, query_text)
+
+    cache = summary_cache if mode == "two_pass_cached" else None
+    summarized_context = await summarize_context_async(model, context, retrieved_ids, cache, timer)
+    return build_answer_prompt(summarized_context, query_text)
+
+async def generate_answer_async(model, query_text: str, retrieved_chunks, retrieved_ids=None,
+                                mode: str = "two_pass", summary_cache=None, timer=None):
+    final_prompt = await build_final_prompt_async(model, query_text, retrieved_chunks, retrieved_ids, mode, summary_cache, timer)
+    with _timed(timer, "answer_llm"):
+        return response_text(await model.generate_content_async(final_prompt))
+
+async def stream_answer_async(model, query_text: str, retrieved_chunks, retrieved_ids=None,
+                              mode: str = "two_pass", summary_cache=None, timer=None):
+    final_prompt = await build_final_prompt_async(model, query_text, retrieved_chunks, retrieved_ids, mode, summary_cache, timer)
+    with _timed(timer, "answer_llm"):
+        async for chunk in await model.generate_content_async(final_prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
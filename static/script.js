@@ -26,8 +26,35 @@ document.addEventListener('DOMContentLoaded', function() {
         chatMessages.appendChild(typingIndicator);
         chatMessages.scrollTop = chatMessages.scrollHeight;
 
+        let botMessageDiv = null;
+        function appendToken(text) {
+            if (!botMessageDiv) {
+                // First token: replace the typing indicator with the answer bubble
+                if (typingIndicator.parentNode) {
+                    chatMessages.removeChild(typingIndicator);
+                }
+                botMessageDiv = document.createElement('div');
+                botMessageDiv.classList.add('message', 'bot-message');
+                chatMessages.appendChild(botMessageDiv);
+            }
+            botMessageDiv.textContent += text;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        }
+
+        function handleEvent(eventName, data) {
+            if (eventName === 'meta') {
+                if (!data.cached && data.chunks.length > 0) {
+                    typingIndicator.textContent = `${data.chunks.length} ተዛማጅ ክፍሎች ተገኝተዋል። መልስ እየተዘጋጀ ነው...`;
+                }
+            } else if (eventName === 'token') {
+                appendToken(data.text);
+            } else if (eventName === 'error') {
+                appendToken(data.message);
+            }
+        }
+
         try {
-            const response = await fetch('/chat', {
+            const response = await fetch('/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -35,18 +62,50 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: JSON.stringify({ message: message }),
             });
 
-            const data = await response.json();
-            
-            chatMessages.removeChild(typingIndicator);
-
-            if (response.ok) {
-                appendMessage('bot', data.response);
-            } else {
+            if (!response.ok || !response.body) {
+                const data = await response.json();
+                chatMessages.removeChild(typingIndicator);
                 appendMessage('bot', data.response || 'ችግር ተፈጥሯል።');
+                return;
+            }
+
+            // Parse the Server-Sent Events stream: messages are separated by a blank line
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    let eventName = 'message';
+                    let dataText = '';
+                    for (const line of rawEvent.split('\n')) {
+                        if (line.startsWith('event: ')) {
+                            eventName = line.slice(7);
+                        } else if (line.startsWith('data: ')) {
+                            dataText += line.slice(6);
+                        }
+                    }
+                    if (dataText) {
+                        handleEvent(eventName, JSON.parse(dataText));
+                    }
+                }
+            }
+
+            if (!botMessageDiv) {
+                appendToken('መልስ ማመንጨት አልተቻለም።');
             }
         } catch (error) {
             console.error('Error sending message:', error);
-            chatMessages.removeChild(typingIndicator);
+            if (typingIndicator.parentNode) {
+                chatMessages.removeChild(typingIndicator);
+            }
             appendMessage('bot', 'የአውታረ መረብ ስህተት ተከስቷል። እባክዎ እንደገና ይሞክሩ።');
         }
     }
@@ -69,7 +128,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const data = await response.json();
             if (response.ok) {
                 appendMessage('bot', `መረጃ ቋት ጸድቷል: ${data.message}`);
-                alert('መረጃ ቋት በተሳካ ሁኔታ ጸድቷል። እባክዎ ለውጦቹን ለማንቃት አፕሊኬሽኑን እንደገና ያስጀምሩ።');
+                alert('መረጃ ቋት በተሳካ ሁኔታ ጸድቷል።');
             } else {
                 appendMessage('bot', `መረጃ ቋት ማጽዳት አልተሳካም: ${data.message || 'ያልታወቀ ስህተት'}`);
             }
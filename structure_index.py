@@ -0,0 +1,178 @@
+import os
+import re
+import json
+
+from data_ingestion import parse_amharic_number
+
+# --- Article / Chapter Index ---
+# Maps article numbers (with their sub-articles) and chapter numbers to the chunk IDs and
+# page ranges that hold them, built from the chapter/article/sub_articles/pages metadata
+# data_ingestion stores on every chunk. Questions that name an article ("አንቀጽ 39 ምን ይላል?")
+# are answered from the index with a direct ID lookup, without embedding the query or
+# searching the vectors; a chapter narrows semantic search to that chapter's chunks.
+# One JSON file per physical collection version, next to the alias table:
+#   {db_path}/structure_index/{physical_name}.json
+# A collection can hold several documents, so every entry is a list of spans, one per
+# source file, in (source_file, chunk_index) order.
+
+STRUCTURE_INDEX_DIR = "structure_index"
+
+_NUMBER = r'(\d+|[፩-፼]+)'
+_NUMBER_OR_WORDS = r'((?:አሥራ|አስራ|ሃያ|ሀያ)\s+[ሀ-ፚ]+|\d+|[፩-፼]+|[ሀ-ፚ]+)'
+# Queries attach prefixes ("በአንቀጽ 39", "የአንቀጽ 39"), so unlike the ingestion headings no
+# whitespace is required in front. A sub-article is "39(2)" or "አንቀጽ 39 ንዑስ አንቀጽ 2".
+ARTICLE_REFERENCE = re.compile(
+    r'(?<!ንዑስ )(?<!ንዑስ)አንቀ[ጽፅ]\s*' + _NUMBER
+    + r'(?:\s*\(\s*(\d+)\s*\)|\s+ንዑስ\s*አንቀ[ጽፅ]\s*(\d+))?'
+)
+CHAPTER_REFERENCE = re.compile(r'ም[ዕእ]ራፍ\s*' + _NUMBER_OR_WORDS)
+
+
+def structure_index_path(db_path: str, physical_name: str) -> str:
+    return os.path.join(db_path, STRUCTURE_INDEX_DIR, f"{physical_name}.json")
+
+def parse_structure_references(query: str) -> dict:
+    """
+    Finds article and chapter references in a question.
+    Returns {"articles": [(article, sub_article or None), ...], "chapter": number or None}.
+    """
+    articles = []
+    for match in ARTICLE_REFERENCE.finditer(query):
+        article = parse_amharic_number(match.group(1))
+        sub_article = match.group(2) or match.group(3)
+        reference = (article, int(sub_article) if sub_article else None)
+        if article is not None and reference not in articles:
+            articles.append(reference)
+    chapter = None
+    for match in CHAPTER_REFERENCE.finditer(query):
+        chapter = parse_amharic_number(match.group(1))
+        if chapter is None and len(match.group(1).split()) == 2:
+            # "ምዕራፍ ሦስት ስለ ..." - the second word is not part of the number
+            chapter = parse_amharic_number(match.group(1).split()[0])
+        if chapter is not None:
+            break
+    return {"articles": articles, "chapter": chapter}
+
+
+class StructureIndex:
+    def __init__(self, articles: dict | None = None, chapters: dict | None = None):
+        # str(article) -> [{source_file, chapter, page_start, page_end, chunk_ids, sub_articles: {str(n): ids}}]
+        self.articles = articles or {}
+        # str(chapter) -> [{source_file, articles, page_start, page_end, chunk_ids}]
+        self.chapters = chapters or {}
+
+    def __len__(self):
+        return len(self.articles)
+
+    @classmethod
+    def build(cls, records) -> "StructureIndex":
+        """
+        records: (chunk_id, metadata) in (source_file, chunk_index) order.
+        """
+        index = cls()
+        for chunk_id, metadata in records:
+            source_file = metadata.get("source_file", "")
+            page_start, page_end = metadata.get("page_start"), metadata.get("page_end")
+            chapter, article = metadata.get("chapter"), metadata.get("article")
+
+            if article is not None:
+                span = index._span(index.articles, article, source_file, chapter=chapter, sub_articles={})
+                span["chunk_ids"].append(chunk_id)
+                _extend_pages(span, page_start, page_end)
+                for sub_article in filter(None, str(metadata.get("sub_articles") or "").split(",")):
+                    span["sub_articles"].setdefault(sub_article, []).append(chunk_id)
+            if chapter is not None:
+                span = index._span(index.chapters, chapter, source_file, articles=[])
+                span["chunk_ids"].append(chunk_id)
+                _extend_pages(span, page_start, page_end)
+                if article is not None and article not in span["articles"]:
+                    span["articles"].append(article)
+        return index
+
+    @staticmethod
+    def _span(entries: dict, number: int, source_file: str, **fields) -> dict:
+        spans = entries.setdefault(str(number), [])
+        if not spans or spans[-1]["source_file"] != source_file:
+            spans.append({"source_file": source_file, "page_start": None, "page_end": None, "chunk_ids": [], **fields})
+        return spans[-1]
+
+    # --- Persistence ---
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"articles": self.articles, "chapters": self.chapters}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "StructureIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("articles"), data.get("chapters"))
+
+    # --- Lookup ---
+
+    def article_chunk_ids(self, article: int, sub_article: int | None = None) -> list[str]:
+        """
+        Chunk IDs of an article (only those holding sub_article, if given and indexed),
+        in document order; empty if the article is not in the index.
+        """
+        ids = []
+        for span in self.articles.get(str(article), []):
+            if sub_article is not None and str(sub_article) in span["sub_articles"]:
+                ids.extend(span["sub_articles"][str(sub_article)])
+            else:
+                ids.extend(span["chunk_ids"])
+        return ids
+
+    def chapter_chunk_ids(self, chapter: int) -> list[str]:
+        return [chunk_id for span in self.chapters.get(str(chapter), []) for chunk_id in span["chunk_ids"]]
+
+    def has_chapter(self, chapter: int) -> bool:
+        return str(chapter) in self.chapters
+
+def _extend_pages(span: dict, page_start, page_end):
+    if page_start is not None:
+        span["page_start"] = page_start if span["page_start"] is None else min(span["page_start"], page_start)
+    if page_end is not None:
+        span["page_end"] = page_end if span["page_end"] is None else max(span["page_end"], page_end)
+
+
+# --- Index Lifecycle ---
+
+def _collection_metadatas(collection, batch_size: int = 10000) -> list[tuple[str, dict]]:
+    records = []
+    while True:
+        page = collection.get(limit=batch_size, offset=len(records), include=["metadatas"])
+        if not len(page["ids"]):
+            break
+        records.extend(zip(page["ids"], page["metadatas"]))
+    records.sort(key=lambda record: (str((record[1] or {}).get("source_file", "")), (record[1] or {}).get("chunk_index", 0)))
+    return [(chunk_id, metadata or {}) for chunk_id, metadata in records]
+
+def build_structure_index(collection, db_path: str, physical_name: str) -> StructureIndex:
+    """
+    Builds the index of physical_name from its chunk metadata and saves it. Only metadata is
+    read, so rebuilding on every promote is cheap compared to the ingestion itself.
+    """
+    index = StructureIndex.build(_collection_metadatas(collection))
+    index.save(structure_index_path(db_path, physical_name))
+    print(f"📑 Structure index for '{physical_name}': {len(index.articles)} articles in {len(index.chapters)} chapters.")
+    return index
+
+def load_structure_index(collection, db_path: str, physical_name: str) -> StructureIndex:
+    """
+    Loads the saved index of a live collection; collections ingested before the index
+    existed get one built (and saved) on first load.
+    """
+    path = structure_index_path(db_path, physical_name)
+    if os.path.exists(path):
+        return StructureIndex.load(path)
+    return build_structure_index(collection, db_path, physical_name)
+
+def delete_structure_index(db_path: str, physical_name: str):
+    try:
+        os.remove(structure_index_path(db_path, physical_name))
+    except FileNotFoundError:
+        pass
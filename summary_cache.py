@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import hashlib
+import threading
+
+
+class SummaryCache:
+    """
+    Persistent cache of context summaries keyed on the *set* of retrieved chunk IDs.
+    Chunk IDs embed a content hash, so a key can only ever refer to the same text;
+    namespace should identify the model and summary prompt so a change to either
+    does not reuse old summaries.
+    Stored in a small SQLite file (next to chroma_db_data by default).
+    """
+
+    def __init__(self, path: str, namespace: str = ""):
+        self.path = path
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        Connection for the current process, opened on first use and again after a fork
+        (SQLite connections must not be shared across processes).
+        """
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL)")
+            self._conn.commit()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def make_key(self, chunk_ids) -> str:
+        joined = "\n".join(sorted(chunk_ids))
+        return hashlib.sha256(f"{self.namespace}\n{joined}".encode('utf-8')).hexdigest()
+
+    def get(self, chunk_ids):
+        key = self.make_key(chunk_ids)
+        with self._lock:
+            row = self.conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, chunk_ids, summary: str):
+        key = self.make_key(chunk_ids)
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)", (key, summary))
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM summaries")
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
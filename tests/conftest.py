@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The modules read their settings at import: run offline (stub embedder, estimated token
+# counts, the NumPy store, stub LLM) unless the environment says otherwise
+os.environ.setdefault("RAG_EMBEDDER_BACKEND", "stub")
+os.environ.setdefault("RAG_TOKEN_COUNTER", "estimate")
+os.environ.setdefault("RAG_VECTOR_BACKEND", "numpy")
+os.environ.setdefault("RAG_LLM_BACKEND", "stub")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+CONSTITUTION_PDF = os.path.join(REPO_ROOT, "constitution-amh.pdf")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def working_directory(tmp_path_factory):
+    """
+    The vector store, alias table, indexes and caches live under relative paths: keep them
+    out of the repository. One directory for the session, as the store client is per process.
+    """
+    os.chdir(tmp_path_factory.mktemp("work"))
+    yield
+    os.chdir(REPO_ROOT)
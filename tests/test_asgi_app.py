@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+import re
+
+import pytest
+
+from conftest import CONSTITUTION_PDF, REPO_ROOT
+
+
+def ui_routes() -> set[str]:
+    """
+    The routes the shipped front end calls: fetch() targets in static/script.js.
+    """
+    with open(os.path.join(REPO_ROOT, "static", "script.js"), encoding="utf-8") as f:
+        return set(re.findall(r"fetch\('([^']+)'", f.read()))
+
+
+@pytest.fixture(scope="module")
+def asgi_app():
+    import asgi_app
+    from data_ingestion import ingest_document
+
+    asgi_app.rag.gemini_model.latency_seconds = 0
+    asgi_app.rag.gemini_model.token_interval_seconds = 0
+    assert ingest_document(CONSTITUTION_PDF, asgi_app.rag.RAG_COLLECTION_NAME)["status"] == "success"
+    return asgi_app.app
+
+
+def sse_events(body: str) -> list[tuple[str, str]]:
+    return re.findall(r"event: (\w+)\ndata: (.*)\n\n", body)
+
+
+def test_chat_stream_sends_sse_events(asgi_app):
+    async def run():
+        client = asgi_app.test_client()
+        response = await client.post("/chat/stream", json={"message": "የፍርድ ቤቶች ነፃነት"})
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        return await response.get_data(as_text=True)
+
+    events = sse_events(asyncio.run(run()))
+    names = [name for name, _ in events]
+    assert names[0] == "meta" and names[-1] == "done"
+    assert json.loads(events[0][1])["cached"] is False
+    assert names.count("token") > 1 and "error" not in names
+
+
+def test_chat_stream_rejects_empty_message(asgi_app):
+    async def run():
+        return await asgi_app.test_client().post("/chat/stream", json={})
+
+    assert asyncio.run(run()).status_code == 400
+
+
+def test_every_ui_route_is_served(asgi_app):
+    routes = ui_routes()
+    assert {"/chat/stream", "/clear_db"} <= routes
+
+    async def run():
+        client = asgi_app.test_client()
+        response = await client.get("/")
+        assert response.status_code == 200
+        for route in sorted(routes - {"/clear_db"}):
+            response = await client.post(route, json={"message": "አንቀጽ 39 ምን ይላል?"})
+            assert response.status_code == 200, route
+        # Last: it empties the collection
+        response = await client.post("/clear_db", json={})
+        assert response.status_code == 200
+
+    asyncio.run(run())
@@ -0,0 +1,64 @@
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from collection_aliases import (
+    BuildInProgressError,
+    BuildSupersededError,
+    _locked_table,
+    begin_build,
+    load_alias_table,
+    new_build_owner,
+    promote_build,
+    resolve_collection_name,
+)
+from conftest import CONSTITUTION_PDF
+
+
+def dead_owner() -> str:
+    process = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    return f"{socket.gethostname()}:{process.stdout.strip()}:deadbeef"
+
+
+def test_live_build_is_not_resumed_by_a_second_ingest(tmp_path):
+    name, _ = begin_build(str(tmp_path), "c", new_build_owner())
+    with pytest.raises(BuildInProgressError):
+        begin_build(str(tmp_path), "c", new_build_owner())
+    assert load_alias_table(str(tmp_path))["c"]["building"]["name"] == name
+
+
+def test_build_of_an_exited_process_is_resumed(tmp_path):
+    name, _ = begin_build(str(tmp_path), "c", dead_owner())
+    owner = new_build_owner()
+    assert begin_build(str(tmp_path), "c", owner) == (name, False)
+    promote_build(str(tmp_path), "c", name, owner)
+    assert resolve_collection_name(str(tmp_path), "c") == name
+
+
+def test_build_with_an_expired_lease_is_resumed(tmp_path):
+    name, _ = begin_build(str(tmp_path), "c", new_build_owner())
+    with _locked_table(str(tmp_path)) as table:
+        table["c"]["building"]["heartbeat"] -= 3600
+    assert begin_build(str(tmp_path), "c", new_build_owner(), lease_seconds=60)[0] == name
+
+
+def test_clear_during_a_build_wins(tmp_path):
+    first_owner, clear_owner = new_build_owner(), new_build_owner()
+    building, _ = begin_build(str(tmp_path), "c", first_owner)
+    cleared, _ = begin_build(str(tmp_path), "c", clear_owner, resume=False)
+    promote_build(str(tmp_path), "c", cleared, clear_owner)
+    with pytest.raises(BuildSupersededError):
+        promote_build(str(tmp_path), "c", building, first_owner)
+    assert resolve_collection_name(str(tmp_path), "c") == cleared
+
+
+def test_unchanged_document_builds_no_new_version():
+    from data_ingestion import VECTOR_DB_PATH, ingest_document
+
+    assert ingest_document(CONSTITUTION_PDF, "unchanged_doc")["embedded"] > 0
+    before = load_alias_table(VECTOR_DB_PATH)["unchanged_doc"]
+    result = ingest_document(CONSTITUTION_PDF, "unchanged_doc")
+    assert result["status"] == "success" and result["embedded"] == 0 and result["chunks"] > 0
+    assert load_alias_table(VECTOR_DB_PATH)["unchanged_doc"] == before
@@ -0,0 +1,60 @@
+import argparse
+
+import fitz
+import pytest
+
+from conftest import CONSTITUTION_PDF
+from data_ingestion import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from ingest_script import ingest_corpus
+
+
+def ingest_args(tmp_path, collection: str, **overrides) -> argparse.Namespace:
+    settings = dict(
+        collection=collection, workers=2, queue_size=2, max_tokens=CHUNK_MAX_TOKENS,
+        overlap_tokens=CHUNK_OVERLAP_TOKENS, embed_batch_size=32, write_batch_size=256,
+        state_file=str(tmp_path / "state.json"), restart=False, strict=False,
+    )
+    settings.update(overrides)
+    return argparse.Namespace(**settings)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    A readable document, an image-only (textless) PDF and a file that is not a PDF at all.
+    """
+    text_file = tmp_path / "text.txt"
+    text_file.write_text("የኢትዮጵያ ፌዴራላዊ ዴሞክራሲያዊ ሪፐብሊክ ሕገ መንግሥት። " * 40, encoding="utf-8")
+    blank_pdf = tmp_path / "scanned.pdf"
+    document = fitz.open()
+    document.new_page()
+    document.save(str(blank_pdf))
+    broken_pdf = tmp_path / "broken.pdf"
+    broken_pdf.write_bytes(b"not a pdf")
+    return [str(CONSTITUTION_PDF), str(text_file), str(blank_pdf), str(broken_pdf)]
+
+
+def test_bad_files_do_not_block_publishing(tmp_path, corpus):
+    args = ingest_args(tmp_path, "ingest_partial")
+    totals = ingest_corpus(corpus, args)
+    assert totals["published"]
+    assert (totals["files"], totals["no_text"], totals["failed"]) == (2, 1, 1)
+    assert list(totals["failures"]) == [corpus[3]]
+
+    # Recorded: the re-run has nothing to do but still reports the unreadable file
+    totals = ingest_corpus(corpus, args)
+    assert totals["skipped"] == 4 and totals["embedded"] == 0
+    assert list(totals["failures"]) == [corpus[3]]
+
+
+def test_strict_holds_back_the_build(tmp_path, corpus):
+    totals = ingest_corpus(corpus, ingest_args(tmp_path, "ingest_strict", strict=True))
+    assert totals["failed"] == 1 and not totals["published"]
+
+
+def test_failure_is_recorded_when_nothing_else_changed(tmp_path, corpus):
+    args = ingest_args(tmp_path, "ingest_unchanged")
+    ingest_corpus(corpus[:2], args)
+    totals = ingest_corpus(corpus, args)
+    assert not totals["published"] and totals["failed"] == 1
+    assert ingest_corpus(corpus, args)["skipped"] == 4
@@ -0,0 +1,37 @@
+from rag_cache import RagCache, embedding_key, normalize_query
+
+
+def fill(cache: RagCache):
+    query = normalize_query("ስለ ሰንደቅ ዓላማ ምን ይላል?")
+    embedding = [0.6, 0.8, 0.0]
+    cache.embeddings.put(query, embedding)
+    cache.retrievals.put((embedding_key(embedding), 5), {"ids": [["doc::0"]]})
+    cache.answers.put_answer((query, 5), "መልስ", embedding)
+    return query, embedding
+
+
+def test_invalidate_keeps_embeddings_and_drops_retrievals_and_answers():
+    cache = RagCache()
+    query, embedding = fill(cache)
+
+    cache.invalidate()
+
+    assert cache.embeddings.get(query) == embedding
+    assert cache.retrievals.get((embedding_key(embedding), 5)) is None
+    assert cache.answers.get_answer((query, 5)) is None
+    assert cache.invalidations == 1
+
+
+def test_collection_version_change_invalidates_once():
+    cache = RagCache()
+    cache.sync_collection_version("v1")
+    query, embedding = fill(cache)
+
+    cache.sync_collection_version("v1")
+    assert cache.answers.get_answer((query, 5)) == "መልስ"
+
+    cache.sync_collection_version("v2")
+    assert cache.embeddings.get(query) == embedding
+    assert cache.retrievals.get((embedding_key(embedding), 5)) is None
+    assert cache.answers.get_answer((query, 5)) is None
+    assert cache.invalidations == 2
@@ -0,0 +1,40 @@
+from conftest import CONSTITUTION_PDF
+from data_ingestion import StructureTracker, iter_document_chunks, parse_amharic_number, split_at_headings
+from structure_index import StructureIndex
+
+
+def constitution_index() -> StructureIndex:
+    chunks = iter_document_chunks(CONSTITUTION_PDF)
+    return StructureIndex.build((f"chunk-{i}", metadata) for i, (_, metadata) in enumerate(chunks))
+
+
+def test_all_chapters_of_the_constitution_are_detected():
+    index = constitution_index()
+    assert sorted(int(chapter) for chapter in index.chapters) == list(range(1, 12))
+    # First article of each chapter
+    first_articles = {int(chapter): spans[0]["articles"][0] for chapter, spans in index.chapters.items()}
+    assert first_articles == {1: 1, 2: 8, 3: 13, 4: 45, 5: 50, 6: 53, 7: 69, 8: 72, 9: 78, 10: 85, 11: 93}
+
+
+def test_chapter_lookup_returns_the_chapter_not_a_reference_to_it():
+    index = constitution_index()
+    chapter_three = index.chapters[str(parse_amharic_number("ሦስት"))][0]["articles"]
+    assert chapter_three == list(range(13, 45))
+    assert 105 in index.chapters["11"][0]["articles"]
+
+
+def test_chapter_heading_number_excludes_punctuation():
+    tracker = StructureTracker()
+    assert tracker.observe("ምዕራፍ አንድ : ጠቅላላ ድንጋጌዎች") == "chapter"
+    assert tracker.observe("ምዕራፍ ሁለት: የሕገ መንግሥቱ መሰረታዊ መርሆዎች") == "chapter"
+    assert tracker.chapter == 2
+
+
+def test_in_text_chapter_reference_is_not_a_heading():
+    tracker = StructureTracker()
+    tracker.observe("ምዕራፍ አንድ : ጠቅላላ ድንጋጌዎች")
+    tracker.observe("አንቀጽ 1 የኢትዮጵያ መንግሥት ስያሜ")
+    sentence = "1 በዚህ ሕገ መንግሥት ምዕራፍ ሦስት የተዘረዘሩት መብቶችና ነጻነቶች በሙሉ"
+    assert list(split_at_headings(sentence, tracker)) == [sentence]
+    assert tracker.observe(sentence) is None
+    assert tracker.chapter == 1
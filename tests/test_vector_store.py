@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from vector_store import NumpyVectorStore
+
+
+def embedding(*values) -> list[float]:
+    return [float(v) for v in values]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path))
+
+
+def reopen(store) -> NumpyVectorStore:
+    return NumpyVectorStore(store.path, dtype=store.dtype)
+
+
+def stored_embeddings(collection, ids) -> dict:
+    got = collection.get(ids=ids, include=["embeddings"])
+    return {doc_id: list(vector) for doc_id, vector in zip(got["ids"], got["embeddings"])}
+
+
+@pytest.mark.parametrize("torn_file", ["vectors.bin", "rows.bin"])
+def test_upsert_after_torn_append_does_not_reuse_orphan_rows(store, torn_file):
+    collection = store.create_collection("c")
+    collection.upsert(["a"], embeddings=[embedding(1, 0, 0, 0)])
+    # A crash after one file got the next row but before the other one (or the log) did
+    row_bytes = 4 * np.dtype(np.float16).itemsize if torn_file == "vectors.bin" else 8
+    with open(os.path.join(collection.path, torn_file), "ab") as f:
+        f.write(np.array([0, 0, 0, 1], dtype=np.float16).tobytes()[:row_bytes])
+
+    collection = reopen(store).get_collection("c")
+    collection.upsert(["b"], embeddings=[embedding(0, 1, 0, 0)])
+    assert stored_embeddings(collection, ["a", "b"]) == {"a": embedding(1, 0, 0, 0), "b": embedding(0, 1, 0, 0)}
+
+    collection = reopen(store).get_collection("c")
+    assert stored_embeddings(collection, ["a", "b"]) == {"a": embedding(1, 0, 0, 0), "b": embedding(0, 1, 0, 0)}
+    result = collection.query(query_embeddings=[embedding(0, 1, 0, 0)], n_results=1)
+    assert result["ids"] == [["b"]]
+
+
+def test_partial_row_is_truncated_on_load(store):
+    collection = store.create_collection("c")
+    collection.upsert(["a"], embeddings=[embedding(1, 0, 0, 0)])
+    vectors_path = os.path.join(collection.path, "vectors.bin")
+    with open(vectors_path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    collection = reopen(store).get_collection("c")
+    assert os.path.getsize(vectors_path) == 4 * np.dtype(np.float16).itemsize
+    collection.upsert(["b"], embeddings=[embedding(0, 0, 1, 0)])
+    assert stored_embeddings(reopen(store).get_collection("c"), ["b"]) == {"b": embedding(0, 0, 1, 0)}
+
+
+def test_ignored_put_does_not_claim_a_reused_row(store):
+    collection = store.create_collection("c")
+    collection.upsert(["a"], embeddings=[embedding(1, 0, 0, 0)])
+    # A logged put whose row never reached the .bin files
+    with open(os.path.join(collection.path, "records.log.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"op":"put","row":1,"id":"x","document":null,"metadata":null}\n')
+
+    collection = reopen(store).get_collection("c")
+    collection.upsert(["b"], embeddings=[embedding(0, 1, 0, 0)])
+    collection = reopen(store).get_collection("c")
+    assert collection.count() == 2
+    assert collection.get(ids=["x"])["ids"] == []
+    assert stored_embeddings(collection, ["b"]) == {"b": embedding(0, 1, 0, 0)}
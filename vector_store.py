@@ -0,0 +1,539 @@
+import os
+import json
+import shutil
+import threading
+
+import numpy as np
+
+# --- Memory-mapped NumPy Vector Store ---
+# Alternative to ChromaDB for corpora that fit comfortably in one exact-search matrix (a few
+# hundred thousand chunks). NumpyVectorStore implements the subset of
+# chromadb.PersistentClient / Collection the app and data_ingestion use (get_or_create /
+# create / get / delete collection; add, upsert, update, delete, get, query, count), with the
+# same result shapes and squared-L2 distances, so either backend can sit behind
+# model_registry.get_vector_store().
+#
+# Each collection is a directory:
+#   manifest.json      - {"dim", "dtype", "metadata"}
+#   vectors.bin        - row-major matrix, float16 or int8 (per-row symmetric quantization)
+#   rows.bin           - float32 [squared norm, scale] per row (scale is 1.0 for float16)
+#   records.json       - ids/documents/metadatas of rows 0..n-1 as of the last compaction
+#   records.log.jsonl  - put/update/delete operations since then (rows appended to the .bin files)
+# Writes only ever append, so an interrupted ingestion leaves a readable collection; compact()
+# rewrites the live rows into a fresh directory (data_ingestion does this before promoting a
+# build). Vectors are memory-mapped and searched exactly, in blocks, with NumPy.
+#
+# Decoding float16/int8 blocks to float32 dominates the cost of a memory-mapped search, so a
+# single query touches the whole matrix once per call (batched queries share that pass). With
+# resident=True the matrix is decoded into RAM once per process instead: 4 bytes per value of
+# resident memory in exchange for plain float32 matrix products per query.
+
+NUMPY_INDEX_DTYPES = ("float16", "int8")
+QUERY_BLOCK_ROWS = 65536 # rows scored per matrix product; bounds the float32 temporaries
+
+_RESULT_KEYS = ("ids", "embeddings", "documents", "uris", "data", "metadatas", "distances")
+
+
+def _matches(metadata: dict, where: dict) -> bool:
+    """
+    Evaluates a ChromaDB-style metadata filter: {"key": value}, {"key": {"$op": value}}
+    ($eq $ne $in $nin $gt $gte $lt $lte) and {"$and"/"$or": [filters]}.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = (metadata or {}).get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand: return False
+            if op == "$ne" and value == operand: return False
+            if op == "$in" and value not in operand: return False
+            if op == "$nin" and value in operand: return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > operand: return False
+                if op == "$gte" and not value >= operand: return False
+                if op == "$lt" and not value < operand: return False
+                if op == "$lte" and not value <= operand: return False
+    return True
+
+
+class NumpyCollection:
+    def __init__(self, path: str, name: str, resident: bool = False):
+        self.path = path
+        self.name = name
+        self.resident = resident
+        self._lock = threading.RLock()
+        with open(os.path.join(path, "manifest.json"), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.dim = manifest["dim"]
+        self.dtype = manifest["dtype"]
+        self.metadata = manifest.get("metadata") or None
+        self._load_records()
+
+    # --- Files ---
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _write_manifest(self):
+        tmp_path = self._file("manifest.json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "metadata": self.metadata}, f)
+        os.replace(tmp_path, self._file("manifest.json"))
+
+    def _row_bytes(self) -> tuple[int, int]:
+        """
+        Bytes per row in vectors.bin and rows.bin.
+        """
+        return self.dim * np.dtype(self.dtype).itemsize, 2 * np.dtype(np.float32).itemsize
+
+    def _rows_on_disk(self) -> int:
+        if not self.dim:
+            return 0
+        vector_bytes, info_bytes = self._row_bytes()
+        vector_rows = os.path.getsize(self._file("vectors.bin")) // vector_bytes
+        info_rows = os.path.getsize(self._file("rows.bin")) // info_bytes
+        return min(vector_rows, info_rows)
+
+    def _truncate_to(self, n_rows: int):
+        """
+        Cuts both row files back to n_rows whole rows, dropping what a torn append left behind,
+        so the next append lands at row n_rows in both files.
+        """
+        if not self.dim:
+            return
+        for file_name, row_bytes in zip(("vectors.bin", "rows.bin"), self._row_bytes()):
+            path = self._file(file_name)
+            if os.path.getsize(path) != n_rows * row_bytes:
+                with open(path, 'r+b') as f:
+                    f.truncate(n_rows * row_bytes)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _load_records(self):
+        """
+        Rebuilds the row table from the snapshot and the operation log. A torn append (rows
+        in only one of the .bin files, or a partial row) is truncated away, and puts for rows
+        that never made it to both files are ignored.
+        """
+        n_rows = self._rows_on_disk()
+        self._truncate_to(n_rows)
+        self._ids = [None] * n_rows
+        self._documents = [None] * n_rows
+        self._metadatas = [None] * n_rows
+        self._id_to_row = {}
+
+        snapshot_path = self._file("records.json")
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            for row, (doc_id, document, metadata) in enumerate(
+                    zip(snapshot["ids"], snapshot["documents"], snapshot["metadatas"])):
+                if row < n_rows:
+                    self._set_row(row, doc_id, document, metadata)
+
+        log_path = self._file("records.log.jsonl")
+        if os.path.exists(log_path):
+            with open(log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break # torn last line
+                    self._apply(entry, n_rows)
+        self._invalidate()
+
+    def _set_row(self, row: int, doc_id: str, document, metadata):
+        previous = self._id_to_row.get(doc_id)
+        if previous is not None:
+            self._ids[previous] = None
+        # A row reused after a torn append may still be claimed by an ignored put's ID
+        replaced = self._ids[row]
+        if replaced is not None and self._id_to_row.get(replaced) == row:
+            del self._id_to_row[replaced]
+        self._ids[row] = doc_id
+        self._documents[row] = document
+        self._metadatas[row] = metadata
+        self._id_to_row[doc_id] = row
+
+    def _apply(self, entry: dict, n_rows: int):
+        op = entry["op"]
+        if op == "put":
+            if entry["row"] < n_rows:
+                self._set_row(entry["row"], entry["id"], entry["document"], entry["metadata"])
+        elif op == "update":
+            row = self._id_to_row.get(entry["id"])
+            if row is not None:
+                if "metadata" in entry:
+                    self._metadatas[row] = entry["metadata"]
+                if "document" in entry:
+                    self._documents[row] = entry["document"]
+        elif op == "delete":
+            row = self._id_to_row.pop(entry["id"], None)
+            if row is not None:
+                self._ids[row] = None
+
+    def _append_log(self, entries: list):
+        with open(self._file("records.log.jsonl"), 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def _invalidate(self):
+        self._vectors = None
+        self._row_info = None
+        self._live_rows = None
+
+    def _arrays(self):
+        """
+        (vectors, row_info, live_rows), memory-mapping the files on first use after a write.
+        """
+        with self._lock:
+            if self._vectors is None:
+                n_rows = len(self._ids)
+                if n_rows and self.dim:
+                    self._vectors = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode='r', shape=(n_rows, self.dim))
+                    self._row_info = np.memmap(self._file("rows.bin"), dtype=np.float32, mode='r', shape=(n_rows, 2))
+                    if self.resident:
+                        self._vectors, self._row_info = self._decode_all(self._vectors, self._row_info)
+                else:
+                    self._vectors = np.empty((0, self.dim or 0), dtype=self.dtype)
+                    self._row_info = np.empty((0, 2), dtype=np.float32)
+                self._live_rows = np.fromiter((doc_id is not None for doc_id in self._ids), dtype=bool, count=n_rows)
+            return self._vectors, self._row_info, self._live_rows
+
+    # --- Encoding ---
+
+    def _encode(self, embeddings: np.ndarray):
+        """
+        Returns (stored rows, row_info) for float32 embeddings.
+        """
+        if self.dtype == "int8":
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            stored = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+            decoded = stored.astype(np.float32) * scales[:, None]
+        else:
+            scales = np.ones(len(embeddings), dtype=np.float32)
+            stored = embeddings.astype(np.float16)
+            decoded = stored.astype(np.float32)
+        row_info = np.stack([np.einsum('ij,ij->i', decoded, decoded), scales], axis=1).astype(np.float32)
+        return stored, row_info
+
+    def _decode_all(self, vectors, row_info):
+        """
+        Float32 copy of the whole matrix with the int8 scales applied (scale column reset to 1).
+        """
+        decoded = np.empty(vectors.shape, dtype=np.float32)
+        for start in range(0, len(vectors), QUERY_BLOCK_ROWS):
+            block = slice(start, start + QUERY_BLOCK_ROWS)
+            decoded[block] = vectors[block].astype(np.float32) * row_info[block, 1:2]
+        row_info = np.array(row_info)
+        row_info[:, 1] = 1.0
+        return decoded, row_info
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        vectors, row_info, _ = self._arrays()
+        return vectors[rows].astype(np.float32) * row_info[rows, 1:2]
+
+    # --- Writes ---
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None):
+        if embeddings is None:
+            raise ValueError("NumpyCollection requires embeddings; embed documents before upserting.")
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+
+        with self._lock:
+            if not self.dim:
+                self.dim = embeddings.shape[1]
+                self._write_manifest()
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match collection dimensionality {self.dim}")
+
+            stored, row_info = self._encode(embeddings)
+            first_row = len(self._ids)
+            # A failed earlier write in this process can leave a partial append behind
+            self._truncate_to(first_row)
+            # Vectors first, then the log: a crash in between leaves unreferenced rows, never dangling records
+            with open(self._file("vectors.bin"), 'ab') as f:
+                f.write(stored.tobytes())
+            with open(self._file("rows.bin"), 'ab') as f:
+                f.write(row_info.tobytes())
+
+            entries = []
+            for offset, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                row = first_row + offset
+                self._ids.append(None)
+                self._documents.append(None)
+                self._metadatas.append(None)
+                self._set_row(row, doc_id, document, metadata)
+                entries.append({"op": "put", "row": row, "id": doc_id, "document": document, "metadata": metadata})
+            self._append_log(entries)
+            self._invalidate()
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None):
+        """
+        Like upsert, but IDs that already exist are skipped (as ChromaDB does).
+        """
+        keep = [i for i, doc_id in enumerate(ids) if doc_id not in self._id_to_row]
+        if not keep:
+            return
+        pick = lambda values: [values[i] for i in keep] if values is not None else None
+        self.upsert(
+            [ids[i] for i in keep],
+            embeddings=np.asarray(embeddings, dtype=np.float32)[keep] if embeddings is not None else None,
+            documents=pick(documents),
+            metadatas=pick(metadatas),
+        )
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        with self._lock:
+            if embeddings is not None:
+                rows = [self._id_to_row.get(doc_id) for doc_id in ids]
+                self.upsert(
+                    ids,
+                    embeddings=embeddings,
+                    documents=documents if documents is not None else [self._documents[r] if r is not None else None for r in rows],
+                    metadatas=metadatas if metadatas is not None else [self._metadatas[r] if r is not None else None for r in rows],
+                )
+                return
+            entries = []
+            for i, doc_id in enumerate(ids):
+                if doc_id not in self._id_to_row:
+                    continue
+                entry = {"op": "update", "id": doc_id}
+                if metadatas is not None:
+                    entry["metadata"] = metadatas[i]
+                if documents is not None:
+                    entry["document"] = documents[i]
+                self._apply(entry, len(self._ids))
+                entries.append(entry)
+            self._append_log(entries)
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            if where is not None:
+                matching = set(self.get(ids=ids, where=where, include=[])["ids"])
+                ids = [doc_id for doc_id in (ids or matching) if doc_id in matching]
+            entries = [{"op": "delete", "id": doc_id} for doc_id in ids or [] if doc_id in self._id_to_row]
+            for entry in entries:
+                self._apply(entry, len(self._ids))
+            self._append_log(entries)
+            self._invalidate()
+
+    def compact(self):
+        """
+        Rewrites the collection with only its live rows (dropping replaced and deleted ones)
+        and folds the operation log into the snapshot.
+        """
+        with self._lock:
+            live = [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+            compact_path = f"{self.path}.compact"
+            shutil.rmtree(compact_path, ignore_errors=True)
+            os.makedirs(compact_path)
+
+            # Raw on-disk rows (not the resident float32 copy); np.memmap cannot map empty files
+            vectors = row_info = None
+            if live:
+                n_rows = len(self._ids)
+                vectors = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode='r', shape=(n_rows, self.dim))
+                row_info = np.memmap(self._file("rows.bin"), dtype=np.float32, mode='r', shape=(n_rows, 2))
+            with open(os.path.join(compact_path, "vectors.bin"), 'wb') as vf, \
+                 open(os.path.join(compact_path, "rows.bin"), 'wb') as rf:
+                for start in range(0, len(live), QUERY_BLOCK_ROWS):
+                    block = live[start:start + QUERY_BLOCK_ROWS]
+                    vf.write(np.ascontiguousarray(vectors[block]).tobytes())
+                    rf.write(np.ascontiguousarray(row_info[block]).tobytes())
+            with open(os.path.join(compact_path, "records.json"), 'w', encoding='utf-8') as f:
+                json.dump({
+                    "ids": [self._ids[row] for row in live],
+                    "documents": [self._documents[row] for row in live],
+                    "metadatas": [self._metadatas[row] for row in live],
+                }, f, ensure_ascii=False, separators=(",", ":"))
+            shutil.copy(self._file("manifest.json"), os.path.join(compact_path, "manifest.json"))
+
+            del vectors, row_info
+            self._invalidate()
+            _swap_directories(self.path, compact_path)
+            self._load_records()
+
+    # --- Reads ---
+
+    def count(self) -> int:
+        return len(self._id_to_row)
+
+    def _candidate_rows(self, ids=None, where=None) -> np.ndarray:
+        if ids is not None:
+            rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+        else:
+            rows = [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+        if where:
+            rows = [row for row in rows if _matches(self._metadatas[row], where)]
+        return np.asarray(rows, dtype=np.int64)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("metadatas", "documents")):
+        with self._lock:
+            rows = self._candidate_rows(ids, where)
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {key: None for key in _RESULT_KEYS if key != "distances"}
+            result["ids"] = [self._ids[row] for row in rows]
+            if "documents" in include:
+                result["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = self._decode(rows) if len(rows) else np.empty((0, self.dim or 0), dtype=np.float32)
+            result["included"] = list(include)
+            return result
+
+    def query(self, query_embeddings, n_results: int = 10, where=None,
+              include=("metadatas", "documents", "distances")):
+        """
+        Exact top-n_results by squared L2 distance for each query embedding (batch queries
+        share every pass over the matrix).
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        with self._lock:
+            vectors, row_info, live_rows = self._arrays()
+            if where:
+                rows = self._candidate_rows(where=where)
+            elif live_rows.all():
+                rows = None # contiguous scan of the whole matrix
+            else:
+                rows = np.flatnonzero(live_rows)
+
+        n_candidates = len(vectors) if rows is None else len(rows)
+        k = min(n_results, n_candidates)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        if k and len(queries):
+            if queries.shape[1] != self.dim:
+                raise ValueError(f"Collection expecting embedding with dimension of {self.dim}, got {queries.shape[1]}")
+            query_norms = np.einsum('ij,ij->i', queries, queries)
+            for start in range(0, n_candidates, QUERY_BLOCK_ROWS):
+                if rows is None:
+                    block_rows = np.arange(start, min(start + QUERY_BLOCK_ROWS, n_candidates))
+                    block = vectors[start:start + QUERY_BLOCK_ROWS]
+                else:
+                    block_rows = rows[start:start + QUERY_BLOCK_ROWS]
+                    block = vectors[block_rows]
+                info = row_info[block_rows]
+                dots = (queries @ block.astype(np.float32, copy=False).T) * info[:, 1]
+                distances = query_norms[:, None] + info[:, 0] - 2 * dots
+                block_k = min(k, len(block_rows))
+                top = np.argpartition(distances, block_k - 1, axis=1)[:, :block_k]
+                best_rows = np.concatenate([best_rows, block_rows[top]], axis=1)
+                best_distances = np.concatenate([best_distances, np.take_along_axis(distances, top, axis=1)], axis=1)
+                if best_rows.shape[1] > k:
+                    keep = np.argpartition(best_distances, k - 1, axis=1)[:, :k]
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                    best_distances = np.take_along_axis(best_distances, keep, axis=1)
+            order = np.argsort(best_distances, axis=1, kind='stable')
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+            best_distances = np.maximum(np.take_along_axis(best_distances, order, axis=1), 0.0)
+
+        result = {key: None for key in _RESULT_KEYS}
+        result["ids"] = [[self._ids[row] for row in query_rows] for query_rows in best_rows]
+        if "documents" in include:
+            result["documents"] = [[self._documents[row] for row in query_rows] for query_rows in best_rows]
+        if "metadatas" in include:
+            result["metadatas"] = [[self._metadatas[row] for row in query_rows] for query_rows in best_rows]
+        if "distances" in include:
+            result["distances"] = best_distances.tolist()
+        if "embeddings" in include:
+            result["embeddings"] = [self._decode(query_rows) for query_rows in best_rows]
+        result["included"] = list(include)
+        return result
+
+
+def _swap_directories(path: str, replacement: str):
+    """
+    Replaces directory path with replacement. If interrupted, NumpyVectorStore finishes the
+    swap the next time the collection is opened.
+    """
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    os.rename(path, old_path)
+    os.rename(replacement, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class NumpyVectorStore:
+    """
+    Client for NumpyCollection directories under path (see the module comment).
+    dtype ("float16" or "int8") applies to collections created by this client; resident
+    applies to every collection it opens.
+    """
+
+    def __init__(self, path: str, dtype: str = "float16", resident: bool = False):
+        if dtype not in NUMPY_INDEX_DTYPES:
+            raise ValueError(f"dtype must be one of {NUMPY_INDEX_DTYPES}, got '{dtype}'.")
+        self.path = path
+        self.dtype = dtype
+        self.resident = resident
+        self._collections = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _collection_path(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _exists(self, name: str) -> bool:
+        path = self._collection_path(name)
+        if not os.path.isdir(path) and os.path.isdir(f"{path}.compact"):
+            os.rename(f"{path}.compact", path) # finish an interrupted compaction swap
+        return os.path.exists(os.path.join(path, "manifest.json"))
+
+    def get_collection(self, name: str) -> NumpyCollection:
+        with self._lock:
+            if name not in self._collections:
+                if not self._exists(name):
+                    raise ValueError(f"Collection {name} does not exist.")
+                self._collections[name] = NumpyCollection(self._collection_path(name), name, self.resident)
+            return self._collections[name]
+
+    def create_collection(self, name: str, metadata: dict | None = None) -> NumpyCollection:
+        with self._lock:
+            if self._exists(name):
+                raise ValueError(f"Collection {name} already exists.")
+            path = self._collection_path(name)
+            os.makedirs(path, exist_ok=True)
+            for file_name in ("vectors.bin", "rows.bin"):
+                open(os.path.join(path, file_name), 'wb').close()
+            with open(os.path.join(path, "manifest.json"), 'w', encoding='utf-8') as f:
+                json.dump({"dim": None, "dtype": self.dtype, "metadata": metadata}, f)
+            self._collections[name] = NumpyCollection(path, name, self.resident)
+            return self._collections[name]
+
+    def get_or_create_collection(self, name: str, metadata: dict | None = None) -> NumpyCollection:
+        try:
+            return self.get_collection(name)
+        except ValueError:
+            return self.create_collection(name, metadata)
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            if not self._exists(name):
+                raise ValueError(f"Collection {name} does not exist.")
+            self._collections.pop(name, None)
+            shutil.rmtree(self._collection_path(name))
+
+    def list_collections(self) -> list[str]:
+        return sorted(
+            entry for entry in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, entry, "manifest.json"))
+        )